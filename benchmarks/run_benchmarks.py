@@ -0,0 +1,430 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from matplotlib.figure import Figure
+
+from benchmarks.startup import measure_startup
+from network_analyzer import (
+    CompressedSeries,
+    FlowAnalyzer,
+    NetworkSpeedAnalyzer,
+    NetworkUsageAnalyzer,
+    PushAgent,
+    PushAggregator,
+)
+from util import GraphPlotter
+from util.results_loader import iter_blocks, summarize
+from util.synthetic_data import (
+    generate_usage_rows,
+    write_pcap,
+    write_speed_csv,
+    write_usage_csv,
+)
+
+BASELINE_FILE = os.path.join(ROOT_DIR, "benchmarks", "baseline.json")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+# One week at the default 1-minute cadence and one day at 1 Hz
+DATA_SIZES = (10_080, 86_400)
+QUICK_DATA_SIZES = (1_000,)
+
+benchmark_logger = logging.getLogger("benchmark")
+benchmark_logger.setLevel(logging.WARNING)
+benchmark_logger.addHandler(logging.NullHandler())
+benchmark_logger.propagate = False
+
+
+def measure(func, repeat, setup=None):
+    """
+    Time `func` over several runs.
+
+    Args:
+        func (callable): Code under test, called with the result of `setup`.
+        repeat (int): Number of timed runs.
+        setup (callable): Untimed preparation run before every call.
+
+    Returns:
+        dict: min, median and mean seconds plus the run count.
+    """
+    timings = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "repeat": repeat,
+    }
+
+
+def bench_sampling(workdir, repeat, sizes):
+    analyzer = NetworkUsageAnalyzer(
+        os.path.join(workdir, "sampling.csv"), benchmark_logger
+    )
+
+    def run(_):
+        for _ in range(1_000):
+            analyzer.get_network_usage()
+
+    return {"get_network_usage_x1000": measure(run, repeat)}
+
+
+def bench_writing(workdir, repeat, sizes):
+    usage_file = os.path.join(workdir, "write_usage.csv")
+    speed_file = os.path.join(workdir, "write_speed.csv")
+    usage_analyzer = NetworkUsageAnalyzer(usage_file, benchmark_logger)
+    speed_analyzer = NetworkSpeedAnalyzer(speed_file, benchmark_logger)
+
+    def fresh(path):
+        def setup():
+            if os.path.exists(path):
+                os.remove(path)
+
+        return setup
+
+    def write_usage(_):
+        for i in range(1_000):
+            usage_analyzer.write_to_csv(10**9 + i, 10**10 + i)
+
+    def write_speed(_):
+        for i in range(1_000):
+            speed_analyzer.write_to_csv(300_000_000.0 + i, 80_000_000.0 + i)
+
+    return {
+        "usage_write_to_csv_x1000": measure(write_usage, repeat, fresh(usage_file)),
+        "speed_write_to_csv_x1000": measure(write_speed, repeat, fresh(speed_file)),
+    }
+
+
+def bench_loading(workdir, repeat, sizes):
+    results = {}
+    for size in sizes:
+        usage_file = os.path.join(workdir, f"{size}_network_usage.csv")
+
+        def load(_):
+            data = pd.read_csv(usage_file)
+            pd.to_datetime(data["timestamp"])
+
+        def load_blocks(_):
+            for _ in iter_blocks(usage_file, ["sent_bytes", "recv_bytes"]):
+                pass
+
+        def summarize_usage(_):
+            summarize(usage_file)
+
+        results[f"load_usage_csv_{size}"] = measure(load, repeat)
+        results[f"load_usage_blocks_{size}"] = measure(load_blocks, repeat)
+        results[f"summarize_usage_{size}"] = measure(summarize_usage, repeat)
+    return results
+
+
+def bench_plotting(workdir, repeat, sizes):
+    results = {}
+    for size in sizes:
+        usage_file = os.path.join(workdir, f"{size}_network_usage.csv")
+        speed_file = os.path.join(workdir, f"{size}_speed_measurement.csv")
+        plotter = GraphPlotter(usage_file, speed_file)
+
+        def plot_usage(_):
+            figure = Figure()
+            plotter.plot_usage_graph(usage_file, figure.add_subplot(111), 5)
+            figure.savefig(os.path.join(workdir, "usage.png"))
+            plt.close("all")
+
+        def plot_speed(_):
+            figure = Figure()
+            plotter.plot_speed_graph(speed_file, figure.add_subplot(111), 5)
+            figure.savefig(os.path.join(workdir, "speed.png"))
+            plt.close("all")
+
+        def plot_both(_):
+            plotter.plot_graphs(5, os.path.join(workdir, "graphs.png"))
+            plt.close("all")
+
+        results[f"plot_usage_graph_{size}"] = measure(plot_usage, repeat)
+        results[f"plot_speed_graph_{size}"] = measure(plot_speed, repeat)
+        results[f"plot_graphs_{size}"] = measure(plot_both, repeat)
+    return results
+
+
+def bench_flows(workdir, repeat, sizes):
+    results = {}
+    for size in sizes:
+        pcap_file = os.path.join(workdir, f"{size}_packets.pcap")
+        flows_file = os.path.join(workdir, "flows.csv")
+        write_pcap(pcap_file, size)
+
+        def setup():
+            if os.path.exists(flows_file):
+                os.remove(flows_file)
+            return FlowAnalyzer(flows_file, benchmark_logger)
+
+        def analyze(analyzer):
+            analyzer.analyze_file(pcap_file)
+
+        results[f"flow_analyze_pcap_{size}"] = measure(analyze, repeat, setup)
+    return results
+
+
+def bench_series(workdir, repeat, sizes):
+    results = {}
+    for size in sizes:
+        rows = generate_usage_rows(size, interval=1)
+        samples = [
+            (
+                datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp(),
+                row["sent_bytes"],
+            )
+            for row in rows
+        ]
+
+        def append(series):
+            for timestamp, value in samples:
+                series.append(timestamp, value)
+
+        results[f"series_append_{size}"] = measure(append, repeat, CompressedSeries)
+
+        series = CompressedSeries()
+        append(series)
+        results[f"series_decode_{size}"] = measure(lambda _: series.to_arrays(), repeat)
+        results[f"series_bytes_{size}"] = {
+            "median": series.nbytes,
+            "unit": "bytes",
+        }
+    return results
+
+
+def bench_push(workdir, repeat, sizes):
+    results = {}
+    aggregator = PushAggregator(
+        f"unix:{os.path.join(workdir, 'push.sock')}",
+        os.path.join(workdir, "fleet"),
+        benchmark_logger,
+    )
+    thread = threading.Thread(target=aggregator.run)
+    thread.start()
+    aggregator.ready.wait()
+    try:
+        for size in sizes:
+            rows = generate_usage_rows(size, interval=1)
+            samples = [
+                (
+                    datetime.strptime(
+                        row["timestamp"], "%Y-%m-%d %H:%M:%S"
+                    ).timestamp(),
+                    row["sent_bytes"],
+                    row["recv_bytes"],
+                )
+                for row in rows
+            ]
+
+            # Four hosts pushing the same samples, timed until all are stored
+            def push(_):
+                expected = aggregator.samples + 4 * size
+                agents = [
+                    PushAgent(
+                        aggregator.address,
+                        host=f"host{index}",
+                        logger=benchmark_logger,
+                        buffer_size=size,
+                    )
+                    for index in range(4)
+                ]
+                for agent in agents:
+                    agent.start()
+                for timestamp, sent_bytes, recv_bytes in samples:
+                    for agent in agents:
+                        agent.publish_usage(sent_bytes, recv_bytes, timestamp)
+                for agent in agents:
+                    agent.close()
+                while aggregator.samples < expected:
+                    time.sleep(0.001)
+
+            results[f"push_ingest_{size}"] = measure(push, repeat)
+    finally:
+        aggregator.stop()
+        thread.join()
+    return results
+
+
+def bench_startup(workdir, repeat, sizes):
+    results, forbidden = measure_startup(repeat)
+    # Any plotting or GUI module in a headless run is a regression on its own
+    results["startup_forbidden_imports"] = {
+        "median": len(forbidden),
+        "unit": "modules",
+        "modules": forbidden,
+    }
+    return results
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "sampling": bench_sampling,
+    "writing": bench_writing,
+    "loading": bench_loading,
+    "plotting": bench_plotting,
+    "flows": bench_flows,
+    "series": bench_series,
+    "push": bench_push,
+}
+
+
+def run_benchmarks(groups, repeat, sizes):
+    """
+    Run the selected benchmark groups on synthetic data in a temporary directory.
+
+    Args:
+        groups (list of str): Names from BENCHMARKS.
+        repeat (int): Timed runs per benchmark.
+        sizes (tuple of int): Row counts of the synthetic results files.
+
+    Returns:
+        dict: Benchmark name to timing statistics.
+    """
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The analyzers create results/ in the working directory
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                write_usage_csv(os.path.join(workdir, f"{size}_network_usage.csv"), size)
+                write_speed_csv(
+                    os.path.join(workdir, f"{size}_speed_measurement.csv"), size
+                )
+            for group in groups:
+                print(f"Running {group} benchmarks...")
+                results.update(BENCHMARKS[group](workdir, repeat, sizes))
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median timings with a baseline.
+
+    Args:
+        results (dict): Benchmark name to timing statistics.
+        baseline (dict): Benchmark name to timing statistics.
+        threshold (float): Allowed slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        list of str: Names of the benchmarks that regressed.
+    """
+    regressions = []
+    for name, stats in sorted(results.items()):
+        if stats.get("unit") == "modules":
+            status = "REGRESSION" if stats["modules"] else "ok"
+            print(f"{name:<32} {', '.join(stats['modules']) or '-':>13}  {status}")
+            if status != "ok":
+                regressions.append(name)
+            continue
+        if stats.get("unit") == "bytes":
+            value = f"{stats['median'] / (1024 * 1024):>10.2f} MB"
+        else:
+            value = f"{stats['median'] * 1000:>10.2f} ms"
+        if name not in baseline or not baseline[name]["median"]:
+            print(f"{name:<32} {value}  (no baseline)")
+            continue
+        ratio = stats["median"] / baseline[name]["median"]
+        status = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"{name:<32} {value}  {ratio:>6.2f}x  {status}")
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the collection, storage and plotting hot paths."
+    )
+    parser.add_argument(
+        "--group",
+        action="append",
+        choices=sorted(BENCHMARKS),
+        help="Benchmark group to run (repeatable, default: all).",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark.")
+    parser.add_argument(
+        "--quick", action="store_true", help="Use small data sizes for a fast check."
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE_FILE, help="Baseline JSON file to compare with."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed median slowdown against the baseline (0.2 = 20%%).",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run as the new baseline.",
+    )
+    args = parser.parse_args()
+
+    groups = args.group or list(BENCHMARKS)
+    sizes = QUICK_DATA_SIZES if args.quick else DATA_SIZES
+    results = run_benchmarks(groups, args.repeat, sizes)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "sizes": list(sizes),
+        },
+        "benchmarks": results,
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_file = os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y-%m-%d_%H-%M-%S_benchmarks.json")
+    )
+    with open(results_file, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=4)
+    print(f"Results saved to {results_file}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["benchmarks"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
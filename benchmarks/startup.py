@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+STARTUP_BASELINE_FILE = os.path.join(ROOT_DIR, "benchmarks", "startup_baseline.json")
+
+# What a headless, collection-only run imports
+HEADLESS_STATEMENT = (
+    "import network_analyzer\n"
+    "from network_analyzer import Menu, NetworkUsageAnalyzer, NetworkSpeedAnalyzer\n"
+)
+
+# Modules a headless run must never load
+FORBIDDEN_MODULES = ("pandas", "matplotlib", "numpy", "PyQt5", "speedtest")
+
+PROBE = """
+import json
+import sys
+{statement}
+from util.instrumentation import get_rss_bytes
+print(json.dumps({{"rss_bytes": get_rss_bytes(), "modules": sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Sum the cumulative import time of the top-level imports in `-X importtime` output.
+
+    Args:
+        stderr (str): Standard error of a `python -X importtime` run.
+
+    Returns:
+        float: Import time in seconds.
+    """
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        # Nested imports are indented under the module that triggered them
+        if not name.startswith(" ") or name[1] == " ":
+            continue
+        total_us += int(cumulative)
+    return total_us / 1_000_000
+
+
+def probe(statement):
+    """
+    Run `statement` in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        tuple: (import seconds, RSS bytes, list of loaded modules).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(statement=statement)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return parse_importtime(result.stderr), report["rss_bytes"], report["modules"]
+
+
+def measure_startup(repeat=5, statement=HEADLESS_STATEMENT):
+    """
+    Measure the import time and RSS that `statement` adds to a bare interpreter.
+
+    Args:
+        repeat (int): Number of fresh interpreters per measurement.
+        statement (str): Python code doing the imports under test.
+
+    Returns:
+        tuple: (dict of benchmark results, list of forbidden modules loaded).
+    """
+    import_times = []
+    rss_deltas = []
+    forbidden = set()
+    for _ in range(repeat):
+        bare_time, bare_rss, _ = probe("pass")
+        import_time, rss, modules = probe(statement)
+        import_times.append(max(import_time - bare_time, 0))
+        rss_deltas.append(max(rss - bare_rss, 0))
+        forbidden.update(
+            module
+            for module in modules
+            if module.split(".", 1)[0] in FORBIDDEN_MODULES
+        )
+
+    results = {}
+    for name, values, unit in (
+        ("startup_import_time", import_times, "seconds"),
+        ("startup_rss", rss_deltas, "bytes"),
+    ):
+        results[name] = {
+            "min": min(values),
+            "median": statistics.median(values),
+            "mean": statistics.mean(values),
+            "repeat": repeat,
+            "unit": unit,
+        }
+    return results, sorted({module.split(".", 1)[0] for module in forbidden})
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure headless startup import time and RSS."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per run.")
+    parser.add_argument(
+        "--baseline",
+        default=STARTUP_BASELINE_FILE,
+        help="Baseline JSON file to compare with.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed median growth against the baseline (0.2 = 20%%).",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store this run as the new baseline."
+    )
+    args = parser.parse_args()
+
+    results, forbidden = measure_startup(args.repeat)
+    failed = False
+    if forbidden:
+        print(f"Headless startup imports {', '.join(forbidden)}")
+        failed = True
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["benchmarks"]
+    for name, stats in sorted(results.items()):
+        value = (
+            f"{stats['median'] * 1000:.1f} ms"
+            if stats["unit"] == "seconds"
+            else f"{stats['median'] / (1024 * 1024):.1f} MB"
+        )
+        if name in baseline and baseline[name]["median"]:
+            ratio = stats["median"] / baseline[name]["median"]
+            status = "REGRESSION" if ratio > 1 + args.threshold else "ok"
+            failed = failed or status != "ok"
+            print(f"{name:<24} {value:>10}  {ratio:>6.2f}x  {status}")
+        else:
+            print(f"{name:<24} {value:>10}  (no baseline)")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump({"benchmarks": results}, file, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
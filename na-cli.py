@@ -1,8 +1,10 @@
 import sys
 import os
 import logging
+import argparse
 from datetime import datetime
 from network_analyzer import Menu
+from util.logger import setup_logger
 
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "network_analyzer"))
@@ -10,27 +12,655 @@ sys.path.insert(
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "util")))
 
 
-def setup_logger(name, log_file, level=logging.INFO):
-    handler = logging.FileHandler(log_file)
-    console_handler = logging.StreamHandler()
+def build_parser():
+    parser = argparse.ArgumentParser(description="Network Analyzer CLI")
+    subparsers = parser.add_subparsers(dest="command")
 
-    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
-    console_handler.setFormatter(
-        logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
+    replay = subparsers.add_parser(
+        "replay", help="Replay recorded or synthetic results through the pipeline"
+    )
+    replay.add_argument(
+        "--usage", nargs="*", default=[], help="*_network_usage.csv files to replay"
+    )
+    replay.add_argument(
+        "--speed", nargs="*", default=[], help="*_speed_measurement.csv files to replay"
+    )
+    replay.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Replay this many synthetic usage and speed samples instead of files",
+    )
+    replay.add_argument(
+        "--interval",
+        type=int,
+        default=60,
+        help="Seconds between synthetic samples",
+    )
+    replay.add_argument(
+        "--rate",
+        default="max",
+        help='Replay speed relative to the recording, e.g. 1 or 100, or "max"',
+    )
+    replay.add_argument(
+        "--metrics-port", type=int, default=0, help="Serve /metrics during the replay"
+    )
+    replay.add_argument("--xticks", type=int, default=5, help="Interval of X-ticks")
+    replay.add_argument(
+        "--no-plot", action="store_true", help="Do not plot the replayed results"
+    )
+    replay.add_argument(
+        "--verbose", action="store_true", help="Log every replayed sample"
+    )
+    daemon = subparsers.add_parser(
+        "daemon", help="Run the collectors headless until SIGTERM"
+    )
+    daemon.add_argument("--config", help="JSON config file, see daemon.example.json")
+    for name in (
+        "usage",
+        "per-nic",
+        "speed",
+        "latency",
+        "namespaces",
+        "processes",
+        "tcp-quality",
+    ):
+        daemon.add_argument(
+            f"--{name}-interval",
+            type=int,
+            help=f"Seconds between {name} samples, 0 disables the collector",
+        )
+    daemon.add_argument(
+        "--usage-adaptive",
+        action="store_true",
+        help="Sample usage faster while rates change and slower while flat",
+    )
+    daemon.add_argument(
+        "--usage-min-interval",
+        type=float,
+        help="Shortest adaptive usage interval in seconds",
+    )
+    daemon.add_argument(
+        "--usage-max-interval",
+        type=float,
+        help="Longest adaptive usage interval in seconds",
+    )
+    daemon.add_argument(
+        "--speed-traffic-aware",
+        action="store_true",
+        help="Defer speed tests while the link is busy with real traffic",
+    )
+    daemon.add_argument(
+        "--speed-jitter",
+        type=float,
+        help="Most seconds a traffic-aware speed test is randomly delayed by",
+    )
+    daemon.add_argument(
+        "--speed-daily-budget",
+        type=float,
+        help="Megabytes traffic-aware speed tests may use per day, 0 for no limit",
+    )
+    daemon.add_argument(
+        "--speed-server",
+        action="append",
+        help="speedtest.net server id, 'best' or http(s):// URL to measure "
+        "the speed against (repeatable)",
+    )
+    daemon.add_argument(
+        "--speed-stagger",
+        type=float,
+        help="Measure the speed servers one after another, this many seconds "
+        "apart, instead of concurrently",
+    )
+    daemon.add_argument(
+        "--latency-target",
+        action="append",
+        help="host:port to measure TCP connect latency to (repeatable)",
+    )
+    daemon.add_argument("--metrics-port", type=int, help="Serve /metrics on this port")
+    daemon.add_argument(
+        "--duration", type=int, help="Stop after this many seconds, 0 runs until SIGTERM"
+    )
+    daemon.add_argument(
+        "--shared-feed",
+        help="Publish samples to this shared memory feed for viewers",
+    )
+    daemon.add_argument(
+        "--push",
+        help="Push samples to an aggregator: unix:/path, tcp://host:port or "
+        "udp://host:port",
+    )
+
+    aggregator = subparsers.add_parser(
+        "aggregator", help="Receive and store samples pushed by daemons of many hosts"
+    )
+    aggregator.add_argument(
+        "--listen",
+        default="tcp://0.0.0.0:9465",
+        help="unix:/path, tcp://host:port or udp://host:port",
+    )
+    aggregator.add_argument(
+        "--output",
+        default="fleet",
+        help="Directory of the hosts' results, <output>/<host>/results/",
+    )
+    aggregator.add_argument("--duration", type=int, help="Stop after this many seconds")
+
+    status = subparsers.add_parser(
+        "status", help="Show live samples from a running daemon's shared memory feed"
+    )
+    status.add_argument(
+        "--feed",
+        default="network_analyzer_feed",
+        help="Shared memory feed name given to the daemon",
+    )
+    status.add_argument(
+        "--interval", type=float, default=1.0, help="Seconds between refreshes"
+    )
+    flows = subparsers.add_parser(
+        "flows", help="Account packets to 5-tuple flows from a capture file or live"
+    )
+    source = flows.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pcap", nargs="+", help="pcap or pcapng files to read")
+    source.add_argument(
+        "--interface",
+        nargs="?",
+        const="",
+        help="Capture live on this interface, all if empty (Linux, needs root)",
+    )
+    flows.add_argument(
+        "--duration", type=float, help="Seconds to capture live, until Ctrl+C if unset"
+    )
+    flows.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=15,
+        help="Export a flow after this many seconds without packets",
+    )
+    flows.add_argument(
+        "--active-timeout",
+        type=float,
+        default=300,
+        help="Export long-lived flows every this many seconds",
+    )
+    flows.add_argument(
+        "--no-hostnames",
+        action="store_true",
+        help="Do not name flows from the DNS responses and TLS SNI seen",
+    )
+    flows.add_argument(
+        "--top", type=int, default=0, help="Print the N top talkers at the end"
+    )
+    flows.add_argument(
+        "--window",
+        type=float,
+        default=300,
+        help="Top talkers window in seconds, 0 for all time",
+    )
+    flows.add_argument(
+        "--save-top",
+        help="Save the top talkers summary to this JSON file for merging later",
+    )
+
+    top = subparsers.add_parser(
+        "top", help="Show top talkers merged from saved summaries or flow files"
+    )
+    top.add_argument(
+        "files",
+        nargs="+",
+        help="*_top_talkers.json or *_flows.csv files, e.g. of several hosts",
+    )
+    top.add_argument("--top", type=int, default=10, help="Number of entries per table")
+
+    export = subparsers.add_parser(
+        "export", help="Convert results CSVs to a partitioned Parquet dataset"
+    )
+    export.add_argument(
+        "files", nargs="*", help="CSV files to convert, all of results/ by default"
+    )
+    export.add_argument(
+        "--output", default="results_parquet", help="Root of the Parquet dataset"
+    )
+    export.add_argument("--host", help="Host partition, this host's name by default")
+    export.add_argument(
+        "--jobs", type=int, help="Worker processes, one per CPU by default"
+    )
+    export.add_argument(
+        "--force", action="store_true", help="Convert files even if unchanged"
+    )
+
+    fleet = subparsers.add_parser(
+        "fleet", help="Aggregate the usage or speed results of many hosts"
+    )
+    fleet.add_argument("kind", choices=["usage", "speed"], help="Results to aggregate")
+    fleet.add_argument(
+        "files",
+        nargs="+",
+        help="Results CSVs, named after their host's directory (<host>/results/...) "
+        "or given as host=path",
+    )
+    fleet.add_argument(
+        "--interval", type=int, default=3600, help="Rollup bucket length in seconds"
+    )
+    fleet.add_argument(
+        "--percentiles",
+        type=float,
+        nargs="+",
+        default=[50, 95, 99],
+        help="Percentiles across hosts to compute per bucket",
+    )
+    fleet.add_argument(
+        "--jobs", type=int, help="Worker processes, one per CPU by default"
+    )
+    fleet.add_argument(
+        "--shards",
+        type=int,
+        help="Time shards to split the work into, 4 per job by default",
+    )
+    fleet.add_argument("--top", type=int, default=10, help="Number of hosts to rank")
+    fleet.add_argument(
+        "--output", help="Rollup CSV, results/<time>_fleet_<kind>.csv by default"
+    )
+
+    catalog = subparsers.add_parser(
+        "catalog", help="Index the results files and list them by kind, host and time"
+    )
+    catalog.add_argument("--dir", default="results", help="Results directory to index")
+    catalog.add_argument(
+        "--catalog", help="Catalog database, <dir>/catalog.sqlite by default"
+    )
+    catalog.add_argument(
+        "--rebuild", action="store_true", help="Index every file again from scratch"
+    )
+    catalog.add_argument(
+        "--jobs", type=int, help="Worker processes, one per CPU by default"
+    )
+    catalog.add_argument("--kind", help="Only list this metric, e.g. network_usage")
+    catalog.add_argument("--host", help="Only list the files of this host")
+    catalog.add_argument(
+        "--start", help="Only list files with data since YYYY-MM-DD[ HH:MM:SS]"
+    )
+    catalog.add_argument(
+        "--end", help="Only list files with data until YYYY-MM-DD[ HH:MM:SS]"
+    )
+
+    summary = subparsers.add_parser(
+        "summary", help="Summarize a results CSV of any size in bounded memory"
+    )
+    summary.add_argument("file", help="Results CSV, e.g. results/..._network_usage.csv")
+    summary.add_argument(
+        "--columns", nargs="+", help="Numeric columns, all of them by default"
+    )
+    summary.add_argument(
+        "--percentiles",
+        type=float,
+        nargs="+",
+        default=[50, 95, 99],
+        help="Percentiles to estimate, within 0.5%%",
+    )
+    summary.add_argument(
+        "--interval",
+        type=int,
+        help="Also roll the file up into buckets of this many seconds",
+    )
+    summary.add_argument(
+        "--output", help="Rollup CSV, results/<time>_rollup_<file> by default"
+    )
+    return parser
+
+
+def run_flows(args):
+    from network_analyzer.flow_analyzer import FlowAnalyzer
+    from network_analyzer.hostname_extractor import HostnameExtractor
+    from network_analyzer.pcap_reader import PcapReader
+    from network_analyzer.top_talkers import TopTalkers
+
+    os.makedirs("logs", exist_ok=True)
+    now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    logger = setup_logger(
+        "flows", os.path.join("logs", f"{now}_flows.log"), logging.WARNING
+    )
+    top_talkers = None
+    if args.top or args.save_top:
+        top_talkers = TopTalkers(window=args.window)
+    analyzer = FlowAnalyzer(
+        os.path.join("results", f"{now}_flows.csv"),
+        logger,
+        args.idle_timeout,
+        args.active_timeout,
+        top_talkers=top_talkers,
+        hostname_extractor=None if args.no_hostnames else HostnameExtractor(),
+    )
+    start = datetime.now()
+    if args.pcap:
+        for path in args.pcap:
+            reader = PcapReader(path)
+            for batch in reader:
+                analyzer.process_batch(batch)
+            analyzer.skipped += reader.malformed
+        analyzer.finish()
+    else:
+        try:
+            analyzer.capture(args.interface or None, args.duration)
+        except KeyboardInterrupt:
+            pass
+    elapsed = (datetime.now() - start).total_seconds()
+    print(
+        f"{analyzer.packet_count} packets in {analyzer.flow_count} flows "
+        f"({analyzer.packet_count / max(elapsed, 1e-9):.0f} packets/s), "
+        f"written to {analyzer.filename}"
+    )
+    if args.top:
+        print()
+        print(top_talkers.format_table(args.top))
+    if args.save_top:
+        top_talkers.save(args.save_top)
+        print(f"Top talkers saved to {args.save_top}")
+
+
+def run_top(args):
+    from network_analyzer.top_talkers import TopTalkers
+
+    top_talkers = TopTalkers.load(args.files[0])
+    for path in args.files[1:]:
+        top_talkers.merge(TopTalkers.load(path))
+    print(top_talkers.format_table(args.top))
+
+
+def run_status(args):
+    import time
+    from network_analyzer.shared_feed import SharedSampleFeed
+
+    feed = SharedSampleFeed.attach(args.feed)
+    cursor = max(feed.count() - 1, 0)
+    previous_usage = None
+    try:
+        while True:
+            samples, cursor = feed.read_since(cursor)
+            for timestamp, kind, first, second in samples:
+                now = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+                if kind == "speed":
+                    print(
+                        f"{now}  speed test: Download {first / 1_000_000:.2f} Mbps, "
+                        f"Upload {second / 1_000_000:.2f} Mbps"
+                    )
+                    continue
+                if previous_usage is not None and timestamp > previous_usage[0]:
+                    elapsed = timestamp - previous_usage[0]
+                    print(
+                        f"{now}  Upload {(first - previous_usage[1]) * 8 / elapsed / 1_000_000:.2f} Mbps, "
+                        f"Download {(second - previous_usage[2]) * 8 / elapsed / 1_000_000:.2f} Mbps"
+                    )
+                previous_usage = (timestamp, first, second)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
+
+
+def run_export(args):
+    import glob
+    from util.parquet_export import ParquetExporter
+
+    files = args.files or sorted(glob.glob(os.path.join("results", "*.csv")))
+    exporter = ParquetExporter(args.output, host=args.host, jobs=args.jobs)
+    start = datetime.now()
+    converted, unchanged, failed = exporter.export(files, args.force)
+    print(
+        f"{converted} files converted, {unchanged} unchanged, {failed} failed "
+        f"in {(datetime.now() - start).total_seconds():.1f} s, written to {args.output}"
+    )
+
+
+def run_fleet(args):
+    from network_analyzer.fleet_aggregator import FleetAggregator
+
+    aggregator = FleetAggregator(
+        args.kind,
+        interval=args.interval,
+        percentiles=[int(p) if p == int(p) else p for p in args.percentiles],
+        jobs=args.jobs,
+        shards=args.shards,
+    )
+    for path in args.files:
+        host, separator, file = path.partition("=")
+        if separator and not os.path.exists(path):
+            aggregator.add(file, host)
+        else:
+            aggregator.add(path)
+    start = datetime.now()
+    result = aggregator.aggregate()
+    elapsed = (datetime.now() - start).total_seconds()
+
+    output = args.output
+    if output is None:
+        os.makedirs("results", exist_ok=True)
+        now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output = os.path.join("results", f"{now}_fleet_{args.kind}.csv")
+    aggregator.write_to_csv(output, result["rollups"])
+    print(aggregator.format_report(result, args.top))
+    print(f"{len(result['rollups'])} buckets in {elapsed:.1f} s, written to {output}")
+
+
+def run_catalog(args):
+    import glob
+    from util.results_catalog import ResultsCatalog, format_entries
+
+    catalog = ResultsCatalog(
+        args.catalog or os.path.join(args.dir, "catalog.sqlite"), results_dir=args.dir
+    )
+    try:
+        paths = glob.glob(os.path.join(args.dir, "*.csv")) + glob.glob(
+            os.path.join(args.dir, "*", "results", "*.csv")
+        )
+        start = datetime.now()
+        if args.rebuild:
+            scanned, unchanged, removed = catalog.rebuild(paths, args.jobs)
+        else:
+            scanned, unchanged, removed = catalog.refresh(paths, args.jobs)
+        elapsed = (datetime.now() - start).total_seconds()
+        entries = catalog.find(args.kind, args.host, args.start, args.end)
+    finally:
+        catalog.close()
+    print(format_entries(entries))
+    print(
+        f"{len(entries)} files listed; {scanned} scanned, {unchanged} unchanged, "
+        f"{removed} removed in {elapsed:.2f} s"
+    )
+
+
+def run_summary(args):
+    from util.results_loader import rollup, summarize
+
+    start = datetime.now()
+    summary = summarize(args.file, args.columns, args.percentiles)
+    print(
+        f"{args.file}: {summary['rows']:,} rows from {summary['start']} "
+        f"to {summary['end']}"
+    )
+    for column, stats in summary["columns"].items():
+        print(
+            f"  {column}: "
+            + ", ".join(
+                f"{name} {value:,}" if name == "count" else f"{name} {value:,.2f}"
+                for name, value in stats.items()
+            )
+        )
+
+    if args.interval:
+        output = args.output
+        if output is None:
+            os.makedirs("results", exist_ok=True)
+            now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            output = os.path.join(
+                "results", f"{now}_rollup_{os.path.basename(args.file)}"
+            )
+        rollups = rollup(args.file, args.columns, args.interval)
+        rollups.to_csv(output, index=False)
+        print(f"{len(rollups)} buckets written to {output}")
+    print(f"Done in {(datetime.now() - start).total_seconds():.1f} s")
+
+
+def run_aggregator(args):
+    import signal
+    from network_analyzer.push_transport import PushAggregator
+
+    os.makedirs("logs", exist_ok=True)
+    now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    logger = setup_logger("aggregator", os.path.join("logs", f"{now}_aggregator.log"))
+    aggregator = PushAggregator(args.listen, args.output, logger)
+    signal.signal(signal.SIGTERM, lambda signum, frame: aggregator.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: aggregator.stop())
+    aggregator.run(args.duration)
+    stats = aggregator.stats()
+    print(
+        f"{stats['samples']} samples from {stats['hosts']} hosts in "
+        f"{stats['batches']} batches, {stats['dropped']} dropped, "
+        f"written to {args.output}"
+    )
+
+
+def run_daemon(args):
+    from network_analyzer.daemon import Daemon, load_config
+
+    config = load_config(args.config)
+    collectors = config["collectors"]
+    for name, interval in (
+        ("usage", args.usage_interval),
+        ("per_nic", args.per_nic_interval),
+        ("speed", args.speed_interval),
+        ("latency", args.latency_interval),
+        ("namespaces", args.namespaces_interval),
+        ("processes", args.processes_interval),
+        ("tcp_quality", args.tcp_quality_interval),
+    ):
+        if interval is not None:
+            collectors[name]["interval"] = interval
+    if args.usage_adaptive:
+        collectors["usage"]["adaptive"] = True
+    if args.usage_min_interval is not None:
+        collectors["usage"]["min_interval"] = args.usage_min_interval
+    if args.usage_max_interval is not None:
+        collectors["usage"]["max_interval"] = args.usage_max_interval
+    if args.speed_traffic_aware:
+        collectors["speed"]["traffic_aware"] = True
+    if args.speed_jitter is not None:
+        collectors["speed"]["jitter"] = args.speed_jitter
+    if args.speed_daily_budget is not None:
+        collectors["speed"]["daily_budget_mb"] = args.speed_daily_budget
+    if args.speed_server:
+        collectors["speed"]["servers"] = args.speed_server
+    if args.speed_stagger is not None:
+        collectors["speed"]["mode"] = "staggered"
+        collectors["speed"]["stagger"] = args.speed_stagger
+    if args.latency_target:
+        collectors["latency"]["targets"] = args.latency_target
+    if args.metrics_port is not None:
+        config["metrics_port"] = args.metrics_port
+    if args.duration is not None:
+        config["duration"] = args.duration
+    if args.shared_feed is not None:
+        config["shared_feed"] = args.shared_feed
+    if args.push is not None:
+        config["push"] = args.push
+
+    Daemon(config).run()
+
+
+def run_replay(args):
+    from network_analyzer import AlertEngine, MetricsExporter, MetricsRegistry
+    from network_analyzer.replay import (
+        Replayer,
+        load_speed_samples,
+        load_usage_samples,
+        merge_samples,
+        replay_output_files,
+        synthetic_speed_samples,
+        synthetic_usage_samples,
+    )
+    from util import GraphPlotter
+
+    if args.synthetic:
+        usage_samples = synthetic_usage_samples(args.synthetic, args.interval)
+        speed_samples = synthetic_speed_samples(args.synthetic, args.interval)
+    else:
+        usage_samples = merge_samples(load_usage_samples(file) for file in args.usage)
+        speed_samples = merge_samples(load_speed_samples(file) for file in args.speed)
+
+    os.makedirs("logs", exist_ok=True)
+    now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    logger = setup_logger(
+        "replay",
+        os.path.join("logs", f"{now}_replay.log"),
+        logging.INFO if args.verbose else logging.WARNING,
+    )
+    usage_csv_file, speed_csv_file = replay_output_files(now)
+    has_usage = bool(args.usage or args.synthetic)
+    has_speed = bool(args.speed or args.synthetic)
+
+    alert_engine = None
+    if os.path.exists("alerts.json"):
+        alert_engine = AlertEngine.from_config("alerts.json", logger)
+
+    metrics = None
+    exporter = None
+    if args.metrics_port:
+        metrics = MetricsRegistry()
+        exporter = MetricsExporter(metrics, port=args.metrics_port, logger=logger)
+        exporter.start()
+
+    replayer = Replayer(
+        usage_csv_file if has_usage else None,
+        speed_csv_file if has_speed else None,
+        logger,
+        alert_engine,
+        metrics,
+        0 if args.rate == "max" else float(args.rate),
+    )
+    stats = replayer.run(usage_samples, speed_samples)
+    print(
+        f"Replayed {stats['samples']} samples covering {stats['recorded_seconds']:.0f} s "
+        f"in {stats['elapsed_seconds']:.2f} s ({stats['samples_per_second']:.0f} samples/s)"
     )
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    logger.addHandler(handler)
-    logger.addHandler(console_handler)
+    if exporter:
+        exporter.stop()
 
-    return logger
+    if not args.no_plot and has_usage and has_speed:
+        GraphPlotter(usage_csv_file, speed_csv_file).plot_graphs(args.xticks)
 
 
 if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command == "replay" and args.synthetic and (args.usage or args.speed):
+        # Synthetic counters and timestamps are unrelated to recorded ones
+        parser.error("--synthetic cannot be combined with --usage or --speed")
     try:
-        menu = Menu()
-        menu.show_menu()
+        if args.command == "replay":
+            run_replay(args)
+        elif args.command == "daemon":
+            run_daemon(args)
+        elif args.command == "status":
+            run_status(args)
+        elif args.command == "flows":
+            run_flows(args)
+        elif args.command == "top":
+            run_top(args)
+        elif args.command == "export":
+            run_export(args)
+        elif args.command == "fleet":
+            run_fleet(args)
+        elif args.command == "aggregator":
+            run_aggregator(args)
+        elif args.command == "catalog":
+            run_catalog(args)
+        elif args.command == "summary":
+            run_summary(args)
+        else:
+            menu = Menu()
+            menu.show_menu()
     except Exception as e:
         os.makedirs("logs", exist_ok=True)
         log_filename = os.path.join(
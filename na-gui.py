@@ -1,6 +1,7 @@
 import sys
 import os
 import logging
+from collections import deque
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication,
@@ -11,36 +12,64 @@ from PyQt5.QtWidgets import (
     QCheckBox,
     QPushButton,
     QSpinBox,
-    QTextEdit,
+    QPlainTextEdit,
     QMessageBox,
     QToolButton,
     QTabWidget,
     QFileDialog,
     QComboBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QDateEdit,
+    QAbstractItemView,
+    QLineEdit,
 )
 from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtCore import QTimer
-from network_analyzer import NetworkUsageAnalyzer, NetworkSpeedAnalyzer
-from util import GraphPlotter, I18N
+from PyQt5.QtCore import QTimer, QDate
+from network_analyzer import (
+    AdaptiveInterval,
+    NetworkUsageAnalyzer,
+    NetworkSpeedAnalyzer,
+    TcpQualityAnalyzer,
+    SeriesStore,
+    AlertEngine,
+    MetricsRegistry,
+    MetricsExporter,
+)
+from util import GraphPlotter, I18N, instrumentation
+from util.logger import setup_logger
 
 
 class QTextEditLogger(logging.Handler):
     """
-    A custom logging handler that outputs log messages to a QTextEdit widget.
+    A custom logging handler that outputs log messages to a QPlainTextEdit widget.
+
+    emit() only queues the record, so it is cheap and safe to call from any
+    thread. A timer on the GUI thread formats the queued records and appends
+    them in one batch, and the widget keeps at most `max_lines` lines.
 
     Attributes:
-        text_edit (QTextEdit): The QTextEdit widget where log messages are displayed.
+        text_edit (QPlainTextEdit): The widget where log messages are displayed.
+        pending (deque): Records waiting for the next batch.
+        timer (QTimer): Timer that appends the pending records.
     """
 
-    def __init__(self, text_edit):
+    def __init__(self, text_edit, max_lines=5000, flush_interval=200):
         """
-        Initialize the QTextEditLogger with a QTextEdit widget.
+        Initialize the QTextEditLogger with a QPlainTextEdit widget.
 
         Args:
-            text_edit (QTextEdit): The QTextEdit widget where log messages will be displayed.
+            text_edit (QPlainTextEdit): The widget where log messages will be displayed.
+            max_lines (int): Maximum number of lines kept in the widget.
+            flush_interval (int): Milliseconds between batches.
         """
         super().__init__()
         self.text_edit = text_edit
+        self.text_edit.setMaximumBlockCount(max_lines)
+        self.pending = deque(maxlen=max_lines)
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.append_pending)
+        self.timer.start(flush_interval)
 
     def emit(self, record):
         """
@@ -49,8 +78,18 @@ class QTextEditLogger(logging.Handler):
         Args:
             record (LogRecord): The log record to be emitted.
         """
-        msg = self.format(record)
-        self.text_edit.append(msg)
+        self.pending.append(record)
+
+    def append_pending(self):
+        """
+        Append the queued records to the widget.
+        """
+        if not self.pending:
+            return
+        messages = []
+        while self.pending:
+            messages.append(self.format(self.pending.popleft()))
+        self.text_edit.appendPlainText("\n".join(messages))
 
 
 class NetworkAnalyzerGUI(QWidget):
@@ -70,7 +109,18 @@ class NetworkAnalyzerGUI(QWidget):
         usage_logger (Logger): Logger for usage analysis.
         speed_analyzer (NetworkSpeedAnalyzer): Analyzer for network speed.
         usage_analyzer (NetworkUsageAnalyzer): Analyzer for network usage.
+        tcp_quality_analyzer (TcpQualityAnalyzer): TCP retransmits and resets, sampled with usage.
+        history (SeriesStore): Usage and speed samples of the current analysis, compressed in memory.
         plotter (GraphPlotter): Plotter for generating graphs from analysis data.
+        alert_engine (AlertEngine): Alert rules evaluated on every sample, if configured.
+        metrics_port (int): Port of the /metrics endpoint, 0 to disable it.
+        metrics (MetricsRegistry): Metric state served by the exporter.
+        metrics_exporter (MetricsExporter): HTTP server for the /metrics endpoint.
+        self_instrumentation (bool): Whether to collect the analyzer's own statistics.
+        adaptive_sampling (bool): Whether usage is sampled between 1 second and the frequency, following the traffic.
+        adaptive (AdaptiveInterval): Interval of the adaptive usage sampling, None at a fixed frequency.
+        feed (SharedSampleFeed): Feed of another collector, e.g. the daemon, being viewed.
+        feed_timer (QTimer): Timer polling the feed.
     """
 
     def __init__(self, lang="en"):
@@ -91,9 +141,39 @@ class NetworkAnalyzerGUI(QWidget):
 
         self.speed_timer = QTimer()
         self.usage_timer = QTimer()
+        # Connected once here; connecting on every start would run each job
+        # once per previous start
+        self.speed_timer.timeout.connect(self.speed_job)
+        self.usage_timer.timeout.connect(self.usage_job)
 
+        self.tcp_quality_analyzer = None
+        self.history = SeriesStore()
         self.plotter = GraphPlotter(None, None)
 
+        self.alert_config_file = "alerts.json"
+        self.alert_engine = None
+
+        self.metrics_port = 0
+        self.metrics = None
+        self.metrics_exporter = None
+
+        self.self_instrumentation = False
+
+        self.adaptive_sampling = False
+        self.adaptive = None
+
+        # Index of the results files, opened on first use
+        self.catalog = None
+
+        # Read-only view of a collector's shared sample feed
+        self.feed = None
+        self.feed_cursor = 0
+        self.feed_usage = None
+        self.feed_rates = ""
+        self.feed_speed = ""
+        self.feed_timer = QTimer()
+        self.feed_timer.timeout.connect(self.poll_feed)
+
         self.initUI()
 
     def initUI(self):
@@ -146,12 +226,26 @@ class NetworkAnalyzerGUI(QWidget):
         self.duration_label.setText(self.i18n.get("analysis_duration"))
         self.speed_checkbox.setText(self.i18n.get("analyze_speed"))
         self.usage_checkbox.setText(self.i18n.get("analyze_usage"))
+        self.adaptive_checkbox.setText(self.i18n.get("adaptive_sampling"))
         self.frequency_label.setText(self.i18n.get("measurement_frequency"))
         self.xtick_label.setText(self.i18n.get("xtick_interval"))
+        self.metrics_port_label.setText(self.i18n.get("set_metrics_port"))
+        self.instrumentation_checkbox.setText(self.i18n.get("self_instrumentation"))
         self.start_button.setText(self.i18n.get("start_analysis"))
         self.stop_button.setText(self.i18n.get("stop_analysis"))
         self.select_files_button.setText(self.i18n.get("select_files"))
         self.clear_plots_button.setText(self.i18n.get("clear_plots"))
+        self.catalog_kind_label.setText(self.i18n.get("catalog_kind"))
+        self.catalog_kind_combo.setItemText(0, self.i18n.get("catalog_all"))
+        self.catalog_from_label.setText(self.i18n.get("catalog_from"))
+        self.catalog_to_label.setText(self.i18n.get("catalog_to"))
+        self.catalog_find_button.setText(self.i18n.get("catalog_find"))
+        self.catalog_plot_button.setText(self.i18n.get("catalog_plot_selected"))
+        self.catalog_table.setHorizontalHeaderLabels(self.catalog_headers())
+        self.feed_name_label.setText(self.i18n.get("feed_name"))
+        self.feed_attach_button.setText(
+            self.i18n.get("feed_detach" if self.feed else "feed_attach")
+        )
         self.tabs.setTabText(self.tabs.indexOf(self.settings_tab), self.i18n.get("settings_tab"))
         self.tabs.setTabText(self.tabs.indexOf(self.plots_tab), self.i18n.get("plots_tab"))
     
@@ -207,6 +301,17 @@ class NetworkAnalyzerGUI(QWidget):
             usage_layout.addWidget(usage_button)
             layout.addLayout(usage_layout)
 
+            # Adaptive usage sampling checkbox
+            adaptive_layout = QHBoxLayout()
+            self.adaptive_checkbox = QCheckBox("Adaptive usage sampling")
+            self.adaptive_checkbox.setChecked(self.adaptive_sampling)
+            adaptive_button = self.create_help_button(
+                "Sample usage every second during bursts, backing off to the frequency on a quiet link."
+            )
+            adaptive_layout.addWidget(self.adaptive_checkbox)
+            adaptive_layout.addWidget(adaptive_button)
+            layout.addLayout(adaptive_layout)
+
             # Frequency input
             frequency_layout = QHBoxLayout()
             self.frequency_label = QLabel("Frequency of measurements (minutes):")
@@ -235,6 +340,31 @@ class NetworkAnalyzerGUI(QWidget):
             xtick_layout.addWidget(xtick_button)
             layout.addLayout(xtick_layout)
 
+            # Metrics exporter port input
+            metrics_port_layout = QHBoxLayout()
+            self.metrics_port_label = QLabel("Metrics exporter port (0 = disabled):")
+            self.metrics_port_input = QSpinBox()
+            self.metrics_port_input.setRange(0, 65535)
+            self.metrics_port_input.setValue(self.metrics_port)
+            metrics_port_button = self.create_help_button(
+                "Serve Prometheus metrics on http://127.0.0.1:<port>/metrics. (0-65535)"
+            )
+            metrics_port_layout.addWidget(self.metrics_port_label)
+            metrics_port_layout.addWidget(self.metrics_port_input)
+            metrics_port_layout.addWidget(metrics_port_button)
+            layout.addLayout(metrics_port_layout)
+
+            # Self-instrumentation checkbox
+            instrumentation_layout = QHBoxLayout()
+            self.instrumentation_checkbox = QCheckBox("Collector self-instrumentation")
+            self.instrumentation_checkbox.setChecked(self.self_instrumentation)
+            instrumentation_button = self.create_help_button(
+                "Record stage latencies, tick jitter, bytes written and RSS to logs/<time>_stats.json. Send SIGUSR1 to profile for 60 seconds."
+            )
+            instrumentation_layout.addWidget(self.instrumentation_checkbox)
+            instrumentation_layout.addWidget(instrumentation_button)
+            layout.addLayout(instrumentation_layout)
+
             # Start and Stop buttons
             buttons_layout = QHBoxLayout()
             self.start_button = QPushButton("Start Analysis")
@@ -247,7 +377,7 @@ class NetworkAnalyzerGUI(QWidget):
             layout.addLayout(buttons_layout)
 
             # Log output
-            self.log_output = QTextEdit()
+            self.log_output = QPlainTextEdit()
             self.log_output.setReadOnly(True)
             layout.addWidget(self.log_output)
 
@@ -278,8 +408,11 @@ class NetworkAnalyzerGUI(QWidget):
         self.duration_input.setEnabled(enabled and not self.infinite_analysis)
         self.speed_checkbox.setEnabled(enabled)
         self.usage_checkbox.setEnabled(enabled)
+        self.adaptive_checkbox.setEnabled(enabled)
         self.frequency_input.setEnabled(enabled)
         self.xtick_input.setEnabled(enabled)
+        self.metrics_port_input.setEnabled(enabled)
+        self.instrumentation_checkbox.setEnabled(enabled)
         self.select_files_button.setEnabled(enabled)
         self.clear_plots_button.setEnabled(enabled)
 
@@ -300,6 +433,55 @@ class NetworkAnalyzerGUI(QWidget):
             self.clear_plots_button.clicked.connect(self.clear_plots)
             layout.addWidget(self.clear_plots_button)
 
+            # Results catalog: find files by kind and time range
+            catalog_layout = QHBoxLayout()
+            self.catalog_kind_label = QLabel("Results")
+            catalog_layout.addWidget(self.catalog_kind_label)
+            self.catalog_kind_combo = QComboBox()
+            self.catalog_kind_combo.addItem("All")
+            catalog_layout.addWidget(self.catalog_kind_combo)
+            self.catalog_from_label = QLabel("From")
+            catalog_layout.addWidget(self.catalog_from_label)
+            self.catalog_from_input = QDateEdit(QDate.currentDate().addDays(-7))
+            self.catalog_from_input.setCalendarPopup(True)
+            self.catalog_from_input.setDisplayFormat("yyyy-MM-dd")
+            catalog_layout.addWidget(self.catalog_from_input)
+            self.catalog_to_label = QLabel("To")
+            catalog_layout.addWidget(self.catalog_to_label)
+            self.catalog_to_input = QDateEdit(QDate.currentDate())
+            self.catalog_to_input.setCalendarPopup(True)
+            self.catalog_to_input.setDisplayFormat("yyyy-MM-dd")
+            catalog_layout.addWidget(self.catalog_to_input)
+            self.catalog_find_button = QPushButton("Find")
+            self.catalog_find_button.clicked.connect(self.find_results)
+            catalog_layout.addWidget(self.catalog_find_button)
+            layout.addLayout(catalog_layout)
+
+            self.catalog_table = QTableWidget(0, 6)
+            self.catalog_table.setHorizontalHeaderLabels(self.catalog_headers())
+            self.catalog_table.verticalHeader().setVisible(False)
+            self.catalog_table.setEditTriggers(QTableWidget.NoEditTriggers)
+            self.catalog_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+            self.catalog_table.setMaximumHeight(150)
+            layout.addWidget(self.catalog_table)
+
+            self.catalog_plot_button = QPushButton("Plot Selected")
+            self.catalog_plot_button.clicked.connect(self.plot_selected_results)
+            layout.addWidget(self.catalog_plot_button)
+
+            # Live samples of a collector publishing to a shared feed
+            feed_layout = QHBoxLayout()
+            self.feed_name_label = QLabel("Live feed")
+            feed_layout.addWidget(self.feed_name_label)
+            self.feed_name_input = QLineEdit("network_analyzer_feed")
+            feed_layout.addWidget(self.feed_name_input)
+            self.feed_attach_button = QPushButton("Attach")
+            self.feed_attach_button.clicked.connect(self.toggle_feed)
+            feed_layout.addWidget(self.feed_attach_button)
+            layout.addLayout(feed_layout)
+            self.feed_status_label = QLabel("")
+            layout.addWidget(self.feed_status_label)
+
             # Placeholder for plot area
             self.plot_area = QTabWidget()
             layout.addWidget(self.plot_area)
@@ -365,11 +547,18 @@ class NetworkAnalyzerGUI(QWidget):
         Start the network analysis based on the user settings.
         """
         try:
+            # A new run starts with a fresh alert engine and metrics, or
+            # none if alerts.json was removed or the port cleared since
+            self.alert_engine = None
+            self.metrics = None
             self.analysis_duration = self.duration_input.value()
             self.analyze_speed = self.speed_checkbox.isChecked()
             self.analyze_usage = self.usage_checkbox.isChecked()
             self.frequency = self.frequency_input.value()
             self.xtick_interval = self.xtick_input.value()
+            self.metrics_port = self.metrics_port_input.value()
+            self.self_instrumentation = self.instrumentation_checkbox.isChecked()
+            self.adaptive_sampling = self.adaptive_checkbox.isChecked()
 
             if not self.analyze_speed and not self.analyze_usage:
                 QMessageBox.warning(
@@ -404,15 +593,20 @@ class NetworkAnalyzerGUI(QWidget):
 
             speed_csv_file = None
             usage_csv_file = None
+            tcp_quality_csv_file = None
+            self.tcp_quality_analyzer = None
+            self.history = SeriesStore()
 
             if self.analyze_speed:
                 speed_log_file = os.path.join("logs", f"{now}_speed.log")
                 speed_csv_file = os.path.join("results", f"{now}_speed_measurement.csv")
                 self.speed_logger = self.setup_logger("speed", speed_log_file)
                 self.speed_analyzer = NetworkSpeedAnalyzer(
-                    speed_csv_file, self.speed_logger
+                    speed_csv_file,
+                    self.speed_logger,
+                    history=self.history,
+                    catalog=self.open_catalog(),
                 )
-                self.speed_timer.timeout.connect(self.speed_job)
                 self.speed_timer.start(
                     self.frequency * 60 * 1000
                 )  # frequency in minutes
@@ -421,19 +615,57 @@ class NetworkAnalyzerGUI(QWidget):
                 usage_log_file = os.path.join("logs", f"{now}_data_usage.log")
                 usage_csv_file = os.path.join("results", f"{now}_network_usage.csv")
                 self.usage_logger = self.setup_logger("usage", usage_log_file)
+                self.adaptive = None
+                if self.adaptive_sampling:
+                    self.adaptive = AdaptiveInterval(1, self.frequency * 60)
                 self.usage_analyzer = NetworkUsageAnalyzer(
-                    usage_csv_file, self.usage_logger
+                    usage_csv_file,
+                    self.usage_logger,
+                    history=self.history,
+                    catalog=self.open_catalog(),
+                    adaptive=self.adaptive,
                 )
-                self.usage_timer.timeout.connect(self.usage_job)
-                self.usage_timer.start(
-                    self.frequency * 60 * 1000
-                )  # frequency in minutes
+                if os.path.exists("/proc/net/snmp"):
+                    tcp_quality_csv_file = os.path.join(
+                        "results", f"{now}_tcp_quality.csv"
+                    )
+                    self.tcp_quality_analyzer = TcpQualityAnalyzer(
+                        tcp_quality_csv_file, self.usage_logger
+                    )
+                    self.tcp_quality_analyzer.get_tcp_quality()
+                if self.adaptive:
+                    # Starts fast; usage_job sets the interval after every sample
+                    self.usage_timer.start(int(self.adaptive.min_interval * 1000))
+                else:
+                    self.usage_timer.start(
+                        self.frequency * 60 * 1000
+                    )  # frequency in minutes
 
             self.plotter = GraphPlotter(
                 usage_csv_file if self.analyze_usage else None,
                 speed_csv_file if self.analyze_speed else None,
+                tcp_quality_csv_file,
             )
 
+            if os.path.exists(self.alert_config_file):
+                alert_log_file = os.path.join("logs", f"{now}_alerts.log")
+                self.alert_engine = AlertEngine.from_config(
+                    self.alert_config_file,
+                    self.setup_logger("alerts", alert_log_file),
+                )
+
+            if self.self_instrumentation:
+                instrumentation.reset()
+                instrumentation.enable(os.path.join("logs", f"{now}_stats.json"))
+                instrumentation.install_signal_handler()
+
+            if self.metrics_port:
+                self.metrics = MetricsRegistry()
+                self.metrics_exporter = MetricsExporter(
+                    self.metrics, port=self.metrics_port
+                )
+                self.metrics_exporter.start()
+
             if self.usage_logger:
                 self.usage_logger.info(
                     f"Network Usage Analyzer: Starting the analysis..."
@@ -467,7 +699,18 @@ class NetworkAnalyzerGUI(QWidget):
                 self.speed_timer.stop()
             if self.usage_timer.isActive():
                 self.usage_timer.stop()
+            if self.metrics_exporter:
+                self.metrics_exporter.stop()
+                self.metrics_exporter = None
+            if self.adaptive:
+                self.log_message(
+                    f"{self.i18n.get('adaptive_sampling')}: {self.adaptive.samples} samples, "
+                    f"{self.adaptive.effective_rate():.1f} per minute lately"
+                )
             self.plotter.plot_graphs(self.xtick_interval)
+            instrumentation.stop_profiling()
+            instrumentation.write_stats()
+            instrumentation.disable()
             self.log_message("Analysis stopped and graphs plotted.")
 
             self.start_button.setEnabled(True)
@@ -486,12 +729,20 @@ class NetworkAnalyzerGUI(QWidget):
         Perform a speed analysis job.
         """
         try:
+            instrumentation.record_tick("speed", self.frequency * 60)
             download_speed, upload_speed = self.speed_analyzer.measure_speed()
             if download_speed is not None and upload_speed is not None:
                 self.speed_analyzer.write_to_csv(download_speed, upload_speed)
+                if self.alert_engine:
+                    self.alert_engine.observe_speed(download_speed, upload_speed)
+                if self.metrics:
+                    self.metrics.observe_speed(download_speed, upload_speed)
                 self.log_message(
                     f"Speed job: Download {download_speed / 1_000_000:.2f} Mbps, Upload {upload_speed / 1_000_000:.2f} Mbps"
                 )
+            elif self.metrics:
+                self.metrics.observe_error("speed")
+            self.publish_instrumentation()
         except Exception as e:
             QMessageBox.critical(
                 self, "InternalError", f"An internal error occurred: {e}"
@@ -503,18 +754,56 @@ class NetworkAnalyzerGUI(QWidget):
         Perform a network usage analysis job.
         """
         try:
+            instrumentation.record_tick("usage", self.usage_timer.interval() / 1000)
             sent_bytes, recv_bytes = self.usage_analyzer.get_network_usage()
             if sent_bytes is not None and recv_bytes is not None:
                 self.usage_analyzer.write_to_csv(sent_bytes, recv_bytes)
+                if self.alert_engine:
+                    self.alert_engine.observe_usage(sent_bytes, recv_bytes)
+                if self.metrics:
+                    self.metrics.observe_usage(sent_bytes, recv_bytes)
                 self.log_message(
                     f"Usage job: Sent {sent_bytes / (1024 * 1024):.2f} MB, Received {recv_bytes / (1024 * 1024):.2f} MB"
                 )
+                interval = self.usage_analyzer.next_interval(sent_bytes, recv_bytes)
+                if interval is not None:
+                    self.usage_timer.setInterval(int(interval * 1000))
+                    self.log_message(
+                        self.i18n.get("adaptive_sampling_status").format(
+                            interval, self.adaptive.effective_rate()
+                        )
+                    )
+                    if self.metrics:
+                        self.metrics.observe_sampling(
+                            "usage", interval, self.adaptive.effective_rate()
+                        )
+            elif self.metrics:
+                self.metrics.observe_error("usage")
+            if self.tcp_quality_analyzer:
+                quality = self.tcp_quality_analyzer.get_tcp_quality()
+                if quality:
+                    self.tcp_quality_analyzer.write_to_csv(quality)
+                    if self.metrics:
+                        self.metrics.observe_tcp_quality(quality)
+                elif quality is None and self.metrics:
+                    self.metrics.observe_error("tcp_quality")
+            self.publish_instrumentation()
         except Exception as e:
             QMessageBox.critical(
                 self, "InternalError", f"An internal error occurred: {e}"
             )
             logging.error(f"An internal error occurred during usage_job: {e}")
 
+    def publish_instrumentation(self):
+        """
+        Write the self-instrumentation statistics and export them as metrics.
+        """
+        if not instrumentation.enabled:
+            return
+        instrumentation.write_stats()
+        if self.metrics:
+            self.metrics.observe_instrumentation(instrumentation.snapshot())
+
     def log_message(self, message):
         """
         Log a message to the logging framework.
@@ -532,7 +821,10 @@ class NetworkAnalyzerGUI(QWidget):
 
     def setup_logger(self, name, log_file):
         """
-        Setup a logger with a file handler and a console handler.
+        Setup a logger with a rotating file handler and a console handler.
+
+        Handlers run on a background thread and are replaced, not added, when
+        analysis restarts. Records still propagate to the log view.
 
         Args:
             name (str): The name of the logger.
@@ -542,20 +834,9 @@ class NetworkAnalyzerGUI(QWidget):
             Logger: The configured logger.
         """
         try:
-            handler = logging.FileHandler(log_file)
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(self.log_handler.formatter)
-
-            handler.setFormatter(
-                logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
+            return setup_logger(
+                name, log_file, formatter=self.log_handler.formatter
             )
-
-            logger = logging.getLogger(name)
-            logger.setLevel(logging.INFO)
-            logger.addHandler(handler)
-            logger.addHandler(console_handler)
-
-            return logger
         except Exception as e:
             QMessageBox.critical(
                 self, "InternalError", f"An internal error occurred: {e}"
@@ -585,16 +866,194 @@ class NetworkAnalyzerGUI(QWidget):
             )
             logging.error(f"An internal error occurred during select_files: {e}")
 
-    def plot_files(self, files):
+    def toggle_feed(self):
         """
-        Plot the selected files in the plot area.
+        Attach to the shared feed named in the input, or detach from it.
+
+        The feed is only read, so it can be viewed while the daemon or the
+        CLI collects, without a second collector sampling the counters.
+        """
+        try:
+            if self.feed is not None:
+                self.feed_timer.stop()
+                self.feed.close()
+                self.feed = None
+                self.feed_attach_button.setText(self.i18n.get("feed_attach"))
+                self.feed_name_input.setEnabled(True)
+                return
+            from network_analyzer.shared_feed import SharedSampleFeed
+
+            self.feed = SharedSampleFeed.attach(self.feed_name_input.text())
+            # Start from the latest sample, the earlier ones are in the results files
+            self.feed_cursor = max(self.feed.count() - 1, 0)
+            self.feed_usage = None
+            self.feed_rates = ""
+            self.feed_speed = ""
+            self.feed_status_label.setText(self.i18n.get("feed_waiting"))
+            self.feed_attach_button.setText(self.i18n.get("feed_detach"))
+            self.feed_name_input.setEnabled(False)
+            self.feed_timer.start(1000)
+        except FileNotFoundError:
+            QMessageBox.warning(
+                self,
+                self.i18n.get("feed_name"),
+                self.i18n.get("feed_not_found").format(self.feed_name_input.text()),
+            )
+        except Exception as e:
+            QMessageBox.critical(
+                self, "InternalError", f"An internal error occurred: {e}"
+            )
+            logging.error(f"An internal error occurred during toggle_feed: {e}")
+
+    def poll_feed(self):
+        """
+        Show the samples published since the last poll.
+        """
+        try:
+            samples, self.feed_cursor = self.feed.read_since(self.feed_cursor)
+        except Exception as e:
+            logging.error(f"Error reading the shared feed: {e}")
+            self.toggle_feed()
+            return
+        for timestamp, kind, first, second in samples:
+            time_text = datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+            if kind == "speed":
+                self.feed_speed = (
+                    f"{self.i18n.get('feed_speed_test')} {time_text}: "
+                    f"{first / 1_000_000:.2f} / {second / 1_000_000:.2f} Mbps"
+                )
+                continue
+            previous = self.feed_usage
+            if previous is not None and timestamp > previous[0]:
+                elapsed = timestamp - previous[0]
+                self.feed_rates = (
+                    f"{time_text}  {self.i18n.get('feed_upload')} "
+                    f"{(first - previous[1]) * 8 / elapsed / 1_000_000:.2f} Mbps, "
+                    f"{self.i18n.get('feed_download')} "
+                    f"{(second - previous[2]) * 8 / elapsed / 1_000_000:.2f} Mbps"
+                )
+            self.feed_usage = (timestamp, first, second)
+        if samples and (self.feed_rates or self.feed_speed):
+            self.feed_status_label.setText(
+                "   ".join(text for text in (self.feed_rates, self.feed_speed) if text)
+            )
+
+    def open_catalog(self):
+        """
+        Get the results catalog, opening it on first use.
+
+        Returns:
+            ResultsCatalog: The catalog of the results/ directory.
+        """
+        if self.catalog is None:
+            from util.results_catalog import ResultsCatalog
+
+            self.catalog = ResultsCatalog()
+        return self.catalog
+
+    def catalog_headers(self):
+        return [
+            self.i18n.get("catalog_file"),
+            self.i18n.get("catalog_kind"),
+            self.i18n.get("catalog_host"),
+            self.i18n.get("catalog_start"),
+            self.i18n.get("catalog_end"),
+            self.i18n.get("catalog_rows"),
+        ]
+
+    def find_results(self):
+        """
+        Bring the results catalog up to date and list the files of the
+        selected kind with data in the selected date range.
+        """
+        try:
+            catalog = self.open_catalog()
+            catalog.refresh()
+
+            kind = self.catalog_kind_combo.currentText()
+            kinds = catalog.kinds()
+            self.catalog_kind_combo.blockSignals(True)
+            self.catalog_kind_combo.clear()
+            self.catalog_kind_combo.addItem(self.i18n.get("catalog_all"))
+            self.catalog_kind_combo.addItems(kinds)
+            if kind in kinds:
+                self.catalog_kind_combo.setCurrentText(kind)
+            self.catalog_kind_combo.blockSignals(False)
+
+            entries = catalog.find(
+                kind if kind in kinds else None,
+                start=self.catalog_from_input.date().toString("yyyy-MM-dd"),
+                end=self.catalog_to_input.date().toString("yyyy-MM-dd"),
+            )
+            self.catalog_table.setRowCount(len(entries))
+            for row, entry in enumerate(entries):
+                rows_item = QTableWidgetItem(f"{entry['rows']:,}")
+                rows_item.setToolTip(
+                    "\n".join(
+                        f"{name}: {', '.join(values)}"
+                        for name, values in entry["labels"].items()
+                    )
+                )
+                file_item = QTableWidgetItem(os.path.basename(entry["path"]))
+                file_item.setToolTip(entry["path"])
+                for column, item in enumerate(
+                    (
+                        file_item,
+                        QTableWidgetItem(entry["kind"]),
+                        QTableWidgetItem(entry["host"]),
+                        QTableWidgetItem(entry["start_time"] or ""),
+                        QTableWidgetItem(entry["end_time"] or ""),
+                        rows_item,
+                    )
+                ):
+                    self.catalog_table.setItem(row, column, item)
+            self.catalog_table.resizeColumnsToContents()
+        except Exception as e:
+            QMessageBox.critical(
+                self, "InternalError", f"An internal error occurred: {e}"
+            )
+            logging.error(f"An internal error occurred during find_results: {e}")
+
+    def plot_selected_results(self):
+        """
+        Plot the files selected in the results catalog table.
+        """
+        rows = sorted({index.row() for index in self.catalog_table.selectedIndexes()})
+        files = [self.catalog_table.item(row, 0).toolTip() for row in rows]
+        kinds = [self.catalog_table.item(row, 1).text() for row in rows]
+        if files:
+            self.plot_files(files, kinds)
+
+    def plot_files(self, files, kinds=None):
+        """
+        Plot the selected files in the plot area, each as its kind of results.
 
         Args:
             files (list of str): List of file paths to plot.
+            kinds (list of str): Kind of each file, e.g. "network_usage", from
+                the file names by default.
         """
+        from util.results_catalog import metric_of
+
         try:
             self.plot_area.clear()
-            for file in files:
+            if kinds is None:
+                kinds = [metric_of(file) for file in files]
+            unplotted = []
+            for file, kind in zip(files, kinds):
+                if kind.startswith("replay_"):
+                    kind = kind[len("replay_") :]
+                if kind in ("flows", "top_talkers"):
+                    self.show_top_talkers(file)
+                    continue
+                plot = {
+                    "network_usage": self.plotter.plot_usage_graph,
+                    "speed_measurement": self.plotter.plot_speed_graph,
+                    "tcp_quality": self.plotter.plot_tcp_quality_graph,
+                }.get(kind)
+                if plot is None:
+                    unplotted.append(f"{os.path.basename(file)} ({kind})")
+                    continue
                 tab = QWidget()
                 layout = QVBoxLayout()
 
@@ -610,21 +1069,75 @@ class NetworkAnalyzerGUI(QWidget):
                 canvas = FigureCanvas(figure)
                 ax = figure.add_subplot(111)
 
-                if "speed" in file:
-                    self.plotter.plot_speed_graph(file, ax, self.xtick_interval)
-                elif "usage" in file:
-                    self.plotter.plot_usage_graph(file, ax, self.xtick_interval)
+                plot(file, ax, self.xtick_interval)
 
                 layout.addWidget(canvas)
 
                 tab.setLayout(layout)
                 self.plot_area.addTab(tab, os.path.basename(file))
+            if unplotted:
+                QMessageBox.information(
+                    self,
+                    "Information",
+                    self.i18n.get("no_plot_for_kind") + "\n" + "\n".join(unplotted),
+                )
         except Exception as e:
             QMessageBox.critical(
                 self, "InternalError", f"An internal error occurred: {e}"
             )
             logging.error(f"An internal error occurred during plot_files: {e}")
 
+    def show_top_talkers(self, file, count=20):
+        """
+        Show the top talkers of a saved summary or a flows file as a ranked table.
+
+        Args:
+            file (str): A *_top_talkers.json or *_flows.csv file.
+            count (int): Number of entries per dimension.
+        """
+        from network_analyzer.top_talkers import DIMENSION_TITLES, TopTalkers
+
+        top_talkers = TopTalkers.load(file)
+        tables = top_talkers.table(count)
+
+        table = QTableWidget(sum(len(rows) for rows in tables.values()), 5)
+        table.setHorizontalHeaderLabels(
+            [
+                self.i18n.get("top_talkers_dimension"),
+                "#",
+                self.i18n.get("top_talkers_value"),
+                self.i18n.get("top_talkers_bytes"),
+                self.i18n.get("top_talkers_share"),
+            ]
+        )
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        row = 0
+        for dimension, rows in tables.items():
+            total = top_talkers.windows[dimension].total() or 1
+            for rank, (value, byte_count, error) in enumerate(rows, 1):
+                bytes_item = QTableWidgetItem(f"{byte_count:,}")
+                bytes_item.setToolTip(f"± {error:,}")
+                for column, item in enumerate(
+                    (
+                        QTableWidgetItem(DIMENSION_TITLES[dimension]),
+                        QTableWidgetItem(str(rank)),
+                        QTableWidgetItem(str(value)),
+                        bytes_item,
+                        QTableWidgetItem(f"{byte_count / total:.1%}"),
+                    )
+                ):
+                    table.setItem(row, column, item)
+                row += 1
+        table.resizeColumnsToContents()
+
+        tab = QWidget()
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"{self.i18n.get('top_talkers')}: {file}"))
+        layout.addWidget(table)
+        tab.setLayout(layout)
+        self.plot_area.addTab(tab, os.path.basename(file))
+
 
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
@@ -1,3 +1,54 @@
-from .menu import Menu
-from .network_speed_analyzer import NetworkSpeedAnalyzer
-from .network_usage_analyzer import NetworkUsageAnalyzer
+import importlib
+
+# Submodules are imported on first attribute access, so collection-only code
+# paths never pay for the alerting, exporter or replay imports they don't use.
+_LAZY_ATTRIBUTES = {
+    "Menu": ".menu",
+    "NetworkSpeedAnalyzer": ".network_speed_analyzer",
+    "NetworkUsageAnalyzer": ".network_usage_analyzer",
+    "AdaptiveInterval": ".network_usage_analyzer",
+    "AlertEngine": ".alert_engine",
+    "ThresholdRule": ".alert_engine",
+    "QuotaRule": ".alert_engine",
+    "MetricsRegistry": ".metrics_exporter",
+    "MetricsExporter": ".metrics_exporter",
+    "Replayer": ".replay",
+    "MockPsutil": ".replay",
+    "MockSpeedtest": ".replay",
+    "Daemon": ".daemon",
+    "PerNicUsageAnalyzer": ".per_nic_usage_analyzer",
+    "LatencyAnalyzer": ".latency_analyzer",
+    "SharedSampleFeed": ".shared_feed",
+    "NamespaceUsageAnalyzer": ".namespace_usage_analyzer",
+    "ProcessUsageAnalyzer": ".process_usage_analyzer",
+    "TcpQualityAnalyzer": ".tcp_quality_analyzer",
+    "CompressedSeries": ".compressed_series",
+    "SeriesStore": ".compressed_series",
+    "FlowAnalyzer": ".flow_analyzer",
+    "FlowTable": ".flow_analyzer",
+    "PcapReader": ".pcap_reader",
+    "TopTalkers": ".top_talkers",
+    "SpaceSaving": ".top_talkers",
+    "HostnameExtractor": ".hostname_extractor",
+    "HostnameCache": ".hostname_extractor",
+    "FleetAggregator": ".fleet_aggregator",
+    "PushAgent": ".push_transport",
+    "PushAggregator": ".push_transport",
+    "SpeedTestScheduler": ".speed_test_scheduler",
+    "subtract_test_traffic": ".speed_test_scheduler",
+    "MultiServerSpeedAnalyzer": ".multi_server_speed",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
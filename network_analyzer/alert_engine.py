@@ -0,0 +1,445 @@
+import json
+import logging
+import operator
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+ALERT_ENGINE = "ALERT ENGINE"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class SlidingWindow:
+    """
+    Time-based sliding window with O(1) amortized updates.
+
+    Keeps a running sum for the average and monotonic deques for the
+    minimum and maximum, so every aggregate is available without rescanning
+    the samples inside the window.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self.max_deque = deque()
+        self.min_deque = deque()
+        self.total = 0.0
+
+    def push(self, timestamp, value):
+        """
+        Add a sample and evict the samples that fell out of the window.
+
+        Args:
+            timestamp (float): Sample time in seconds since the epoch.
+            value (float): Sample value.
+        """
+        self.samples.append((timestamp, value))
+        self.total += value
+
+        while self.max_deque and self.max_deque[-1][1] <= value:
+            self.max_deque.pop()
+        self.max_deque.append((timestamp, value))
+
+        while self.min_deque and self.min_deque[-1][1] >= value:
+            self.min_deque.pop()
+        self.min_deque.append((timestamp, value))
+
+        cutoff = timestamp - self.seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            _, old_value = self.samples.popleft()
+            self.total -= old_value
+        while self.max_deque and self.max_deque[0][0] < cutoff:
+            self.max_deque.popleft()
+        while self.min_deque and self.min_deque[0][0] < cutoff:
+            self.min_deque.popleft()
+
+    def get(self, aggregate):
+        """
+        Get an aggregate over the samples currently in the window.
+
+        Args:
+            aggregate (str): One of "last", "avg", "min", "max", "sum", "count".
+
+        Returns:
+            float: The aggregate value, or None if the window is empty.
+        """
+        if not self.samples:
+            return None
+        if aggregate == "last":
+            return self.samples[-1][1]
+        if aggregate == "avg":
+            return self.total / len(self.samples)
+        if aggregate == "sum":
+            return self.total
+        if aggregate == "count":
+            return len(self.samples)
+        if aggregate == "max":
+            return self.max_deque[0][1]
+        if aggregate == "min":
+            return self.min_deque[0][1]
+        raise ValueError(f"Unknown aggregate: {aggregate}")
+
+
+class ThresholdRule:
+    """
+    Fires when a metric (optionally aggregated over a window) crosses a
+    threshold and stays there for `for_seconds`.
+
+    Example: "sent_mbps > 900 for 30 s" is
+    ThresholdRule("uplink_high", "sent_mbps", ">", 900, for_seconds=30).
+    """
+
+    def __init__(
+        self,
+        name,
+        metric,
+        op,
+        threshold,
+        for_seconds=0,
+        window=0,
+        aggregate="last",
+    ):
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator: {op}")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.for_seconds = for_seconds
+        self.aggregate = aggregate
+        self.window = SlidingWindow(window) if window > 0 else None
+        self.breach_started = None
+        self.firing = False
+
+    def describe(self):
+        text = f"{self.metric} {self.op} {self.threshold}"
+        if self.window is not None:
+            text = f"{self.aggregate}({self.metric}, {self.window.seconds}s) {self.op} {self.threshold}"
+        if self.for_seconds:
+            text += f" for {self.for_seconds}s"
+        return text
+
+    def evaluate(self, timestamp, metrics):
+        """
+        Evaluate the rule against one sample.
+
+        Args:
+            timestamp (float): Sample time in seconds since the epoch.
+            metrics (dict): Metric name to value for this sample.
+
+        Returns:
+            tuple: (state, value) where state is "firing", "resolved" or None
+            when nothing changed.
+        """
+        value = metrics.get(self.metric)
+        if value is None:
+            return None, None
+
+        if self.window is not None:
+            self.window.push(timestamp, value)
+            value = self.window.get(self.aggregate)
+
+        if OPERATORS[self.op](value, self.threshold):
+            if self.breach_started is None:
+                self.breach_started = timestamp
+            if (
+                not self.firing
+                and timestamp - self.breach_started >= self.for_seconds
+            ):
+                self.firing = True
+                return "firing", value
+        else:
+            self.breach_started = None
+            if self.firing:
+                self.firing = False
+                return "resolved", value
+        return None, value
+
+
+class QuotaRule:
+    """
+    Fires when the sum of a metric over the current calendar period
+    ("hour", "day" or "month") exceeds `limit`.
+
+    Example: "monthly egress > 2 TB" is
+    QuotaRule("monthly_egress", "sent_bytes", 2e12, period="month").
+    """
+
+    PERIOD_FORMATS = {"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d", "month": "%Y-%m"}
+
+    def __init__(self, name, metric, limit, period="month"):
+        if period not in self.PERIOD_FORMATS:
+            raise ValueError(f"Unknown quota period: {period}")
+        self.name = name
+        self.metric = metric
+        self.limit = limit
+        self.period = period
+        self.current_period = None
+        self.total = 0
+        self.firing = False
+
+    def describe(self):
+        period = {"hour": "hourly", "day": "daily", "month": "monthly"}[self.period]
+        return f"{period} sum({self.metric}) > {self.limit}"
+
+    def evaluate(self, timestamp, metrics):
+        """
+        Evaluate the rule against one sample.
+
+        Args:
+            timestamp (float): Sample time in seconds since the epoch.
+            metrics (dict): Metric name to value for this sample.
+
+        Returns:
+            tuple: (state, value) where state is "firing", "resolved" or None
+            when nothing changed.
+        """
+        value = metrics.get(self.metric)
+        if value is None:
+            return None, None
+
+        period = datetime.fromtimestamp(timestamp).strftime(
+            self.PERIOD_FORMATS[self.period]
+        )
+        state = None
+        if period != self.current_period:
+            self.current_period = period
+            self.total = 0
+            if self.firing:
+                self.firing = False
+                state = "resolved"
+
+        self.total += value
+        if not self.firing and self.total > self.limit:
+            self.firing = True
+            state = "firing"
+        return state, self.total
+
+
+class LogAlertSink:
+    """
+    Writes alerts to a logger.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger if logger is not None else default_logger
+
+    def send(self, alert):
+        if alert["state"] == "firing":
+            self.logger.warning(
+                f"Alert {alert['rule']} firing: {alert['condition']} (value {alert['value']})"
+            )
+        else:
+            self.logger.info(
+                f"Alert {alert['rule']} resolved: {alert['condition']} (value {alert['value']})"
+            )
+
+
+class FileAlertSink:
+    """
+    Appends alerts to a file, one JSON object per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def send(self, alert):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(alert) + "\n")
+
+
+class WebhookAlertSink:
+    """
+    POSTs alerts as JSON to a URL.
+
+    Requests are sent from a background thread so a slow or unreachable
+    endpoint never delays sampling.
+    """
+
+    def __init__(self, url, timeout=5, logger=None):
+        self.url = url
+        self.timeout = timeout
+        self.logger = logger if logger is not None else default_logger
+
+    def send(self, alert):
+        threading.Thread(target=self._post, args=(alert,), daemon=True).start()
+
+    def _post(self, alert):
+        try:
+            import urllib.request
+
+            request = urllib.request.Request(
+                self.url,
+                data=json.dumps(alert).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except Exception as e:
+            self.logger.error(f"Error sending alert to {self.url}: {e}")
+
+
+class AlertEngine:
+    """
+    Evaluates alert rules incrementally against the live sample stream.
+
+    Usage samples are cumulative byte counters, so the engine turns them into
+    per-interval deltas (`sent_bytes`, `recv_bytes`) and rates (`sent_mbps`,
+    `recv_mbps`) before evaluating the rules. Speed samples are exposed as
+    `download_mbps` and `upload_mbps`.
+    """
+
+    def __init__(self, rules=None, sinks=None, logger=None):
+        self.rules = rules if rules is not None else []
+        self.logger = logger if logger is not None else default_logger
+        self.sinks = sinks if sinks is not None else [LogAlertSink(self.logger)]
+        self.last_usage = None
+
+    @classmethod
+    def from_config(cls, config_file, logger=None):
+        """
+        Build an engine from a JSON config file.
+
+        The file contains a "rules" list (each rule has a "type" of
+        "threshold" or "quota" plus the constructor arguments of the matching
+        rule class) and an optional "sinks" list (each sink has a "type" of
+        "log", "file" or "webhook").
+
+        Args:
+            config_file (str): Path to the JSON config file.
+            logger (Logger): Logger for the engine and the log sink.
+
+        Returns:
+            AlertEngine: The configured engine.
+        """
+        with open(config_file, "r", encoding="utf-8") as file:
+            config = json.load(file)
+
+        rules = []
+        for rule in config.get("rules", []):
+            rule = dict(rule)
+            rule_type = rule.pop("type", "threshold")
+            if rule_type == "threshold":
+                rules.append(ThresholdRule(**rule))
+            elif rule_type == "quota":
+                rules.append(QuotaRule(**rule))
+            else:
+                raise ValueError(f"Unknown rule type: {rule_type}")
+
+        sinks = []
+        for sink in config.get("sinks", [{"type": "log"}]):
+            sink_type = sink.get("type", "log")
+            if sink_type == "log":
+                sinks.append(LogAlertSink(logger))
+            elif sink_type == "file":
+                sinks.append(FileAlertSink(sink["path"]))
+            elif sink_type == "webhook":
+                sinks.append(
+                    WebhookAlertSink(sink["url"], sink.get("timeout", 5), logger)
+                )
+            else:
+                raise ValueError(f"Unknown sink type: {sink_type}")
+
+        return cls(rules, sinks, logger)
+
+    def observe_usage(self, sent_bytes, recv_bytes, timestamp=None):
+        """
+        Feed a cumulative usage sample from NetworkUsageAnalyzer.
+
+        Args:
+            sent_bytes (int): Total bytes sent.
+            recv_bytes (int): Total bytes received.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        previous = self.last_usage
+        self.last_usage = (timestamp, sent_bytes, recv_bytes)
+        if previous is None:
+            return
+
+        elapsed = timestamp - previous[0]
+        sent_delta = sent_bytes - previous[1]
+        recv_delta = recv_bytes - previous[2]
+        # Counters went backwards (reboot or wrap), skip this interval
+        if elapsed <= 0 or sent_delta < 0 or recv_delta < 0:
+            return
+
+        self.observe(
+            {
+                "sent_bytes": sent_delta,
+                "recv_bytes": recv_delta,
+                "sent_mbps": sent_delta * 8 / elapsed / 1_000_000,
+                "recv_mbps": recv_delta * 8 / elapsed / 1_000_000,
+            },
+            timestamp,
+        )
+
+    def observe_speed(self, download_speed, upload_speed, timestamp=None):
+        """
+        Feed a speed sample from NetworkSpeedAnalyzer.
+
+        Args:
+            download_speed (float): Download speed in bits per second.
+            upload_speed (float): Upload speed in bits per second.
+            timestamp (float): Sample time, defaults to now.
+        """
+        self.observe(
+            {
+                "download_mbps": download_speed / 1_000_000,
+                "upload_mbps": upload_speed / 1_000_000,
+            },
+            timestamp,
+        )
+
+    def observe(self, metrics, timestamp=None):
+        """
+        Evaluate every rule against one sample and dispatch state changes.
+
+        Args:
+            metrics (dict): Metric name to value.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for rule in self.rules:
+            state, value = rule.evaluate(timestamp, metrics)
+            if state is not None:
+                self.dispatch(
+                    {
+                        "rule": rule.name,
+                        "state": state,
+                        "condition": rule.describe(),
+                        "value": value,
+                        "timestamp": datetime.fromtimestamp(timestamp).strftime(
+                            "%Y-%m-%d %H:%M:%S"
+                        ),
+                    }
+                )
+
+    def dispatch(self, alert):
+        for sink in self.sinks:
+            try:
+                sink.send(alert)
+            except Exception as e:
+                self.logger.error(f"Error dispatching alert {alert['rule']}: {e}")
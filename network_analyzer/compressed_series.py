@@ -0,0 +1,334 @@
+import struct
+from bisect import bisect_left, bisect_right
+
+COMPRESSED_SERIES = "COMPRESSED SERIES"
+
+# Samples per block. Full blocks are sealed into immutable bytes
+BLOCK_SIZE = 1_024
+
+DOUBLE = struct.Struct(">d")
+UINT64 = struct.Struct(">Q")
+
+# Delta-of-delta buckets: (control bits, control length, value bits)
+TIMESTAMP_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+)
+TIMESTAMP_ESCAPE = (0b1111, 4, 64)
+
+
+def float_bits(value):
+    return UINT64.unpack(DOUBLE.pack(value))[0]
+
+
+class BlockEncoder:
+    """
+    Gorilla encoding of one block of (tick, value) samples, after Pelkonen
+    et al., "Gorilla: A Fast, Scalable, In-Memory Time Series Database".
+
+    Timestamps are integer ticks stored as the delta of their delta, so a
+    regular cadence costs one bit per sample. Values are XORed with the
+    previous one and only the meaningful bits between the leading and
+    trailing zeros are kept, reusing the previous window when they fit, so
+    an unchanged value costs one bit and a slowly moving one a few.
+
+    Bits are gathered in a small integer and flushed to the buffer a byte
+    at a time, so appending never copies the block.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pending = 0
+        self.pending_bits = 0
+        self.count = 0
+        self.first_tick = None
+        self.last_tick = None
+        self.last_delta = 0
+        self.last_bits = 0
+        self.leading = -1
+        self.trailing = 0
+
+    def write(self, value, bits):
+        pending_bits = self.pending_bits + bits
+        pending = (self.pending << bits) | value
+        if pending_bits >= 64:
+            rest = pending_bits & 7
+            self.buffer += (pending >> rest).to_bytes(pending_bits >> 3, "big")
+            pending &= (1 << rest) - 1
+            pending_bits = rest
+        self.pending = pending
+        self.pending_bits = pending_bits
+
+    def append(self, tick, value):
+        bits = float_bits(value)
+        if self.count == 0:
+            self.first_tick = tick
+            self.write(tick & 0xFFFFFFFFFFFFFFFF, 64)
+            self.write(bits, 64)
+        else:
+            delta = tick - self.last_tick
+            self.write_delta_of_delta(delta - self.last_delta)
+            self.last_delta = delta
+            self.write_xor(bits ^ self.last_bits)
+        self.last_tick = tick
+        self.last_bits = bits
+        self.count += 1
+
+    def write_delta_of_delta(self, dod):
+        if dod == 0:
+            self.write(0, 1)
+            return
+        for control, control_bits, value_bits in TIMESTAMP_BUCKETS:
+            limit = 1 << (value_bits - 1)
+            if -limit < dod <= limit:
+                # Stored as an offset so the range needs no sign bit
+                self.write(control, control_bits)
+                self.write(dod + limit - 1, value_bits)
+                return
+        control, control_bits, value_bits = TIMESTAMP_ESCAPE
+        self.write(control, control_bits)
+        self.write(dod & 0xFFFFFFFFFFFFFFFF, value_bits)
+
+    def write_xor(self, xor):
+        if xor == 0:
+            self.write(0, 1)
+            return
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if self.leading >= 0 and leading >= self.leading and trailing >= self.trailing:
+            meaningful = 64 - self.leading - self.trailing
+            self.write(0b10, 2)
+            self.write(xor >> self.trailing, meaningful)
+            return
+        meaningful = 64 - leading - trailing
+        self.leading = leading
+        self.trailing = trailing
+        self.write(0b11, 2)
+        self.write(leading, 5)
+        # A length of 64 doesn't fit in 6 bits and is written as 0
+        self.write(meaningful & 63, 6)
+        self.write(xor >> trailing, meaningful)
+
+    def to_bytes(self):
+        """
+        Get the encoded block, padded to whole bytes.
+        """
+        data = bytes(self.buffer)
+        if self.pending_bits:
+            pad = -self.pending_bits & 7
+            data += (self.pending << pad).to_bytes(
+                (self.pending_bits + pad) >> 3, "big"
+            )
+        return data
+
+
+def decode_block(data, count):
+    """
+    Decode a block written by BlockEncoder.
+
+    Args:
+        data (bytes): The encoded block.
+        count (int): Number of samples in it.
+
+    Returns:
+        tuple: Lists of ticks and of values.
+    """
+    # Padding lets every read take a fixed-size window
+    data = bytes(data) + bytes(9)
+    from_bytes = int.from_bytes
+    unpack_double = DOUBLE.unpack
+    pack_uint64 = UINT64.pack
+
+    def read(position, bits):
+        start = position >> 3
+        window = from_bytes(data[start : start + 9], "big")
+        return (window >> (72 - (position & 7) - bits)) & ((1 << bits) - 1)
+
+    tick = read(0, 64)
+    if tick >= 1 << 63:
+        tick -= 1 << 64
+    value_bits = read(64, 64)
+    ticks = [tick]
+    values = [unpack_double(pack_uint64(value_bits))[0]]
+    position = 128
+    delta = 0
+    leading = trailing = 0
+    for _ in range(count - 1):
+        # Delta of delta: count the leading ones of the control code
+        if not (data[position >> 3] >> (7 - (position & 7))) & 1:
+            position += 1
+        else:
+            control = read(position, 4)
+            if control < 0b1100:
+                dod = read(position + 2, 7) - 63
+                position += 9
+            elif control < 0b1110:
+                dod = read(position + 3, 9) - 255
+                position += 12
+            elif control == 0b1110:
+                dod = read(position + 4, 12) - 2047
+                position += 16
+            else:
+                dod = read(position + 4, 64)
+                if dod >= 1 << 63:
+                    dod -= 1 << 64
+                position += 68
+            delta += dod
+        tick += delta
+        ticks.append(tick)
+
+        # XOR with the previous value
+        if not (data[position >> 3] >> (7 - (position & 7))) & 1:
+            position += 1
+        else:
+            if read(position + 1, 1):
+                leading = read(position + 2, 5)
+                meaningful = read(position + 7, 6) or 64
+                trailing = 64 - leading - meaningful
+                position += 13
+            else:
+                meaningful = 64 - leading - trailing
+                position += 2
+            value_bits ^= read(position, meaningful) << trailing
+            position += meaningful
+        values.append(unpack_double(pack_uint64(value_bits))[0])
+    return ticks, values
+
+
+class CompressedSeries:
+    """
+    Append-only time series kept Gorilla-compressed in memory.
+
+    Samples go into an open block; every `block_size` samples it is sealed
+    into immutable bytes, with its first and last tick kept aside so range
+    queries only decode the blocks they overlap. Timestamps are quantized
+    to `resolution` seconds. At a 1 Hz cadence a slowly changing counter
+    takes a few bytes per sample instead of the ~100 of a Python float and
+    timestamp pair.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE, resolution=1.0):
+        self.block_size = block_size
+        self.resolution = resolution
+        # (encoded bytes, sample count) per sealed block
+        self.blocks = []
+        self.first_ticks = []
+        self.last_ticks = []
+        self.open = BlockEncoder()
+        self.count = 0
+
+    def append(self, timestamp, value):
+        """
+        Add a sample.
+
+        Args:
+            timestamp (float): Seconds since the epoch, not before the previous sample.
+            value (float): Sample value, None for a missed sample.
+        """
+        tick = round(timestamp / self.resolution)
+        if self.open.last_tick is not None and tick < self.open.last_tick:
+            raise ValueError("Samples must be appended in time order")
+        self.open.append(tick, float("nan") if value is None else value)
+        self.count += 1
+        if self.open.count == self.block_size:
+            self.seal()
+
+    def seal(self):
+        self.blocks.append((self.open.to_bytes(), self.open.count))
+        self.first_ticks.append(self.open.first_tick)
+        self.last_ticks.append(self.open.last_tick)
+        last_tick = self.open.last_tick
+        self.open = BlockEncoder()
+        # Kept so the order check spans blocks
+        self.open.last_tick = last_tick
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the encoded samples.
+        """
+        return (
+            sum(len(data) for data, _ in self.blocks)
+            + len(self.open.buffer)
+            + (self.open.pending_bits + 7) // 8
+        )
+
+    def to_arrays(self, start=None, end=None):
+        """
+        Decode the samples between `start` and `end` into NumPy arrays.
+
+        Args:
+            start (float): Earliest timestamp, inclusive, or None.
+            end (float): Latest timestamp, inclusive, or None.
+
+        Returns:
+            tuple: float64 arrays of timestamps in seconds and of values.
+        """
+        import numpy as np
+
+        first = 0
+        last = len(self.blocks)
+        if start is not None:
+            first = bisect_left(self.last_ticks, start / self.resolution)
+        if end is not None:
+            last = bisect_right(self.first_ticks, end / self.resolution)
+        parts = [decode_block(*block) for block in self.blocks[first:last]]
+        if self.open.count and (
+            end is None or self.open.first_tick <= end / self.resolution
+        ):
+            parts.append(decode_block(self.open.to_bytes(), self.open.count))
+
+        ticks = []
+        values = []
+        for part_ticks, part_values in parts:
+            ticks += part_ticks
+            values += part_values
+        ticks = np.array(ticks, dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        timestamps = ticks * self.resolution
+        if start is not None or end is not None:
+            mask = np.ones(len(ticks), dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            timestamps, values = timestamps[mask], values[mask]
+        return timestamps, values
+
+
+class SeriesStore:
+    """
+    Named CompressedSeries, e.g. "sent_bytes" or "eth0/recv_bytes", filled
+    by the analyzers' write_to_csv as samples are stored.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE, resolution=1.0):
+        self.block_size = block_size
+        self.resolution = resolution
+        self.series = {}
+
+    def append(self, name, timestamp, value):
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = CompressedSeries(
+                self.block_size, self.resolution
+            )
+        series.append(timestamp, value)
+
+    def to_arrays(self, name, start=None, end=None):
+        """
+        Returns:
+            tuple: float64 arrays of timestamps and values of series `name`.
+        """
+        return self.series[name].to_arrays(start, end)
+
+    def names(self):
+        return sorted(self.series)
+
+    @property
+    def nbytes(self):
+        return sum(series.nbytes for series in self.series.values())
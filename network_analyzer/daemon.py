@@ -0,0 +1,468 @@
+import copy
+import functools
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+from util import instrumentation
+from util.logger import setup_logger
+from .network_usage_analyzer import AdaptiveInterval, NetworkUsageAnalyzer
+from .network_speed_analyzer import NetworkSpeedAnalyzer
+from .per_nic_usage_analyzer import PerNicUsageAnalyzer
+from .latency_analyzer import LatencyAnalyzer, parse_target
+from .namespace_usage_analyzer import NamespaceUsageAnalyzer
+from .process_usage_analyzer import ProcessUsageAnalyzer, top_processes
+from .tcp_quality_analyzer import TcpQualityAnalyzer
+
+DAEMON = "DAEMON"
+
+# Intervals are in seconds, 0 disables a collector. An adaptive usage
+# collector starts at its interval and moves between min and max_interval.
+# A traffic-aware speed collector defers tests while the link is busy, see
+# SpeedTestScheduler. Speed servers, speedtest.net ids or http(s):// URLs,
+# replace the single best server, see MultiServerSpeedAnalyzer
+DEFAULT_CONFIG = {
+    "collectors": {
+        "usage": {
+            "interval": 60,
+            "adaptive": False,
+            "min_interval": 1,
+            "max_interval": 60,
+        },
+        "per_nic": {"interval": 0, "interfaces": []},
+        "speed": {
+            "interval": 3600,
+            "traffic_aware": False,
+            "jitter": 300,
+            "busy_fraction": 0.1,
+            "daily_budget_mb": 0,
+            "servers": [],
+            "mode": "concurrent",
+            "stagger": 0,
+        },
+        "latency": {"interval": 0, "targets": ["1.1.1.1:443"], "timeout": 2.0},
+        "namespaces": {"interval": 0, "discovery_interval": 30},
+        "processes": {"interval": 0, "top": 10, "full_scan_interval": 300},
+        "tcp_quality": {"interval": 0},
+    },
+    "alerts": "alerts.json",
+    "metrics_port": 0,
+    "self_instrumentation": False,
+    "shared_feed": "",
+    "push": "",
+    "catalog": "results/catalog.sqlite",
+    "duration": 0,
+}
+
+
+def load_config(config_file=None):
+    """
+    Load a daemon config file on top of DEFAULT_CONFIG.
+
+    Args:
+        config_file (str): Path to a JSON config file, or None for the defaults.
+
+    Returns:
+        dict: The merged config.
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if config_file is None:
+        return config
+    with open(config_file, "r", encoding="utf-8") as file:
+        user_config = json.load(file)
+    for name, collector in user_config.pop("collectors", {}).items():
+        if name not in config["collectors"]:
+            raise ValueError(f"Unknown collector: {name}")
+        config["collectors"][name].update(collector)
+    config.update(user_config)
+    return config
+
+
+class Daemon:
+    """
+    Headless collection without the interactive menu.
+
+    Every enabled collector runs on its own thread with a fixed-rate
+    schedule, so a long speed test never delays usage sampling. Idle threads
+    block on a shared Event, which SIGTERM/SIGINT (or the optional duration)
+    sets for a clean shutdown.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.logger = None
+        self.collectors = {}
+        self.threads = []
+        self.alert_engine = None
+        self.metrics = None
+        self.metrics_exporter = None
+        self.feed = None
+        self.push = None
+        self.catalog = None
+        self.adaptive = None
+        self.speed_scheduler = None
+        self.speed_analyzer = None
+
+    def setup(self):
+        """
+        Create the loggers, analyzers and optional alerting and metrics.
+        """
+        os.makedirs("logs", exist_ok=True)
+        os.makedirs("results", exist_ok=True)
+        now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.logger = setup_logger("daemon", os.path.join("logs", f"{now}_daemon.log"))
+        collectors = self.config["collectors"]
+
+        if self.config["catalog"]:
+            from util.results_catalog import ResultsCatalog
+
+            self.catalog = ResultsCatalog(self.config["catalog"], logger=self.logger)
+
+        if collectors["usage"]["interval"]:
+            if collectors["usage"]["adaptive"]:
+                self.adaptive = AdaptiveInterval(
+                    collectors["usage"]["min_interval"],
+                    collectors["usage"]["max_interval"],
+                )
+            analyzer = NetworkUsageAnalyzer(
+                os.path.join("results", f"{now}_network_usage.csv"),
+                self.logger,
+                catalog=self.catalog,
+                adaptive=self.adaptive,
+            )
+            self.collectors["usage"] = (
+                collectors["usage"]["interval"],
+                functools.partial(self.usage_job, analyzer),
+            )
+
+        if collectors["per_nic"]["interval"]:
+            analyzer = PerNicUsageAnalyzer(
+                os.path.join("results", f"{now}_per_nic_usage.csv"),
+                self.logger,
+                interfaces=collectors["per_nic"]["interfaces"],
+                catalog=self.catalog,
+            )
+            self.collectors["per_nic"] = (
+                collectors["per_nic"]["interval"],
+                functools.partial(self.per_nic_job, analyzer),
+            )
+
+        if collectors["speed"]["interval"]:
+            if collectors["speed"]["traffic_aware"]:
+                from .speed_test_scheduler import SpeedTestScheduler
+
+                self.speed_scheduler = SpeedTestScheduler(
+                    os.path.join("results", f"{now}_speed_tests.csv"),
+                    collectors["speed"]["interval"],
+                    self.logger,
+                    jitter=collectors["speed"]["jitter"],
+                    busy_fraction=collectors["speed"]["busy_fraction"],
+                    daily_budget=collectors["speed"]["daily_budget_mb"] * 1_000_000,
+                )
+                if not collectors["usage"]["interval"]:
+                    self.logger.warning(
+                        "Traffic-aware speed tests need the usage collector "
+                        "to see the traffic, tests won't be deferred"
+                    )
+            if collectors["speed"]["servers"]:
+                from .multi_server_speed import MultiServerSpeedAnalyzer
+
+                analyzer = MultiServerSpeedAnalyzer(
+                    os.path.join("results", f"{now}_speed_measurement.csv"),
+                    collectors["speed"]["servers"],
+                    self.logger,
+                    mode=collectors["speed"]["mode"],
+                    stagger=collectors["speed"]["stagger"],
+                    catalog=self.catalog,
+                )
+                self.speed_analyzer = analyzer
+            else:
+                analyzer = NetworkSpeedAnalyzer(
+                    os.path.join("results", f"{now}_speed_measurement.csv"),
+                    self.logger,
+                    catalog=self.catalog,
+                )
+            self.collectors["speed"] = (
+                collectors["speed"]["interval"],
+                functools.partial(self.speed_job, analyzer),
+            )
+
+        if collectors["latency"]["interval"]:
+            analyzer = LatencyAnalyzer(
+                os.path.join("results", f"{now}_latency.csv"),
+                self.logger,
+                [parse_target(target) for target in collectors["latency"]["targets"]],
+                collectors["latency"]["timeout"],
+            )
+            self.collectors["latency"] = (
+                collectors["latency"]["interval"],
+                functools.partial(self.latency_job, analyzer),
+            )
+
+        if collectors["namespaces"]["interval"]:
+            analyzer = NamespaceUsageAnalyzer(
+                os.path.join("results", f"{now}_namespace_usage.csv"),
+                self.logger,
+                collectors["namespaces"]["discovery_interval"],
+            )
+            self.collectors["namespaces"] = (
+                collectors["namespaces"]["interval"],
+                functools.partial(self.namespace_job, analyzer),
+            )
+
+        if collectors["processes"]["interval"]:
+            analyzer = ProcessUsageAnalyzer(
+                os.path.join("results", f"{now}_process_usage.csv"),
+                self.logger,
+                collectors["processes"]["full_scan_interval"],
+            )
+            self.collectors["processes"] = (
+                collectors["processes"]["interval"],
+                functools.partial(
+                    self.process_job, analyzer, collectors["processes"]["top"]
+                ),
+            )
+
+        if collectors["tcp_quality"]["interval"]:
+            analyzer = TcpQualityAnalyzer(
+                os.path.join("results", f"{now}_tcp_quality.csv"), self.logger
+            )
+            self.collectors["tcp_quality"] = (
+                collectors["tcp_quality"]["interval"],
+                functools.partial(self.tcp_quality_job, analyzer),
+            )
+
+        if self.config["alerts"] and os.path.exists(self.config["alerts"]):
+            from .alert_engine import AlertEngine
+
+            self.alert_engine = AlertEngine.from_config(
+                self.config["alerts"], self.logger
+            )
+
+        if self.config["metrics_port"]:
+            from .metrics_exporter import MetricsRegistry, MetricsExporter
+
+            self.metrics = MetricsRegistry()
+            self.metrics_exporter = MetricsExporter(
+                self.metrics, port=self.config["metrics_port"], logger=self.logger
+            )
+            self.metrics_exporter.start()
+
+        if self.config["shared_feed"]:
+            from .shared_feed import SharedSampleFeed
+
+            self.feed = SharedSampleFeed.create(self.config["shared_feed"])
+            self.logger.info(
+                f"Publishing samples to shared memory {self.config['shared_feed']}"
+            )
+
+        if self.config["push"]:
+            from .push_transport import PushAgent
+
+            self.push = PushAgent(self.config["push"], logger=self.logger)
+            self.push.start()
+
+        if self.config["self_instrumentation"]:
+            instrumentation.enable(os.path.join("logs", f"{now}_stats.json"))
+            # The collectors run in their own threads, not on the main
+            # thread receiving the signal
+            instrumentation.install_signal_handler(threads=True)
+
+    def run(self):
+        """
+        Run the collectors until a stop signal or the configured duration.
+        Must be called from the main thread so it can install signal handlers.
+        """
+        self.setup()
+        if not self.collectors:
+            self.logger.error("No collectors enabled, nothing to do")
+            return
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for name, (interval, job) in self.collectors.items():
+            thread = threading.Thread(
+                target=self.run_collector,
+                args=(name, interval, job),
+                name=f"collector-{name}",
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
+        self.logger.info(
+            "Daemon started: "
+            + ", ".join(
+                f"{name} every {interval}s"
+                for name, (interval, _) in self.collectors.items()
+            )
+        )
+
+        self.stop_event.wait(self.config["duration"] or None)
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.shutdown()
+
+    def stop(self, signum=None, frame=None):
+        self.stop_event.set()
+
+    def shutdown(self):
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        if self.feed:
+            self.feed.close()
+        if self.push:
+            self.push.close()
+        if self.speed_analyzer:
+            self.speed_analyzer.close()
+        if self.catalog:
+            # Picks up the files of the collectors that don't update it live
+            self.catalog.refresh()
+            self.catalog.close()
+        if self.adaptive:
+            self.logger.info(
+                f"Adaptive usage sampling: {self.adaptive.samples} samples, "
+                f"{self.adaptive.effective_rate():.1f} per minute lately"
+            )
+        instrumentation.stop_profiling()
+        instrumentation.write_stats()
+        self.logger.info("Daemon stopped")
+
+    def run_collector(self, name, interval, job):
+        """
+        Run `job` every `interval` seconds until the daemon stops.
+
+        Deadlines are fixed-rate from the start time so ticks don't drift.
+        If a job overruns, the missed ticks are skipped instead of run in a burst.
+        A job may return the interval to its next run, e.g. in adaptive mode.
+        """
+        next_run = time.monotonic()
+        while not self.stop_event.is_set():
+            instrumentation.record_tick(name, interval)
+            try:
+                with instrumentation.profiled():
+                    interval = job() or interval
+            except Exception as e:
+                self.logger.error(f"Error in {name} collector: {e}")
+                if self.metrics:
+                    self.metrics.observe_error(name)
+            next_run += interval
+            now = time.monotonic()
+            if next_run < now:
+                next_run += ((now - next_run) // interval + 1) * interval
+            self.stop_event.wait(next_run - now)
+
+    def usage_job(self, analyzer):
+        sent_bytes, recv_bytes = analyzer.get_network_usage()
+        if sent_bytes is None or recv_bytes is None:
+            if self.metrics:
+                self.metrics.observe_error("usage")
+            return
+        analyzer.write_to_csv(sent_bytes, recv_bytes)
+        if self.speed_scheduler:
+            self.speed_scheduler.observe_usage(time.time(), sent_bytes, recv_bytes)
+        if self.feed:
+            self.feed.publish_usage(sent_bytes, recv_bytes)
+        if self.push:
+            self.push.publish_usage(sent_bytes, recv_bytes)
+        with self.lock:
+            if self.alert_engine:
+                self.alert_engine.observe_usage(sent_bytes, recv_bytes)
+        if self.metrics:
+            self.metrics.observe_usage(sent_bytes, recv_bytes)
+        self.publish_instrumentation()
+        interval = analyzer.next_interval(sent_bytes, recv_bytes)
+        if interval is not None and self.metrics:
+            self.metrics.observe_sampling(
+                "usage", interval, analyzer.adaptive.effective_rate()
+            )
+        return interval
+
+    def per_nic_job(self, analyzer):
+        usage = analyzer.get_network_usage()
+        if usage is None:
+            if self.metrics:
+                self.metrics.observe_error("per_nic")
+            return
+        analyzer.write_to_csv(usage)
+        if self.metrics:
+            self.metrics.observe_interfaces(usage)
+
+    def namespace_job(self, analyzer):
+        usage = analyzer.get_network_usage()
+        if usage is None:
+            if self.metrics:
+                self.metrics.observe_error("namespaces")
+            return
+        analyzer.write_to_csv(usage)
+        if self.metrics:
+            self.metrics.observe_namespaces(usage)
+
+    def process_job(self, analyzer, top):
+        usage = analyzer.get_network_usage()
+        if usage is None:
+            if self.metrics:
+                self.metrics.observe_error("processes")
+            return
+        analyzer.write_to_csv(top_processes(usage, top))
+        if self.metrics:
+            self.metrics.observe_processes(usage)
+
+    def tcp_quality_job(self, analyzer):
+        quality = analyzer.get_tcp_quality()
+        if quality is None:
+            if self.metrics:
+                self.metrics.observe_error("tcp_quality")
+            return
+        if not quality:
+            # The first sample is only a baseline
+            return
+        analyzer.write_to_csv(quality)
+        if self.metrics:
+            self.metrics.observe_tcp_quality(quality)
+
+    def speed_job(self, analyzer):
+        scheduler = self.speed_scheduler
+        if scheduler:
+            delay = scheduler.delay()
+            if delay:
+                return delay
+            scheduler.begin_test()
+        download_speed, upload_speed = analyzer.measure_speed()
+        if scheduler:
+            scheduler.end_test(download_speed, upload_speed, *analyzer.last_test_bytes)
+        if download_speed is None or upload_speed is None:
+            if self.metrics:
+                self.metrics.observe_error("speed")
+            return scheduler.delay() if scheduler else None
+        analyzer.write_to_csv(download_speed, upload_speed)
+        if self.feed:
+            self.feed.publish_speed(download_speed, upload_speed)
+        if self.push:
+            self.push.publish_speed(download_speed, upload_speed)
+        with self.lock:
+            if self.alert_engine:
+                self.alert_engine.observe_speed(download_speed, upload_speed)
+        if self.metrics:
+            self.metrics.observe_speed(download_speed, upload_speed)
+        if scheduler:
+            return scheduler.delay()
+
+    def latency_job(self, analyzer):
+        latencies = analyzer.measure_latency()
+        analyzer.write_to_csv(latencies)
+        if self.metrics:
+            self.metrics.observe_latency(latencies)
+
+    def publish_instrumentation(self):
+        if not instrumentation.enabled:
+            return
+        instrumentation.write_stats()
+        if self.metrics:
+            self.metrics.observe_instrumentation(instrumentation.snapshot())
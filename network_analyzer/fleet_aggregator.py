@@ -0,0 +1,487 @@
+import csv
+import heapq
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+FLEET_AGGREGATOR = "FLEET AGGREGATOR"
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+# Kind of results -> file name suffix and the two value columns
+KINDS = {
+    "usage": ("_network_usage.csv", ("sent_bytes", "recv_bytes")),
+    "speed": ("_speed_measurement.csv", ("download_speed", "upload_speed")),
+}
+
+# A seek by timestamp stops bisecting once the range is this small and
+# scans the rest
+SEEK_WINDOW = 64 * 1024
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+
+def kind_of(path):
+    """
+    Get the kind of a results file from its name, "usage" or "speed", or None.
+    """
+    for kind, (suffix, _) in KINDS.items():
+        if path.endswith(suffix):
+            return kind
+    return None
+
+
+def host_of(path):
+    """
+    Name the host of a results file after its directory, e.g. "web1" for
+    fleet/web1/results/..._network_usage.csv.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.path.basename(directory) == "results":
+        directory = os.path.dirname(directory)
+    return os.path.basename(directory)
+
+
+def percentile(values, p):
+    """
+    Linearly interpolated percentile of sorted values.
+    """
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class EpochConverter:
+    """
+    Converts "%Y-%m-%d %H:%M:%S" timestamps (as bytes) to local epoch
+    seconds. Results are written once per interval, so the date and minute
+    part repeats and only needs strptime once per minute.
+    """
+
+    def __init__(self):
+        self.minutes = {}
+
+    def __call__(self, timestamp):
+        minute = self.minutes.get(timestamp[:16])
+        if minute is None:
+            minute = self.minutes[timestamp[:16]] = datetime.strptime(
+                timestamp[:16].decode(), "%Y-%m-%d %H:%M"
+            ).timestamp()
+        return minute + int(timestamp[17:19])
+
+
+def time_range(path):
+    """
+    Get the first and last timestamps of a results CSV without reading it all.
+
+    Returns:
+        tuple: Timestamps as bytes, or None if the file has no rows.
+    """
+    with open(path, "rb") as file:
+        file.readline()
+        first = file.readline()
+        if not first:
+            return None
+        size = file.seek(0, os.SEEK_END)
+        file.seek(max(size - 4096, 0))
+        lines = file.read().splitlines()
+    last = next(line for line in reversed(lines) if line.count(b",") >= 2)
+    return first[:19], last[:19]
+
+
+def read_rows(path, host, kind, start):
+    """
+    Stream the rows of a results CSV from the last one before `start` on.
+
+    The rows are in time order, so the file is bisected by timestamp rather
+    than read from the top. The row before `start` gives usage counters a
+    baseline to compute the first delta from.
+
+    Args:
+        path (str): The CSV file.
+        host (int): Host index to tag the rows with.
+        kind (str): "usage" or "speed".
+        start (bytes): Timestamp to start at.
+
+    Yields:
+        tuple: (timestamp bytes, host, first value, second value).
+    """
+    with open(path, "rb") as file:
+        columns = file.readline().rstrip().split(b",")
+        first_column, second_column = (
+            columns.index(name.encode()) for name in KINDS[kind][1]
+        )
+        header_end = file.tell()
+        low, high = header_end, file.seek(0, os.SEEK_END)
+        # The first full line after `low` is always before `start`
+        while high - low > SEEK_WINDOW:
+            middle = (low + high) // 2
+            file.seek(middle)
+            file.readline()
+            line = file.readline()
+            if not line or line[:19] >= start:
+                high = middle
+            else:
+                low = middle
+        file.seek(low)
+        if low != header_end:
+            file.readline()
+
+        width = len(columns)
+        for line in file:
+            values = line.split(b",")
+            if len(values) < width:
+                # A row still being written
+                continue
+            yield (
+                values[0],
+                host,
+                float(values[first_column]),
+                float(values[second_column]),
+            )
+
+
+def aggregate_shard(kind, hosts, start, end, interval, percentiles):
+    """
+    Aggregate the samples of every host between `start` and `end`.
+
+    Runs in a worker process. The hosts' rows are merged into one stream in
+    time order with a heap-based k-way merge, so only one row per file and
+    the hosts of the current bucket are held in memory.
+
+    Args:
+        kind (str): "usage" or "speed".
+        hosts (list): Results files of each host, by host index.
+        start (float): Start of the shard in epoch seconds, a bucket boundary.
+        end (float): End of the shard, exclusive, a bucket boundary.
+        interval (int): Bucket length in seconds.
+        percentiles (tuple): Percentiles to compute per bucket.
+
+    Returns:
+        tuple: Bucket rollup rows and per-host partial totals.
+    """
+    start_text = datetime.fromtimestamp(start).strftime(TIMESTAMP_FORMAT).encode()
+    end_text = datetime.fromtimestamp(end).strftime(TIMESTAMP_FORMAT).encode()
+    streams = [
+        read_rows(path, host, kind, start_text)
+        for host, paths in enumerate(hosts)
+        for path in paths
+    ]
+    to_epoch = EpochConverter()
+
+    # usage: [sent, recv, samples, counter resets], speed: [tests, download sum,
+    # upload sum, slowest download]
+    totals = {}
+    last_counters = {}
+    rollups = []
+    bucket = None
+    # usage: host -> [sent, recv], speed: [downloads, uploads]
+    current = {} if kind == "usage" else ([], [])
+
+    def close_bucket():
+        timestamp = datetime.fromtimestamp(bucket).strftime(TIMESTAMP_FORMAT)
+        if kind == "usage":
+            per_host = sorted(sent + recv for sent, recv in current.values())
+            row = {
+                "timestamp": timestamp,
+                "hosts": len(current),
+                "sent_bytes": int(sum(sent for sent, _ in current.values())),
+                "recv_bytes": int(sum(recv for _, recv in current.values())),
+            }
+            for p in percentiles:
+                row[f"p{p}_bytes"] = int(percentile(per_host, p))
+            row["max_bytes"] = int(per_host[-1]) if per_host else 0
+        else:
+            downloads, uploads = sorted(current[0]), sorted(current[1])
+            row = {"timestamp": timestamp, "measurements": len(downloads)}
+            for p in percentiles:
+                row[f"download_p{p}"] = round(percentile(downloads, p), 2)
+            for p in percentiles:
+                row[f"upload_p{p}"] = round(percentile(uploads, p), 2)
+        rollups.append(row)
+
+    for timestamp, host, first, second in heapq.merge(*streams):
+        if timestamp >= end_text:
+            break
+        if kind == "usage":
+            last = last_counters.get(host)
+            last_counters[host] = (first, second)
+            if timestamp < start_text:
+                continue
+            if last is None:
+                # No baseline yet, the host's first sample only starts counting
+                continue
+            total = totals.setdefault(host, [0, 0, 0, 0])
+            sent, recv = first - last[0], second - last[1]
+            if sent < 0 or recv < 0:
+                # Counters restart from zero when the host reboots
+                sent, recv = first, second
+                total[3] += 1
+        elif timestamp < start_text:
+            continue
+
+        epoch = to_epoch(timestamp)
+        sample_bucket = epoch - epoch % interval
+        if sample_bucket != bucket:
+            if bucket is not None:
+                close_bucket()
+            bucket = sample_bucket
+            current = {} if kind == "usage" else ([], [])
+
+        if kind == "usage":
+            total[0] += sent
+            total[1] += recv
+            total[2] += 1
+            host_bucket = current.setdefault(host, [0, 0])
+            host_bucket[0] += sent
+            host_bucket[1] += recv
+        else:
+            total = totals.setdefault(host, [0, 0.0, 0.0, first])
+            total[0] += 1
+            total[1] += first
+            total[2] += second
+            total[3] = min(total[3], first)
+            current[0].append(first)
+            current[1].append(second)
+    if bucket is not None:
+        close_bucket()
+    return rollups, totals
+
+
+class FleetAggregator:
+    """
+    Combines the usage or speed results of many hosts without loading them
+    into memory at once.
+
+    The time range is cut into shards on bucket boundaries and each shard
+    runs in a process pool; within a shard the hosts' files are streamed
+    through a k-way merge by timestamp, seeking straight to the shard start.
+    Since a shard sees every host, the per-bucket percentiles across hosts
+    are exact, and the per-host totals of the shards simply add up.
+
+    Usage files hold cumulative counters, so traffic is the sum of the
+    positive deltas; a counter going down is taken as a reboot.
+    """
+
+    def __init__(
+        self,
+        kind,
+        logger=None,
+        interval=3600,
+        percentiles=DEFAULT_PERCENTILES,
+        jobs=None,
+        shards=None,
+    ):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind of results: {kind}")
+        self.kind = kind
+        self.logger = logger if logger is not None else default_logger
+        self.interval = interval
+        self.percentiles = tuple(percentiles)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.shards = shards or self.jobs * 4
+        # host -> results files
+        self.hosts = {}
+
+    def add(self, path, host=None):
+        """
+        Add a results file, of the host named after its directory by default.
+        """
+        self.hosts.setdefault(host or host_of(path), []).append(path)
+
+    def shard_bounds(self):
+        ranges = [
+            bounds
+            for paths in self.hosts.values()
+            for bounds in map(time_range, paths)
+            if bounds is not None
+        ]
+        if not ranges:
+            return []
+        to_epoch = EpochConverter()
+        first = to_epoch(min(first for first, _ in ranges))
+        last = to_epoch(max(last for _, last in ranges))
+        first -= first % self.interval
+        buckets = int((last - first) // self.interval) + 1
+        step = -(-buckets // self.shards)
+        return [
+            (
+                first + index * self.interval,
+                first + min(index + step, buckets) * self.interval,
+            )
+            for index in range(0, buckets, step)
+        ]
+
+    def aggregate(self):
+        """
+        Returns:
+            dict: "rollups", one row per bucket with fleet totals (usage) or
+            measurement counts (speed) and percentiles across hosts; "hosts",
+            per-host totals ranked busiest (usage) or fastest (speed) first;
+            and fleet-wide "totals".
+        """
+        names = sorted(self.hosts)
+        hosts = [self.hosts[name] for name in names]
+        bounds = self.shard_bounds()
+        rollups = []
+        totals = {}
+        with ProcessPoolExecutor(min(self.jobs, max(len(bounds), 1))) as executor:
+            futures = [
+                executor.submit(
+                    aggregate_shard,
+                    self.kind,
+                    hosts,
+                    start,
+                    end,
+                    self.interval,
+                    self.percentiles,
+                )
+                for start, end in bounds
+            ]
+            # In shard order, so the rollups stay in time order
+            for future in futures:
+                shard_rollups, shard_totals = future.result()
+                rollups += shard_rollups
+                for host, values in shard_totals.items():
+                    total = totals.get(host)
+                    if total is None:
+                        totals[host] = values
+                    elif self.kind == "usage":
+                        totals[host] = [a + b for a, b in zip(total, values)]
+                    else:
+                        totals[host] = [
+                            total[0] + values[0],
+                            total[1] + values[1],
+                            total[2] + values[2],
+                            min(total[3], values[3]),
+                        ]
+        self.logger.info(
+            f"Aggregated {sum(map(len, hosts))} {self.kind} files of {len(names)} "
+            f"hosts in {len(bounds)} shards"
+        )
+        return {
+            "rollups": rollups,
+            "hosts": self.rank_hosts(names, totals),
+            "totals": self.fleet_totals(totals),
+        }
+
+    def rank_hosts(self, names, totals):
+        if self.kind == "usage":
+            ranked = {
+                names[host]: {
+                    "sent_bytes": int(sent),
+                    "recv_bytes": int(recv),
+                    "samples": samples,
+                    "reboots": resets,
+                }
+                for host, (sent, recv, samples, resets) in totals.items()
+            }
+            key = lambda item: item[1]["sent_bytes"] + item[1]["recv_bytes"]
+        else:
+            ranked = {
+                names[host]: {
+                    "measurements": count,
+                    "mean_download": download / count,
+                    "mean_upload": upload / count,
+                    "min_download": slowest,
+                }
+                for host, (count, download, upload, slowest) in totals.items()
+            }
+            key = lambda item: item[1]["mean_download"]
+        return dict(sorted(ranked.items(), key=key, reverse=True))
+
+    def fleet_totals(self, totals):
+        if self.kind == "usage":
+            return {
+                "hosts": len(totals),
+                "sent_bytes": int(sum(total[0] for total in totals.values())),
+                "recv_bytes": int(sum(total[1] for total in totals.values())),
+            }
+        count = sum(total[0] for total in totals.values())
+        return {
+            "hosts": len(totals),
+            "measurements": count,
+            "mean_download": (
+                sum(total[1] for total in totals.values()) / count if count else 0.0
+            ),
+            "mean_upload": (
+                sum(total[2] for total in totals.values()) / count if count else 0.0
+            ),
+        }
+
+    def write_to_csv(self, filename, rollups):
+        """
+        Writes the bucket rollups to a CSV file.
+        Args:
+            filename (str): Path of the CSV file.
+            rollups (list): The "rollups" of aggregate().
+        """
+        try:
+            with open(filename, "w", newline="") as csvfile:
+                if rollups:
+                    writer = csv.DictWriter(csvfile, fieldnames=list(rollups[0]))
+                    writer.writeheader()
+                    writer.writerows(rollups)
+            self.logger.info(f"Data written to {filename}: {len(rollups)} buckets")
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
+
+    def format_report(self, result, count=10):
+        """
+        Render the fleet totals and the host ranking as plain text for the CLI.
+        """
+        totals = result["totals"]
+        lines = []
+        if self.kind == "usage":
+            fleet_bytes = (totals["sent_bytes"] + totals["recv_bytes"]) or 1
+            lines.append(
+                f"Fleet usage: {totals['hosts']} hosts, "
+                f"sent {totals['sent_bytes'] / 1024**3:,.2f} GB, "
+                f"received {totals['recv_bytes'] / 1024**3:,.2f} GB"
+            )
+            lines.append(
+                f"{'#':>3}  {'host':<30} {'sent MB':>14} {'received MB':>14} "
+                f"{'share':>7} {'reboots':>8}"
+            )
+            for rank, (host, stats) in enumerate(
+                list(result["hosts"].items())[:count], 1
+            ):
+                host_bytes = stats["sent_bytes"] + stats["recv_bytes"]
+                lines.append(
+                    f"{rank:>3}  {host:<30} {stats['sent_bytes'] / 1024**2:>14,.1f} "
+                    f"{stats['recv_bytes'] / 1024**2:>14,.1f} "
+                    f"{host_bytes / fleet_bytes:>7.1%} {stats['reboots']:>8}"
+                )
+        else:
+            lines.append(
+                f"Fleet speed: {totals['hosts']} hosts, "
+                f"{totals['measurements']} measurements, mean download "
+                f"{totals['mean_download'] / 1_000_000:.2f} Mbps, mean upload "
+                f"{totals['mean_upload'] / 1_000_000:.2f} Mbps"
+            )
+            lines.append(
+                f"{'#':>3}  {'host':<30} {'tests':>6} {'download':>10} "
+                f"{'upload':>10} {'slowest':>10}"
+            )
+            for rank, (host, stats) in enumerate(
+                list(result["hosts"].items())[:count], 1
+            ):
+                lines.append(
+                    f"{rank:>3}  {host:<30} {stats['measurements']:>6} "
+                    f"{stats['mean_download'] / 1_000_000:>10.2f} "
+                    f"{stats['mean_upload'] / 1_000_000:>10.2f} "
+                    f"{stats['min_download'] / 1_000_000:>10.2f}"
+                )
+        return "\n".join(lines)
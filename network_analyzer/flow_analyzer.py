@@ -0,0 +1,620 @@
+import csv
+import os
+import socket
+import struct
+import time
+from array import array
+from datetime import datetime
+import logging
+from util.instrumentation import instrumentation
+from .hostname_extractor import DNS_PORT, TLS_HANDSHAKE
+from .pcap_reader import (
+    LINKTYPE_ETHERNET,
+    LINKTYPE_IPV4,
+    LINKTYPE_IPV6,
+    LINKTYPE_LINUX_SLL,
+    LINKTYPE_LINUX_SLL2,
+    LINKTYPE_LOOP,
+    LINKTYPE_NULL,
+    LINKTYPE_RAW,
+    PcapReader,
+    new_batch,
+)
+
+FLOW_ANALYZER = "FLOW ANALYZER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8, 0x9100)
+# Offset of the network header per link type
+LINK_HEADER_SIZES = {
+    LINKTYPE_NULL: 4,
+    LINKTYPE_LOOP: 4,
+    LINKTYPE_RAW: 0,
+    LINKTYPE_IPV4: 0,
+    LINKTYPE_IPV6: 0,
+}
+# IPv6 extension headers skipped to find the transport header
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT = 44
+
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTO_SCTP = 132
+PORT_PROTOCOLS = (PROTO_TCP, PROTO_UDP, PROTO_SCTP)
+PROTOCOL_NAMES = {
+    PROTO_ICMP: "icmp",
+    PROTO_TCP: "tcp",
+    PROTO_UDP: "udp",
+    58: "icmpv6",
+    PROTO_SCTP: "sctp",
+}
+
+# Flow keys are ints: addresses, ports and protocol packed together, plus a
+# marker bit for IPv6 so both families share one table
+IPV6_KEY = 1 << 296
+ADDRESSES_V4 = struct.Struct(">Q")
+ADDRESSES_V6 = struct.Struct(">QQQQ")
+PORTS = struct.Struct(">I")
+
+# Fibonacci hashing spreads the packed keys over the slots
+FIBONACCI = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+
+# Bytes captured per packet on a live socket, enough for the headers and
+# the DNS responses and TLS ClientHellos the hostname extractor reads
+CAPTURE_SNAPLEN = 2048
+CAPTURE_BATCH_SIZE = 1024
+ETH_P_ALL = 0x0003
+PACKET_OUTGOING = 4
+ARPHRD_LOOPBACK = 772
+
+
+def decode_flow_key(key):
+    """
+    Unpack a flow key.
+
+    Args:
+        key (int): Key built by FlowAnalyzer.process_batch.
+
+    Returns:
+        tuple: Protocol number, source IP, source port, destination IP, destination port.
+    """
+    proto = key & 0xFF
+    ports = (key >> 8) & 0xFFFFFFFF
+    if key & IPV6_KEY:
+        addresses = ((key >> 40) & ((1 << 256) - 1)).to_bytes(32, "big")
+        family = socket.AF_INET6
+    else:
+        addresses = (key >> 40).to_bytes(8, "big")
+        family = socket.AF_INET
+    half = len(addresses) // 2
+    return (
+        proto,
+        socket.inet_ntop(family, addresses[:half]),
+        ports >> 16,
+        socket.inet_ntop(family, addresses[half:]),
+        ports & 0xFFFF,
+    )
+
+
+class FlowTable:
+    """
+    Open-addressing hash table of 5-tuple flows.
+
+    Keys live in one list and the counters in parallel typed arrays, so a
+    flow costs a few machine words instead of a dict entry plus an object.
+    Collisions are resolved by linear probing and removals shift the
+    following entries back, so lookups never pass over tombstones. The table
+    doubles when half full, up to `max_flows`; past that every flow is
+    exported early instead of growing further.
+
+    Expired flows are appended to `expired` as tuples of key, first and last
+    packet time, packets, bytes and OR-ed TCP flags.
+    """
+
+    def __init__(
+        self, capacity=4_096, idle_timeout=15, active_timeout=300, max_flows=1_048_576
+    ):
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        self.size = 0
+        self.expired = []
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.shift = 64 - (capacity.bit_length() - 1)
+        self.keys = [None] * capacity
+        self.packets = array("Q", bytes(8 * capacity))
+        self.byte_counts = array("Q", bytes(8 * capacity))
+        self.first = array("d", bytes(8 * capacity))
+        self.last = array("d", bytes(8 * capacity))
+        self.flags = array("B", bytes(capacity))
+
+    def slot_of(self, key):
+        return ((hash(key) * FIBONACCI) & MASK64) >> self.shift
+
+    def update(self, key, timestamp, length, flags):
+        """
+        Count a packet of the flow `key`, creating the flow if it's new.
+        """
+        keys = self.keys
+        mask = self.mask
+        slot = ((hash(key) * FIBONACCI) & MASK64) >> self.shift
+        while True:
+            current = keys[slot]
+            if current == key:
+                self.packets[slot] += 1
+                self.byte_counts[slot] += length
+                self.last[slot] = timestamp
+                self.flags[slot] |= flags
+                return
+            if current is None:
+                break
+            slot = (slot + 1) & mask
+
+        keys[slot] = key
+        self.packets[slot] = 1
+        self.byte_counts[slot] = length
+        self.first[slot] = timestamp
+        self.last[slot] = timestamp
+        self.flags[slot] = flags
+        self.size += 1
+        if self.size * 2 > self.capacity:
+            if self.capacity * 2 <= self.max_flows:
+                self.resize(self.capacity * 2)
+            else:
+                self.expire_all()
+
+    def resize(self, capacity):
+        old = (
+            self.keys,
+            self.packets,
+            self.byte_counts,
+            self.first,
+            self.last,
+            self.flags,
+        )
+        self.allocate(capacity)
+        mask = self.mask
+        for key, packets, byte_count, first, last, flags in zip(*old):
+            if key is None:
+                continue
+            slot = self.slot_of(key)
+            while self.keys[slot] is not None:
+                slot = (slot + 1) & mask
+            self.keys[slot] = key
+            self.packets[slot] = packets
+            self.byte_counts[slot] = byte_count
+            self.first[slot] = first
+            self.last[slot] = last
+            self.flags[slot] = flags
+
+    def export(self, slot):
+        if self.packets[slot]:
+            self.expired.append(
+                (
+                    self.keys[slot],
+                    self.first[slot],
+                    self.last[slot],
+                    self.packets[slot],
+                    self.byte_counts[slot],
+                    self.flags[slot],
+                )
+            )
+
+    def move(self, source, target):
+        self.keys[target] = self.keys[source]
+        self.packets[target] = self.packets[source]
+        self.byte_counts[target] = self.byte_counts[source]
+        self.first[target] = self.first[source]
+        self.last[target] = self.last[source]
+        self.flags[target] = self.flags[source]
+
+    def remove(self, slot):
+        """
+        Empty `slot` and shift back the entries probed past it.
+        """
+        keys = self.keys
+        mask = self.mask
+        hole = slot
+        slot = (slot + 1) & mask
+        while keys[slot] is not None:
+            home = self.slot_of(keys[slot])
+            # Move the entry unless its home lies cyclically in (hole, slot]
+            if (slot - home) & mask >= (slot - hole) & mask:
+                self.move(slot, hole)
+                hole = slot
+            slot = (slot + 1) & mask
+        keys[hole] = None
+        self.size -= 1
+
+    @instrumentation.timed("expire_flows")
+    def expire(self, now):
+        """
+        Export flows idle for `idle_timeout` seconds and remove them, and
+        export flows active for `active_timeout` seconds and restart their counters.
+
+        Args:
+            now (float): Current time, in capture time when reading a file.
+        """
+        idle_before = now - self.idle_timeout
+        active_before = now - self.active_timeout
+        idle = []
+        first = self.first
+        last = self.last
+        # At least half the slots are empty, so only the keys are scanned for them
+        for slot, key in enumerate(self.keys):
+            if key is None:
+                continue
+            if last[slot] <= idle_before:
+                idle.append(key)
+            elif first[slot] <= active_before:
+                self.export(slot)
+                self.packets[slot] = 0
+                self.byte_counts[slot] = 0
+                self.flags[slot] = 0
+                self.first[slot] = now
+        # Removal shifts entries around, so look the idle flows up again
+        for key in idle:
+            slot = self.slot_of(key)
+            while self.keys[slot] != key:
+                slot = (slot + 1) & self.mask
+            self.export(slot)
+            self.remove(slot)
+
+    def expire_all(self):
+        """
+        Export every flow and empty the table.
+        """
+        for slot, key in enumerate(self.keys):
+            if key is not None:
+                self.export(slot)
+        self.size = 0
+        self.keys = [None] * self.capacity
+
+
+class FlowAnalyzer:
+    """
+    Packet-level traffic accounting per 5-tuple flow.
+
+    Packets come from pcap/pcapng files or, with CAP_NET_RAW, a live
+    AF_PACKET socket, and are parsed batch by batch straight from the
+    capture buffer: only the header fields are unpacked and each packet
+    costs one int key, no per-packet objects. Flows are kept in a FlowTable
+    and written to CSV when they expire, and optionally counted in a
+    TopTalkers summary. With a HostnameExtractor, DNS responses and TLS
+    ClientHellos seen on the way name the remote end of each flow.
+    """
+
+    def __init__(
+        self,
+        filename,
+        logger=None,
+        idle_timeout=15,
+        active_timeout=300,
+        max_flows=1_048_576,
+        sweep_interval=1.0,
+        top_talkers=None,
+        hostname_extractor=None,
+    ):
+        results_dir = "results"
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        self.filename = filename
+        self.logger = logger if logger is not None else default_logger
+        self.table = FlowTable(
+            idle_timeout=idle_timeout,
+            active_timeout=active_timeout,
+            max_flows=max_flows,
+        )
+        self.sweep_interval = sweep_interval
+        self.next_sweep = None
+        self.packet_count = 0
+        self.byte_count = 0
+        self.skipped = 0
+        self.flow_count = 0
+        self.top_talkers = top_talkers
+        self.hostname_extractor = hostname_extractor
+
+    @instrumentation.timed("process_packets")
+    def process_batch(self, batch):
+        """
+        Account the packets of a PacketBatch to their flows.
+
+        Packets that are not IPv4/IPv6, have a malformed IP header or are
+        truncated before the transport header ports are counted in `skipped`.
+        """
+        buffer = batch.buffer
+        update = self.table.update
+        unpack_v4 = ADDRESSES_V4.unpack_from
+        unpack_v6 = ADDRESSES_V6.unpack_from
+        unpack_ports = PORTS.unpack_from
+        link_header_sizes = LINK_HEADER_SIZES
+        extractor = self.hostname_extractor
+        skipped = 0
+        byte_count = 0
+        next_sweep = self.next_sweep
+        if next_sweep is None and batch.timestamps:
+            next_sweep = batch.timestamps[0] + self.sweep_interval
+
+        for timestamp, linktype, offset, length, wire_length in zip(
+            batch.timestamps,
+            batch.linktypes,
+            batch.offsets,
+            batch.lengths,
+            batch.wire_lengths,
+        ):
+            end = offset + length
+            if linktype == LINKTYPE_ETHERNET:
+                ip = offset + 14
+                if ip > end:
+                    skipped += 1
+                    continue
+                ethertype = (buffer[ip - 2] << 8) | buffer[ip - 1]
+                while ethertype in VLAN_ETHERTYPES and ip + 4 <= end:
+                    ethertype = (buffer[ip + 2] << 8) | buffer[ip + 3]
+                    ip += 4
+                if ethertype != ETHERTYPE_IPV4 and ethertype != ETHERTYPE_IPV6:
+                    skipped += 1
+                    continue
+            elif linktype == LINKTYPE_LINUX_SLL:
+                ip = offset + 16
+            elif linktype == LINKTYPE_LINUX_SLL2:
+                ip = offset + 20
+            elif linktype in link_header_sizes:
+                ip = offset + link_header_sizes[linktype]
+            else:
+                skipped += 1
+                continue
+            if ip >= end:
+                skipped += 1
+                continue
+
+            version = buffer[ip] >> 4
+            if version == 4:
+                header_length = (buffer[ip] & 0x0F) * 4
+                transport = ip + header_length
+                # An IHL under 5 words is malformed
+                if header_length < 20 or transport > end:
+                    skipped += 1
+                    continue
+                proto = buffer[ip + 9]
+                key = unpack_v4(buffer, ip + 12)[0] << 40 | proto
+                # Later fragments carry no transport header
+                if (buffer[ip + 6] & 0x1F) | buffer[ip + 7]:
+                    update(key, timestamp, wire_length, 0)
+                    byte_count += wire_length
+                    continue
+            elif version == 6:
+                transport = ip + 40
+                if transport > end:
+                    skipped += 1
+                    continue
+                proto = buffer[ip + 6]
+                while proto in IPV6_EXTENSION_HEADERS and transport + 8 <= end:
+                    proto = buffer[transport]
+                    transport += (buffer[transport + 1] + 1) * 8
+                if proto == IPV6_FRAGMENT and transport + 8 <= end:
+                    proto = buffer[transport]
+                    transport += 8
+                a, b, c, d = unpack_v6(buffer, ip + 8)
+                key = (
+                    IPV6_KEY | (a << 232) | (b << 168) | (c << 104) | (d << 40) | proto
+                )
+            else:
+                skipped += 1
+                continue
+
+            flags = 0
+            if proto in PORT_PROTOCOLS and transport + 4 <= end:
+                ports = unpack_ports(buffer, transport)[0]
+                key |= ports << 8
+                if proto == PROTO_TCP and transport + 14 <= end:
+                    flags = buffer[transport + 13]
+                    if extractor is not None:
+                        payload = transport + (buffer[transport + 12] >> 4) * 4
+                        if payload < end and (
+                            buffer[payload] == TLS_HANDSHAKE
+                            or (extractor.pending and key in extractor.pending)
+                        ):
+                            extractor.tls(
+                                key, buffer, payload, end, version, ip, timestamp
+                            )
+                elif (
+                    extractor is not None
+                    and proto == PROTO_UDP
+                    and ports >> 16 == DNS_PORT
+                ):
+                    extractor.dns(buffer, transport + 8, end, timestamp)
+            update(key, timestamp, wire_length, flags)
+            byte_count += wire_length
+
+            if timestamp >= next_sweep:
+                self.table.expire(timestamp)
+                next_sweep = timestamp + self.sweep_interval
+
+        self.next_sweep = next_sweep
+        self.packet_count += len(batch.offsets) - skipped
+        self.byte_count += byte_count
+        self.skipped += skipped
+        if self.table.expired:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the expired flows to the CSV file and count them in the top talkers.
+        """
+        flows, self.table.expired = self.table.expired, []
+        self.flow_count += len(flows)
+        self.write_to_csv(flows)
+        if self.top_talkers is not None:
+            self.top_talkers.observe_flows(flows, self.hostnames())
+
+    def hostnames(self):
+        if self.hostname_extractor is None:
+            return None
+        return self.hostname_extractor.cache
+
+    def finish(self):
+        """
+        Export the flows still in the table, e.g. at the end of a capture file.
+        """
+        self.table.expire_all()
+        self.flush()
+        self.logger.info(
+            f"{self.packet_count} packets ({self.byte_count} bytes) in {self.flow_count} flows, "
+            f"{self.skipped} packets skipped"
+        )
+
+    def analyze_file(self, path):
+        """
+        Account every packet of a pcap or pcapng file.
+
+        Args:
+            path (str): Capture file.
+
+        Returns:
+            int: Number of packets accounted.
+        """
+        reader = PcapReader(path)
+        for batch in reader:
+            self.process_batch(batch)
+        self.skipped += reader.malformed
+        self.finish()
+        return self.packet_count
+
+    def capture(self, interface=None, duration=None, stop_event=None):
+        """
+        Account live traffic from an AF_PACKET socket (Linux, needs CAP_NET_RAW).
+
+        Args:
+            interface (str): Interface to capture on, None for all.
+            duration (float): Seconds to capture for, None until `stop_event`
+            is set or KeyboardInterrupt.
+            stop_event (threading.Event): Stops the capture when set.
+
+        Returns:
+            int: Number of packets accounted.
+        """
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if interface:
+            sock.bind((interface, 0))
+        sock.settimeout(self.sweep_interval)
+        buffer = bytearray(CAPTURE_SNAPLEN * CAPTURE_BATCH_SIZE)
+        view = memoryview(buffer)
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not (stop_event is not None and stop_event.is_set()):
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                batch = new_batch(buffer)
+                offset = 0
+                batch_end = time.monotonic() + self.sweep_interval
+                try:
+                    while offset < len(buffer) and time.monotonic() < batch_end:
+                        # MSG_TRUNC returns the length on the wire, not the copied length
+                        wire_length, address = sock.recvfrom_into(
+                            view[offset : offset + CAPTURE_SNAPLEN],
+                            CAPTURE_SNAPLEN,
+                            socket.MSG_TRUNC,
+                        )
+                        # Loopback delivers every packet twice, as sent and as received
+                        if (
+                            address[2] == PACKET_OUTGOING
+                            and address[3] == ARPHRD_LOOPBACK
+                        ):
+                            continue
+                        batch.timestamps.append(time.time())
+                        batch.linktypes.append(LINKTYPE_ETHERNET)
+                        batch.offsets.append(offset)
+                        batch.lengths.append(min(wire_length, CAPTURE_SNAPLEN))
+                        batch.wire_lengths.append(wire_length)
+                        offset += CAPTURE_SNAPLEN
+                except socket.timeout:
+                    # Idle link: account what arrived so far and sweep
+                    if not batch.offsets:
+                        self.table.expire(time.time())
+                        if self.table.expired:
+                            self.flush()
+                self.process_batch(batch)
+        finally:
+            view.release()
+            sock.close()
+            self.finish()
+        return self.packet_count
+
+    @instrumentation.timed("flow_write_to_csv")
+    def write_to_csv(self, flows):
+        """
+        Writes flow records to a CSV file, one row per flow.
+        Args:
+            flows (list): Tuples of flow key, first and last packet time,
+            packets, bytes and TCP flags, as exported by FlowTable.
+        """
+        if not flows:
+            return
+        try:
+            with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                fieldnames = [
+                    "start",
+                    "end",
+                    "protocol",
+                    "src_ip",
+                    "src_port",
+                    "dst_ip",
+                    "dst_port",
+                    "packets",
+                    "bytes",
+                    "tcp_flags",
+                    "hostname",
+                ]
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                hostnames = self.hostnames()
+                for key, first, last, packets, byte_count, flags in flows:
+                    proto, src_ip, src_port, dst_ip, dst_port = decode_flow_key(key)
+                    hostname = (
+                        hostnames.lookup(src_ip, dst_ip, last)
+                        if hostnames is not None
+                        else None
+                    )
+                    writer.writerow(
+                        {
+                            "start": datetime.fromtimestamp(first).strftime(
+                                "%Y-%m-%d %H:%M:%S"
+                            ),
+                            "end": datetime.fromtimestamp(last).strftime(
+                                "%Y-%m-%d %H:%M:%S"
+                            ),
+                            "protocol": PROTOCOL_NAMES.get(proto, str(proto)),
+                            "src_ip": src_ip,
+                            "src_port": src_port,
+                            "dst_ip": dst_ip,
+                            "dst_port": dst_port,
+                            "packets": packets,
+                            "bytes": byte_count,
+                            "tcp_flags": flags,
+                            "hostname": hostname or "",
+                        }
+                    )
+                instrumentation.add_bytes_written("flow_csv", csvfile.tell() - start)
+            self.logger.info(f"Data written to {self.filename}: {len(flows)} flows")
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
@@ -0,0 +1,301 @@
+import socket
+import struct
+from collections import OrderedDict
+
+HOSTNAME_EXTRACTOR = "HOSTNAME EXTRACTOR"
+
+DNS_PORT = 53
+DNS_TYPE_A = 1
+DNS_TYPE_AAAA = 28
+DNS_HEADER = struct.Struct(">HHHHHH")
+DNS_ANSWER = struct.Struct(">HHIH")
+UINT16 = struct.Struct(">H")
+
+TLS_HANDSHAKE = 0x16
+TLS_CLIENT_HELLO = 1
+TLS_SERVER_NAME = 0
+
+# ClientHellos split over TCP segments are reassembled up to this size
+MAX_CLIENT_HELLO = 16_384
+MAX_PENDING_HELLOS = 1_024
+
+# Names learnt from SNI have no TTL of their own
+SNI_TTL = 3_600
+
+
+class HostnameCache:
+    """
+    IP to hostname mapping bounded by size and TTL.
+
+    Entries expire after the TTL of the DNS record they came from, and
+    beyond `max_entries` the least recently used ones are dropped. Times
+    are capture times, so a replayed pcap ages entries by its own clock.
+    """
+
+    def __init__(self, max_entries=65_536):
+        self.max_entries = max_entries
+        # ip -> (hostname, expiry time, learnt from SNI)
+        self.entries = OrderedDict()
+
+    def set(self, ip, hostname, ttl, now, sni=False):
+        """
+        Map `ip` to `hostname` for `ttl` seconds. A name from DNS doesn't
+        replace a live one from SNI, which names the site actually visited.
+        """
+        entries = self.entries
+        entry = entries.get(ip)
+        if sni or entry is None or not entry[2] or entry[1] < now:
+            entries[ip] = (hostname, now + ttl, sni)
+        entries.move_to_end(ip)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def get(self, ip, now):
+        """
+        Returns:
+            str: The hostname of `ip`, or None if unknown or expired.
+        """
+        entry = self.entries.get(ip)
+        if entry is None:
+            return None
+        hostname, expiry, _ = entry
+        if expiry < now:
+            del self.entries[ip]
+            return None
+        self.entries.move_to_end(ip)
+        return hostname
+
+    def lookup(self, src_ip, dst_ip, now):
+        """
+        Get the hostname of the remote end of a flow, trying the destination first.
+        """
+        return self.get(dst_ip, now) or self.get(src_ip, now)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def read_dns_name(buffer, offset, start, end):
+    """
+    Read a possibly compressed DNS name.
+
+    Args:
+        buffer: Packet buffer.
+        offset (int): Offset of the name.
+        start (int): Offset of the DNS header, which compression pointers are relative to.
+        end (int): End of the packet.
+
+    Returns:
+        tuple: The name (str, None if malformed) and the offset right after it.
+    """
+    labels = []
+    after = None
+    for _ in range(128):
+        if offset >= end:
+            return None, end
+        length = buffer[offset]
+        if length == 0:
+            offset += 1
+            break
+        if length & 0xC0 == 0xC0:
+            if offset + 2 > end:
+                return None, end
+            if after is None:
+                after = offset + 2
+            offset = start + (((length & 0x3F) << 8) | buffer[offset + 1])
+            continue
+        offset += 1
+        if offset + length > end:
+            return None, end
+        labels.append(bytes(buffer[offset : offset + length]))
+        offset += length
+    else:
+        # A compression loop
+        return None, end
+    name = b".".join(labels).decode("ascii", "replace").lower()
+    return name, offset if after is None else after
+
+
+def skip_dns_name(buffer, offset, end):
+    """
+    Get the offset right after a DNS name without decoding it.
+    """
+    while offset < end:
+        length = buffer[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
+    return end
+
+
+def parse_dns_response(buffer, start, end):
+    """
+    Extract the address records of a DNS response.
+
+    Args:
+        buffer: Packet buffer.
+        start (int): Offset of the DNS header.
+        end (int): End of the captured packet.
+
+    Returns:
+        list: (ip, hostname, ttl) for every A and AAAA answer, named after
+        the question so CNAME chains map to the name that was asked for.
+    """
+    if start + DNS_HEADER.size > end:
+        return []
+    _, flags, questions, answers, _, _ = DNS_HEADER.unpack_from(buffer, start)
+    # Responses only, without an error code
+    if not flags & 0x8000 or flags & 0x000F or not questions or not answers:
+        return []
+    hostname, offset = read_dns_name(buffer, start + DNS_HEADER.size, start, end)
+    if hostname is None:
+        return []
+    offset += 4
+    for _ in range(questions - 1):
+        offset = skip_dns_name(buffer, offset, end) + 4
+
+    records = []
+    for _ in range(answers):
+        offset = skip_dns_name(buffer, offset, end)
+        if offset + DNS_ANSWER.size > end:
+            break
+        record_type, _, ttl, length = DNS_ANSWER.unpack_from(buffer, offset)
+        offset += DNS_ANSWER.size
+        if offset + length > end:
+            break
+        if record_type == DNS_TYPE_A and length == 4:
+            ip = socket.inet_ntop(socket.AF_INET, buffer[offset : offset + 4])
+            records.append((ip, hostname, ttl))
+        elif record_type == DNS_TYPE_AAAA and length == 16:
+            ip = socket.inet_ntop(socket.AF_INET6, buffer[offset : offset + 16])
+            records.append((ip, hostname, ttl))
+        offset += length
+    return records
+
+
+def client_hello_length(buffer, start, end):
+    """
+    Get the length of the TLS record at `start` if it holds a ClientHello.
+
+    Returns:
+        int: Record length including its 5-byte header, or 0 if it's not a ClientHello.
+    """
+    if start + 6 > end:
+        return 0
+    if buffer[start] != TLS_HANDSHAKE or buffer[start + 1] != 3:
+        return 0
+    if buffer[start + 5] != TLS_CLIENT_HELLO:
+        return 0
+    return 5 + UINT16.unpack_from(buffer, start + 3)[0]
+
+
+def parse_client_hello(buffer, start, end):
+    """
+    Extract the server name (SNI) from a complete ClientHello TLS record.
+
+    Args:
+        buffer: Buffer holding the record.
+        start (int): Offset of the TLS record header.
+        end (int): End of the record.
+
+    Returns:
+        str: The server name, or None if absent or malformed.
+    """
+    # Record header, handshake header, client version and random
+    offset = start + 5 + 4 + 2 + 32
+    if offset + 1 > end:
+        return None
+    offset += 1 + buffer[offset]
+    if offset + 2 > end:
+        return None
+    offset += 2 + UINT16.unpack_from(buffer, offset)[0]
+    if offset + 1 > end:
+        return None
+    offset += 1 + buffer[offset]
+    if offset + 2 > end:
+        return None
+    extensions_end = min(offset + 2 + UINT16.unpack_from(buffer, offset)[0], end)
+    offset += 2
+    while offset + 4 <= extensions_end:
+        extension_type, length = struct.unpack_from(">HH", buffer, offset)
+        offset += 4
+        if extension_type == TLS_SERVER_NAME:
+            # Server name list length, name type, name length, name
+            if offset + 5 > extensions_end or buffer[offset + 2] != 0:
+                return None
+            name_length = UINT16.unpack_from(buffer, offset + 3)[0]
+            name_start = offset + 5
+            if name_start + name_length > extensions_end:
+                return None
+            return (
+                bytes(buffer[name_start : name_start + name_length])
+                .decode("ascii", "replace")
+                .lower()
+            )
+        offset += length
+    return None
+
+
+class HostnameExtractor:
+    """
+    Passive IP to hostname resolution from captured DNS responses and TLS
+    ClientHello server names, without any lookups of its own.
+
+    FlowAnalyzer hands over only the packets that can carry a name: UDP
+    from port 53 and TCP segments starting a TLS handshake or continuing
+    one. A ClientHello split over several segments is reassembled per flow
+    into a small bounded buffer; everything else is parsed in place in the
+    capture buffer.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else HostnameCache()
+        # flow key -> (destination IP, partial ClientHello, expected length)
+        self.pending = OrderedDict()
+        self.dns_names = 0
+        self.sni_names = 0
+
+    def dns(self, buffer, start, end, timestamp):
+        for ip, hostname, ttl in parse_dns_response(buffer, start, end):
+            self.cache.set(ip, hostname, ttl, timestamp)
+            self.dns_names += 1
+
+    def tls(self, key, buffer, start, end, version, ip, timestamp):
+        """
+        Look for a ClientHello in a TCP payload.
+
+        Args:
+            key (int): Flow key, to reassemble split ClientHellos.
+            buffer: Packet buffer.
+            start (int): Offset of the TCP payload.
+            end (int): End of the captured packet.
+            version (int): IP version.
+            ip (int): Offset of the IP header.
+            timestamp (float): Capture time.
+        """
+        pending = self.pending.pop(key, None)
+        if pending is not None:
+            dst_ip, hello, length = pending
+            hello += buffer[start:end]
+            start, end, buffer = 0, len(hello), hello
+        else:
+            length = client_hello_length(buffer, start, end)
+            if not length:
+                return
+            if version == 4:
+                dst_ip = socket.inet_ntop(socket.AF_INET, buffer[ip + 16 : ip + 20])
+            else:
+                dst_ip = socket.inet_ntop(socket.AF_INET6, buffer[ip + 24 : ip + 40])
+
+        if end - start < length:
+            if length <= MAX_CLIENT_HELLO:
+                self.pending[key] = (dst_ip, bytearray(buffer[start:end]), length)
+                if len(self.pending) > MAX_PENDING_HELLOS:
+                    self.pending.popitem(last=False)
+            return
+        hostname = parse_client_hello(buffer, start, start + length)
+        if hostname:
+            self.cache.set(dst_ip, hostname, SNI_TTL, timestamp, sni=True)
+            self.sni_names += 1
@@ -0,0 +1,107 @@
+import csv
+import socket
+import time
+from datetime import datetime
+import logging
+import os
+from util.instrumentation import instrumentation
+
+LATENCY_ANALYZER = "LATENCY ANALYZER"
+
+DEFAULT_TARGETS = [("1.1.1.1", 443), ("8.8.8.8", 443)]
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+
+def parse_target(target):
+    """
+    Parse a "host:port" string.
+
+    Args:
+        target (str): Target such as "example.com:443" or "[::1]:22".
+
+    Returns:
+        tuple: Host and port.
+    """
+    host, _, port = target.rpartition(":")
+    if not host:
+        raise ValueError(f"Latency target must be host:port, got {target}")
+    return host.strip("[]"), int(port)
+
+
+class LatencyAnalyzer:
+    """
+    Measures round-trip latency as the time to open a TCP connection, which
+    needs no privileges unlike ICMP ping.
+    """
+
+    def __init__(self, filename, logger=None, targets=None, timeout=2.0):
+        results_dir = "results"
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        self.filename = filename
+        self.logger = logger if logger is not None else default_logger
+        self.targets = targets if targets else DEFAULT_TARGETS
+        self.timeout = timeout
+
+    @instrumentation.timed("measure_latency")
+    def measure_latency(self):
+        """
+        Measures the TCP connect time to every target.
+        Returns:
+            dict: "host:port" to latency in milliseconds, None for unreachable targets.
+        """
+        latencies = {}
+        for host, port in self.targets:
+            target = f"{host}:{port}"
+            try:
+                start = time.perf_counter()
+                with socket.create_connection((host, port), timeout=self.timeout):
+                    latencies[target] = (time.perf_counter() - start) * 1000
+            except OSError as e:
+                self.logger.error(f"Error measuring latency to {target}: {e}")
+                latencies[target] = None
+        return latencies
+
+    @instrumentation.timed("latency_write_to_csv")
+    def write_to_csv(self, latencies, timestamp=None):
+        """
+        Writes the measured latencies to a CSV file, one row per target.
+        Args:
+            latencies (dict): "host:port" to latency in milliseconds or None.
+            timestamp (datetime): Time of the measurement, defaults to now.
+        """
+        try:
+            with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                fieldnames = ["timestamp", "target", "latency_ms"]
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                now = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+                for target, latency in latencies.items():
+                    writer.writerow(
+                        {
+                            "timestamp": now,
+                            "target": target,
+                            "latency_ms": "" if latency is None else f"{latency:.3f}",
+                        }
+                    )
+                instrumentation.add_bytes_written("latency_csv", csvfile.tell() - start)
+            self.logger.info(
+                f"Data written to {self.filename}: "
+                + ", ".join(
+                    f"{target} {'timeout' if latency is None else f'{latency:.1f} ms'}"
+                    for target, latency in latencies.items()
+                )
+            )
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
@@ -3,28 +3,16 @@ import time
 import signal
 import sys
 import os
-import logging
 from datetime import datetime
-from .network_usage_analyzer import NetworkUsageAnalyzer, NETWORK_USAGE_ANALYZER
+from .network_usage_analyzer import (
+    AdaptiveInterval,
+    NetworkUsageAnalyzer,
+    NETWORK_USAGE_ANALYZER,
+)
 from .network_speed_analyzer import NetworkSpeedAnalyzer, NETWORK_SPEED_ANALYZER
-from util import GraphPlotter, I18N
-
-
-def setup_logger(name, log_file, level=logging.INFO):
-    handler = logging.FileHandler(log_file)
-    console_handler = logging.StreamHandler()
-
-    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
-    console_handler.setFormatter(
-        logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-    )
-
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-    logger.addHandler(handler)
-    logger.addHandler(console_handler)
-
-    return logger
+from .tcp_quality_analyzer import TcpQualityAnalyzer
+from util import I18N, instrumentation
+from util.logger import setup_logger
 
 
 class Menu:
@@ -40,7 +28,19 @@ class Menu:
         self.usage_logger = None
         self.usage_analyzer = None
         self.speed_analyzer = None
+        self.tcp_quality_analyzer = None
         self.plotter = None
+        self.plot_files = None
+        self.alert_config_file = "alerts.json"
+        self.alert_engine = None
+        self.metrics_port = 0
+        self.metrics = None
+        self.metrics_exporter = None
+        self.self_instrumentation = False
+        # Usage is sampled between 1 second and the frequency, following the traffic
+        self.adaptive_sampling = False
+        self.adaptive = None
+        self.usage_schedule = None
         signal.signal(signal.SIGINT, self.exit_gracefully)
         if hasattr(signal, "SIGALRM"):
             signal.signal(signal.SIGALRM, self.exit_gracefully)
@@ -97,6 +97,15 @@ class Menu:
         )
         print(f"{self.i18n.get('measurement_frequency')}: {self.frequency} minutes")
         print(f"{self.i18n.get('xtick_interval')}: {self.xtick_interval}")
+        print(
+            f"{self.i18n.get('metrics_port')}: {self.metrics_port if self.metrics_port else self.i18n.get('no')}"
+        )
+        print(
+            f"{self.i18n.get('self_instrumentation')}: {self.i18n.get('yes') if self.self_instrumentation else self.i18n.get('no')}"
+        )
+        print(
+            f"{self.i18n.get('adaptive_sampling')}: {self.i18n.get('yes') if self.adaptive_sampling else self.i18n.get('no')}"
+        )
 
     def change_settings(self):
         while True:
@@ -107,7 +116,10 @@ class Menu:
             print(f"4. {self.i18n.get('set_frequency')}")
             print(f"5. {self.i18n.get('set_xtick_interval')}")
             print(f"6. {self.i18n.get('infinite_analysis')}")
-            print(f"7. {self.i18n.get('menu_exit')}")
+            print(f"7. {self.i18n.get('set_metrics_port')}")
+            print(f"8. {self.i18n.get('self_instrumentation')}")
+            print(f"9. {self.i18n.get('adaptive_sampling')}")
+            print(f"10. {self.i18n.get('menu_exit')}")
             choice = input(self.i18n.get("menu_enter_choice"))
 
             if choice == "1":
@@ -123,6 +135,12 @@ class Menu:
             elif choice == "6":
                 self.set_infinite_analysis()
             elif choice == "7":
+                self.set_metrics_port()
+            elif choice == "8":
+                self.set_self_instrumentation()
+            elif choice == "9":
+                self.set_adaptive_sampling()
+            elif choice == "10":
                 break
             else:
                 print(self.i18n.get("menu_invalid_choice"))
@@ -184,6 +202,39 @@ class Menu:
         except ValueError:
             print(self.i18n.get("menu_invalid_choice"))
 
+    def set_metrics_port(self):
+        try:
+            port = int(input(f"{self.i18n.get('set_metrics_port')}: "))
+            if not 0 <= port <= 65535:
+                raise ValueError
+            self.metrics_port = port
+        except ValueError:
+            print(self.i18n.get("menu_invalid_choice"))
+
+    def set_self_instrumentation(self):
+        choice = (
+            input(f"{self.i18n.get('self_instrumentation')}? (yes/no): ")
+            .strip()
+            .lower()
+        )
+        if choice in ["y", "yes", "д", "да"]:
+            self.self_instrumentation = True
+        elif choice in ["n", "no", "н", "нет"]:
+            self.self_instrumentation = False
+        else:
+            print(self.i18n.get("menu_invalid_choice"))
+
+    def set_adaptive_sampling(self):
+        choice = (
+            input(f"{self.i18n.get('adaptive_sampling')}? (yes/no): ").strip().lower()
+        )
+        if choice in ["y", "yes", "д", "да"]:
+            self.adaptive_sampling = True
+        elif choice in ["n", "no", "н", "нет"]:
+            self.adaptive_sampling = False
+        else:
+            print(self.i18n.get("menu_invalid_choice"))
+
     def start_analysis(self):
         if not self.analyze_speed and not self.analyze_usage:
             print(self.i18n.get("enable_at_least_one_analysis"))
@@ -199,6 +250,7 @@ class Menu:
 
         speed_csv_file = None
         usage_csv_file = None
+        tcp_quality_csv_file = None
 
         if self.analyze_speed:
             speed_log_file = os.path.join("logs", f"{now}_speed.log")
@@ -213,16 +265,60 @@ class Menu:
             usage_log_file = os.path.join("logs", f"{now}_data_usage.log")
             usage_csv_file = os.path.join("results", f"{now}_network_usage.csv")
             self.usage_logger = setup_logger("usage", usage_log_file)
+            self.adaptive = None
+            if self.adaptive_sampling:
+                self.adaptive = AdaptiveInterval(1, self.frequency * 60)
             self.usage_analyzer = NetworkUsageAnalyzer(
-                usage_csv_file, self.usage_logger
+                usage_csv_file, self.usage_logger, adaptive=self.adaptive
             )
-            schedule.every(self.frequency).minutes.do(self.usage_job)
+            # Sampled with usage so retransmits line up with throughput
+            if os.path.exists("/proc/net/snmp"):
+                tcp_quality_csv_file = os.path.join(
+                    "results", f"{now}_tcp_quality.csv"
+                )
+                self.tcp_quality_analyzer = TcpQualityAnalyzer(
+                    tcp_quality_csv_file, self.usage_logger
+                )
+                self.tcp_quality_analyzer.get_tcp_quality()
+            if self.adaptive:
+                # Starts fast; usage_job sets the interval after every sample
+                self.usage_schedule = schedule.every(
+                    self.adaptive.min_interval
+                ).seconds.do(self.usage_job)
+            else:
+                self.usage_schedule = schedule.every(self.frequency).minutes.do(
+                    self.usage_job
+                )
 
-        self.plotter = GraphPlotter(
+        # Plotting is only needed on exit, so GraphPlotter (and with it pandas
+        # and matplotlib) is not imported while collecting
+        self.plot_files = (
             usage_csv_file if self.analyze_usage else None,
             speed_csv_file if self.analyze_speed else None,
+            tcp_quality_csv_file,
         )
 
+        if os.path.exists(self.alert_config_file):
+            from .alert_engine import AlertEngine
+
+            alert_log_file = os.path.join("logs", f"{now}_alerts.log")
+            self.alert_engine = AlertEngine.from_config(
+                self.alert_config_file, setup_logger("alerts", alert_log_file)
+            )
+
+        if self.self_instrumentation:
+            instrumentation.enable(os.path.join("logs", f"{now}_stats.json"))
+            instrumentation.install_signal_handler()
+
+        if self.metrics_port and self.metrics_exporter is None:
+            from .metrics_exporter import MetricsRegistry, MetricsExporter
+
+            self.metrics = MetricsRegistry()
+            self.metrics_exporter = MetricsExporter(
+                self.metrics, port=self.metrics_port, logger=self.usage_logger
+            )
+            self.metrics_exporter.start()
+
         if self.usage_logger:
             self.usage_logger.info(self.i18n.get("usage_analyzer_starting"))
         if self.speed_logger:
@@ -240,14 +336,64 @@ class Menu:
             self.exit_gracefully()
 
     def usage_job(self):
+        instrumentation.record_tick(
+            "usage",
+            self.adaptive.interval if self.adaptive else self.frequency * 60,
+        )
         sent_bytes, recv_bytes = self.usage_analyzer.get_network_usage()
         if sent_bytes is not None and recv_bytes is not None:
             self.usage_analyzer.write_to_csv(sent_bytes, recv_bytes)
+            if self.alert_engine:
+                self.alert_engine.observe_usage(sent_bytes, recv_bytes)
+            if self.metrics:
+                self.metrics.observe_usage(sent_bytes, recv_bytes)
+            interval = self.usage_analyzer.next_interval(sent_bytes, recv_bytes)
+            if interval is not None:
+                # schedule plans the next run with the job's interval once it returns
+                self.usage_schedule.interval = interval
+                self.usage_logger.info(
+                    self.i18n.get("adaptive_sampling_status").format(
+                        interval, self.adaptive.effective_rate()
+                    )
+                )
+                if self.metrics:
+                    self.metrics.observe_sampling(
+                        "usage", interval, self.adaptive.effective_rate()
+                    )
+        elif self.metrics:
+            self.metrics.observe_error("usage")
+        if self.tcp_quality_analyzer:
+            self.tcp_quality_job()
+        self.publish_instrumentation()
+
+    def tcp_quality_job(self):
+        quality = self.tcp_quality_analyzer.get_tcp_quality()
+        if quality:
+            self.tcp_quality_analyzer.write_to_csv(quality)
+            if self.metrics:
+                self.metrics.observe_tcp_quality(quality)
+        elif quality is None and self.metrics:
+            self.metrics.observe_error("tcp_quality")
 
     def speed_job(self):
+        instrumentation.record_tick("speed", self.frequency * 60)
         download_speed, upload_speed = self.speed_analyzer.measure_speed()
         if download_speed is not None and upload_speed is not None:
             self.speed_analyzer.write_to_csv(download_speed, upload_speed)
+            if self.alert_engine:
+                self.alert_engine.observe_speed(download_speed, upload_speed)
+            if self.metrics:
+                self.metrics.observe_speed(download_speed, upload_speed)
+        elif self.metrics:
+            self.metrics.observe_error("speed")
+        self.publish_instrumentation()
+
+    def publish_instrumentation(self):
+        if not instrumentation.enabled:
+            return
+        instrumentation.write_stats()
+        if self.metrics:
+            self.metrics.observe_instrumentation(instrumentation.snapshot())
 
     def exit_gracefully(self, signum=None, frame=None):
         if self.usage_logger:
@@ -255,8 +401,20 @@ class Menu:
         if self.speed_logger:
             self.speed_logger.info(self.i18n.get("received_exit_signal"))
         schedule.clear()
-        if self.plotter:
+        if self.adaptive and self.usage_logger:
+            self.usage_logger.info(
+                f"{self.i18n.get('adaptive_sampling')}: {self.adaptive.samples} samples, "
+                f"{self.adaptive.effective_rate():.1f} per minute lately"
+            )
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        if self.plot_files:
+            from util import GraphPlotter
+
+            self.plotter = GraphPlotter(*self.plot_files)
             self.plotter.plot_graphs(self.xtick_interval)
+        instrumentation.stop_profiling()
+        instrumentation.write_stats()
         print(self.i18n.get("analysis_stopped_plotted"))
         sys.exit(0)
 
@@ -0,0 +1,473 @@
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .tcp_quality_analyzer import TCP_QUALITY_COUNTERS
+
+METRICS_EXPORTER = "METRICS EXPORTER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label(value):
+    """
+    Escape a label value as the text format requires, so an interface or
+    process name with a quote, backslash or newline can't break the scrape.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    In-memory metric state rendered in the Prometheus text format.
+
+    Writers update the metrics with `set`/`inc` and call `publish` once per
+    sample; `publish` renders the whole exposition into a bytes buffer that
+    scrapes return as-is. A scrape is therefore a single attribute read and
+    never takes the lock held by the sampling path.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.rendered = b""
+        self.last_usage = None
+        self.set(
+            "na_process_start_time_seconds",
+            time.time(),
+            help="Start time of the analyzer since the epoch.",
+        )
+        self.publish()
+
+    def set(self, name, value, labels=None, type="gauge", help=""):
+        """
+        Set a metric value.
+
+        Args:
+            name (str): Metric name.
+            value (float): New value.
+            labels (dict): Optional label names to values.
+            type (str): "gauge" or "counter".
+            help (str): Help text shown in the exposition.
+        """
+        key = tuple(sorted(labels.items())) if labels else ()
+        with self.lock:
+            metric = self.metrics.setdefault(
+                name, {"type": type, "help": help, "values": {}}
+            )
+            metric["values"][key] = value
+
+    def inc(self, name, amount=1, labels=None, help=""):
+        """
+        Increment a counter.
+
+        Args:
+            name (str): Metric name.
+            amount (float): Amount to add.
+            labels (dict): Optional label names to values.
+            help (str): Help text shown in the exposition.
+        """
+        key = tuple(sorted(labels.items())) if labels else ()
+        with self.lock:
+            metric = self.metrics.setdefault(
+                name, {"type": "counter", "help": help, "values": {}}
+            )
+            metric["values"][key] = metric["values"].get(key, 0) + amount
+
+    def publish(self):
+        """
+        Render the current state into the buffer served to scrapers.
+        """
+        lines = []
+        with self.lock:
+            for name, metric in sorted(self.metrics.items()):
+                if metric["help"]:
+                    lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+                for key, value in metric["values"].items():
+                    if key:
+                        labels = ",".join(f'{k}="{escape_label(v)}"' for k, v in key)
+                        lines.append(f"{name}{{{labels}}} {value}")
+                    else:
+                        lines.append(f"{name} {value}")
+            # Under the lock, so a thread with an older snapshot cannot
+            # replace a newer exposition
+            self.rendered = ("\n".join(lines) + "\n").encode("utf-8")
+
+    def observe_usage(self, sent_bytes, recv_bytes, timestamp=None):
+        """
+        Record a cumulative usage sample from NetworkUsageAnalyzer.
+
+        Args:
+            sent_bytes (int): Total bytes sent.
+            recv_bytes (int): Total bytes received.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self.set(
+            "na_network_sent_bytes_total",
+            sent_bytes,
+            type="counter",
+            help="Bytes sent on all interfaces.",
+        )
+        self.set(
+            "na_network_recv_bytes_total",
+            recv_bytes,
+            type="counter",
+            help="Bytes received on all interfaces.",
+        )
+
+        previous = self.last_usage
+        self.last_usage = (timestamp, sent_bytes, recv_bytes)
+        if previous is not None and timestamp > previous[0]:
+            elapsed = timestamp - previous[0]
+            self.set(
+                "na_network_sent_bits_per_second",
+                max(sent_bytes - previous[1], 0) * 8 / elapsed,
+                help="Upload rate over the last sampling interval.",
+            )
+            self.set(
+                "na_network_recv_bits_per_second",
+                max(recv_bytes - previous[2], 0) * 8 / elapsed,
+                help="Download rate over the last sampling interval.",
+            )
+
+        self._observe_sample("usage", timestamp)
+
+    def observe_speed(self, download_speed, upload_speed, timestamp=None):
+        """
+        Record a speed test result from NetworkSpeedAnalyzer.
+
+        Args:
+            download_speed (float): Download speed in bits per second.
+            upload_speed (float): Upload speed in bits per second.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self.set(
+            "na_speedtest_download_bits_per_second",
+            download_speed,
+            help="Download speed measured by the last speed test.",
+        )
+        self.set(
+            "na_speedtest_upload_bits_per_second",
+            upload_speed,
+            help="Upload speed measured by the last speed test.",
+        )
+        self._observe_sample("speed", timestamp)
+
+    def observe_interfaces(self, usage, timestamp=None):
+        """
+        Record a per-interface usage sample from PerNicUsageAnalyzer.
+
+        Args:
+            usage (dict): Interface name to a tuple of bytes sent and bytes received.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for nic, (sent_bytes, recv_bytes) in usage.items():
+            labels = {"interface": nic}
+            self.set(
+                "na_interface_sent_bytes_total",
+                sent_bytes,
+                labels=labels,
+                type="counter",
+                help="Bytes sent per interface.",
+            )
+            self.set(
+                "na_interface_recv_bytes_total",
+                recv_bytes,
+                labels=labels,
+                type="counter",
+                help="Bytes received per interface.",
+            )
+        self._observe_sample("per_nic", timestamp)
+
+    def observe_namespaces(self, usage, timestamp=None):
+        """
+        Record a per-namespace usage sample from NamespaceUsageAnalyzer.
+
+        Args:
+            usage (dict): Namespace inode to a tuple of name, bytes sent and bytes received.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for inode, (name, sent_bytes, recv_bytes) in usage.items():
+            labels = {"namespace": inode, "name": name}
+            self.set(
+                "na_namespace_sent_bytes_total",
+                sent_bytes,
+                labels=labels,
+                type="counter",
+                help="Bytes sent per network namespace.",
+            )
+            self.set(
+                "na_namespace_recv_bytes_total",
+                recv_bytes,
+                labels=labels,
+                type="counter",
+                help="Bytes received per network namespace.",
+            )
+        self._observe_sample("namespaces", timestamp)
+
+    def observe_processes(self, usage, timestamp=None):
+        """
+        Record a per-process traffic sample from ProcessUsageAnalyzer.
+
+        Traffic is summed per process name rather than PID, so the number of
+        series stays bounded as processes come and go.
+
+        Args:
+            usage (dict): PID to a tuple of name, bytes sent, bytes received
+            and open sockets, with the traffic since the previous sample.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for name, sent_bytes, recv_bytes, _ in usage.values():
+            labels = {"process": name}
+            if sent_bytes:
+                self.inc(
+                    "na_process_sent_bytes_total",
+                    sent_bytes,
+                    labels=labels,
+                    help="Bytes sent over TCP per process name.",
+                )
+            if recv_bytes:
+                self.inc(
+                    "na_process_recv_bytes_total",
+                    recv_bytes,
+                    labels=labels,
+                    help="Bytes received over TCP per process name.",
+                )
+        self._observe_sample("processes", timestamp)
+
+    def observe_tcp_quality(self, quality, timestamp=None):
+        """
+        Record a TCP quality sample from TcpQualityAnalyzer.
+
+        Args:
+            quality (dict): Rates over the last interval, as returned by get_tcp_quality.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for column, _, _, description in TCP_QUALITY_COUNTERS:
+            if f"{column}_per_sec" in quality:
+                self.set(
+                    f"na_tcp_{column}_per_second",
+                    quality[f"{column}_per_sec"],
+                    help=f"{description} per second over the last interval.",
+                )
+        if "curr_estab" in quality:
+            self.set(
+                "na_tcp_established_connections",
+                quality["curr_estab"],
+                help="Established TCP connections.",
+            )
+        self.set(
+            "na_tcp_retransmit_ratio",
+            quality["retrans_ratio"],
+            help="Share of sent TCP segments that were retransmissions.",
+        )
+        self._observe_sample("tcp_quality", timestamp)
+
+    def observe_latency(self, latencies, timestamp=None):
+        """
+        Record TCP connect latencies from LatencyAnalyzer.
+
+        Args:
+            latencies (dict): "host:port" to latency in milliseconds or None.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for target, latency in latencies.items():
+            if latency is None:
+                self.inc(
+                    "na_latency_timeouts_total",
+                    labels={"target": target},
+                    help="Latency probes that failed or timed out.",
+                )
+            else:
+                self.set(
+                    "na_latency_seconds",
+                    latency / 1000,
+                    labels={"target": target},
+                    help="TCP connect time of the last latency probe.",
+                )
+        self._observe_sample("latency", timestamp)
+
+    def observe_error(self, collector):
+        """
+        Record a failed sample.
+
+        Args:
+            collector (str): Collector name, e.g. "usage" or "speed".
+        """
+        self.inc(
+            "na_collector_errors_total",
+            labels={"collector": collector},
+            help="Samples that failed to be collected.",
+        )
+        self.publish()
+
+    def observe_sampling(self, collector, interval, samples_per_minute):
+        """
+        Record the current interval of an adaptive collector.
+
+        Args:
+            collector (str): Collector name, e.g. "usage".
+            interval (float): Seconds until its next sample.
+            samples_per_minute (float): Its effective sampling rate.
+        """
+        labels = {"collector": collector}
+        self.set(
+            "na_collector_interval_seconds",
+            interval,
+            labels,
+            help="Current interval of an adaptive collector.",
+        )
+        self.set(
+            "na_collector_samples_per_minute",
+            samples_per_minute,
+            labels,
+            help="Effective sampling rate of an adaptive collector.",
+        )
+        self.publish()
+
+    def observe_instrumentation(self, snapshot):
+        """
+        Record collector self-metrics from an Instrumentation snapshot.
+
+        Args:
+            snapshot (dict): Result of Instrumentation.snapshot().
+        """
+        if snapshot["rss_bytes"] is not None:
+            self.set(
+                "na_process_resident_memory_bytes",
+                snapshot["rss_bytes"],
+                help="Resident set size of the analyzer.",
+            )
+        for stage, histogram in snapshot["stages"].items():
+            labels = {"stage": stage}
+            self.set(
+                "na_stage_duration_seconds_count",
+                histogram["count"],
+                labels=labels,
+                type="counter",
+                help="Calls per collector stage.",
+            )
+            self.set(
+                "na_stage_duration_seconds_sum",
+                histogram["sum"],
+                labels=labels,
+                type="counter",
+                help="Total seconds spent per collector stage.",
+            )
+            self.set(
+                "na_stage_duration_seconds_p99",
+                histogram["p99"],
+                labels=labels,
+                help="Estimated 99th percentile latency per collector stage.",
+            )
+        for collector, jitter in snapshot["tick_jitter"].items():
+            if jitter["count"]:
+                self.set(
+                    "na_tick_jitter_seconds_max",
+                    jitter["max"],
+                    labels={"collector": collector},
+                    help="Largest drift of a tick from its interval.",
+                )
+        for target, count in snapshot["bytes_written"].items():
+            self.set(
+                "na_written_bytes_total",
+                count,
+                labels={"target": target},
+                type="counter",
+                help="Bytes written to results files.",
+            )
+        self.publish()
+
+    def _observe_sample(self, collector, timestamp):
+        labels = {"collector": collector}
+        self.inc(
+            "na_collector_samples_total",
+            labels=labels,
+            help="Samples collected.",
+        )
+        self.set(
+            "na_collector_last_sample_timestamp_seconds",
+            timestamp,
+            labels=labels,
+            help="Time of the last collected sample since the epoch.",
+        )
+        self.publish()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.rendered
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsExporter:
+    """
+    Serves a MetricsRegistry on http://<host>:<port>/metrics from a daemon thread.
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9464, logger=None):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.logger = logger if logger is not None else default_logger
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in the background.
+        """
+        try:
+            self.server = ThreadingHTTPServer(
+                (self.host, self.port), MetricsRequestHandler
+            )
+            self.server.daemon_threads = True
+            self.server.registry = self.registry
+            self.port = self.server.server_address[1]
+            self.thread = threading.Thread(
+                target=self.server.serve_forever, name="metrics-exporter", daemon=True
+            )
+            self.thread.start()
+            self.logger.info(
+                f"Metrics exporter listening on http://{self.host}:{self.port}/metrics"
+            )
+        except Exception as e:
+            self.logger.error(f"Error starting metrics exporter: {e}")
+            self.server = None
+
+    def stop(self):
+        """
+        Stop serving and release the port.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None
@@ -0,0 +1,433 @@
+import csv
+import http.client
+import os
+import statistics
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from util.instrumentation import instrumentation
+from .network_speed_analyzer import NetworkSpeedAnalyzer
+
+MULTI_SERVER_SPEED_ANALYZER = "MULTI-SERVER SPEED ANALYZER"
+
+MODES = ("concurrent", "staggered")
+
+FIELDNAMES = [
+    "timestamp",
+    "server",
+    "status",
+    "latency_ms",
+    "download_speed",
+    "upload_speed",
+    "bytes_sent",
+    "bytes_received",
+    "download_median",
+    "download_spread",
+    "upload_median",
+    "upload_spread",
+]
+
+# Name of the row aggregating all servers of a measurement
+AGGREGATE = "all"
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SpeedtestSession:
+    """
+    A speedtest.net client kept between measurements.
+
+    Creating a client downloads the speedtest configuration and server
+    list, which takes longer than a short test itself, so it is done once
+    and only the latency to the server is measured again on every run.
+    """
+
+    def __init__(self, server_id, backend):
+        """
+        Args:
+            server_id (str): speedtest.net server id, None for the best one.
+            backend (module): speedtest, or anything with its Speedtest class.
+        """
+        self.server_id = server_id
+        self.backend = backend
+        self.client = None
+
+    def measure(self):
+        try:
+            if self.client is None:
+                self.client = self.backend.Speedtest()
+                if self.server_id:
+                    self.client.get_servers([int(self.server_id)])
+            self.client.get_best_server()
+            self.client.download()
+            self.client.upload()
+            results = self.client.results.dict()
+        except Exception:
+            # Set up again on the next run, e.g. after the server went away
+            self.client = None
+            raise
+        return {
+            "latency_ms": results.get("ping"),
+            "download_speed": results["download"],
+            "upload_speed": results["upload"],
+            "bytes_sent": results.get("bytes_sent") or 0,
+            "bytes_received": results.get("bytes_received") or 0,
+        }
+
+    def close(self):
+        self.client = None
+
+
+class HttpSession:
+    """
+    Measures against an HTTP endpoint, e.g. a file on a local server, over
+    a keep-alive connection reused between measurements.
+
+    The download is a ranged GET of up to `download_bytes` of the URL and
+    the upload a POST of `upload_bytes` to it; an endpoint that refuses
+    the POST only has a download speed. The latency is the time to the
+    response headers of the GET.
+    """
+
+    def __init__(
+        self, url, timeout=30, download_bytes=25_000_000, upload_bytes=10_000_000
+    ):
+        self.url = urllib.parse.urlsplit(url)
+        self.path = self.url.path or "/"
+        if self.url.query:
+            self.path += f"?{self.url.query}"
+        self.timeout = timeout
+        self.download_bytes = download_bytes
+        self.upload_bytes = upload_bytes
+        self.connection = None
+
+    def request(self, method, body=None, headers=None):
+        """
+        Send a request on the pooled connection, reconnecting once if the
+        server closed it while idle.
+        """
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = (
+                    http.client.HTTPSConnection
+                    if self.url.scheme == "https"
+                    else http.client.HTTPConnection
+                )
+                self.connection = connection_class(
+                    self.url.hostname, self.url.port, timeout=self.timeout
+                )
+            try:
+                self.connection.request(method, self.path, body, headers or {})
+                return self.connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def measure(self):
+        try:
+            start = time.perf_counter()
+            response = self.request(
+                "GET", headers={"Range": f"bytes=0-{self.download_bytes - 1}"}
+            )
+            first_byte = time.perf_counter()
+            if response.status >= 400:
+                raise ConnectionError(f"GET {self.url.geturl()}: {response.status}")
+            received = 0
+            while received < self.download_bytes:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+            download_time = time.perf_counter() - first_byte
+            if not response.isclosed():
+                # The rest of an unranged body would be read by the next request
+                self.close()
+
+            upload_speed = None
+            sent = 0
+            start_upload = time.perf_counter()
+            try:
+                response = self.request(
+                    "POST",
+                    body=bytes(self.upload_bytes),
+                    headers={"Content-Type": "application/octet-stream"},
+                )
+                response.read()
+            except ConnectionError:
+                # A server refusing the POST may close before reading the body
+                self.close()
+            else:
+                if response.status < 400:
+                    sent = self.upload_bytes
+                    upload_speed = sent * 8 / (time.perf_counter() - start_upload)
+        except Exception:
+            self.close()
+            raise
+        return {
+            "latency_ms": (first_byte - start) * 1000,
+            "download_speed": received * 8 / download_time if download_time else None,
+            "upload_speed": upload_speed,
+            "bytes_sent": sent,
+            "bytes_received": received,
+        }
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def open_session(server, backend):
+    """
+    Open the session of a server given as a speedtest.net server id,
+    "best" for the best speedtest.net server, or an http(s):// URL.
+    """
+    if server.startswith(("http://", "https://")):
+        return HttpSession(server)
+    return SpeedtestSession(None if server == "best" else server, backend)
+
+
+def spread(values):
+    return max(values) - min(values) if values else None
+
+
+def mbps(speed):
+    return "-" if speed is None else f"{speed / 1_000_000:.2f}"
+
+
+class MultiServerSpeedAnalyzer(NetworkSpeedAnalyzer):
+    """
+    Measures the speed against several servers, either all at once or
+    staggered one after another, and aggregates them.
+
+    Running them all at once measures how much the link carries in total,
+    so the link's speed is the sum of the servers' that measured both
+    directions; staggered, each sees the whole link and it is their median.
+    Either way the spread (highest minus lowest) tells how much the result
+    depends on the server.
+
+    measure_speed() returns the link's speeds, which write_to_csv() writes to
+    the usual speed results file as NetworkSpeedAnalyzer does, so plots,
+    alerts and metrics are unchanged. The result of every server and the
+    aggregate, with its medians and spreads, go to `servers_filename`.
+
+    Sessions, with their configuration and open connections, and the
+    worker threads are kept from one measurement to the next.
+    """
+
+    def __init__(
+        self,
+        filename,
+        servers,
+        logger=None,
+        mode="concurrent",
+        stagger=0,
+        servers_filename=None,
+        backend=None,
+        history=None,
+        catalog=None,
+    ):
+        """
+        Args:
+            filename (str): Speed results CSV.
+            servers (list of str): speedtest.net server ids, "best" or
+                http(s):// URLs of endpoints.
+            mode (str): "concurrent" or "staggered".
+            stagger (float): Seconds between two staggered tests.
+            servers_filename (str): CSV of the per-server results, next to
+                `filename` with "_speed_servers.csv" by default.
+        """
+        super().__init__(filename, logger, backend, history, catalog)
+        if mode not in MODES:
+            raise ValueError(f"Unknown speed measurement mode: {mode}")
+        if not servers:
+            raise ValueError("No servers to measure against")
+        self.servers = list(servers)
+        self.mode = mode
+        self.stagger = stagger
+        if servers_filename is None:
+            base = filename
+            if base.endswith("_speed_measurement.csv"):
+                base = base[: -len("_speed_measurement.csv")]
+            else:
+                base = os.path.splitext(base)[0]
+            servers_filename = f"{base}_speed_servers.csv"
+        self.servers_filename = servers_filename
+        self.sessions = {}
+        self.executor = None
+        self.last_measurement = None
+
+    def session(self, server):
+        if server not in self.sessions:
+            if self.backend is None and not server.startswith(("http://", "https://")):
+                import speedtest
+
+                self.backend = speedtest
+            self.sessions[server] = open_session(server, self.backend)
+        return self.sessions[server]
+
+    def measure_server(self, server):
+        try:
+            return dict(self.session(server).measure(), server=server, status="ok")
+        except Exception as e:
+            self.logger.error(f"Error measuring speed against {server}: {e}")
+            return {"server": server, "status": "failed"}
+
+    @instrumentation.timed("measure_speed")
+    def measure_speed(self):
+        """
+        Measures the download and upload speed against every server.
+        Returns:
+            tuple: download speed and upload speed of the link in bits per
+            second, or None, None if no server could be measured.
+        """
+        # A failed test must not report the bytes of the previous one
+        self.last_test_bytes = (0, 0)
+        try:
+            if self.mode == "concurrent":
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(
+                        len(self.servers), thread_name_prefix="speed"
+                    )
+                results = list(self.executor.map(self.measure_server, self.servers))
+            else:
+                results = []
+                for index, server in enumerate(self.servers):
+                    if index and self.stagger:
+                        time.sleep(self.stagger)
+                    results.append(self.measure_server(server))
+
+            aggregate = self.aggregate(results)
+            self.last_measurement = results + [aggregate]
+            self.last_test_bytes = (
+                aggregate["bytes_sent"],
+                aggregate["bytes_received"],
+            )
+            if aggregate["status"] != "ok":
+                return None, None
+            return aggregate["download_speed"], aggregate["upload_speed"]
+        except Exception as e:
+            self.logger.error(f"Error measuring speed: {e}")
+            return None, None
+
+    def aggregate(self, results):
+        """
+        Combine the results of the servers of one measurement.
+
+        Returns:
+            dict: The aggregate row, with the link's speeds and the medians
+            and spreads of the servers'.
+        """
+        aggregate = {
+            "server": AGGREGATE,
+            "bytes_sent": sum(result.get("bytes_sent", 0) for result in results),
+            "bytes_received": sum(
+                result.get("bytes_received", 0) for result in results
+            ),
+        }
+        latencies = [
+            result["latency_ms"]
+            for result in results
+            if result.get("latency_ms") is not None
+        ]
+        aggregate["latency_ms"] = statistics.median(latencies) if latencies else None
+        # The link's speeds sum both directions over the same servers, so a
+        # server that only measured one of them is left out of the sums
+        complete = [
+            result
+            for result in results
+            if result.get("download_speed") is not None
+            and result.get("upload_speed") is not None
+        ]
+        for direction in ("download", "upload"):
+            speeds = [
+                result[f"{direction}_speed"]
+                for result in results
+                if result.get(f"{direction}_speed") is not None
+            ]
+            median = statistics.median(speeds) if speeds else None
+            aggregate[f"{direction}_median"] = median
+            aggregate[f"{direction}_spread"] = spread(speeds)
+            if self.mode == "concurrent":
+                aggregate[f"{direction}_speed"] = (
+                    sum(result[f"{direction}_speed"] for result in complete)
+                    if complete
+                    else None
+                )
+            else:
+                aggregate[f"{direction}_speed"] = median
+        ok = (
+            aggregate["download_speed"] is not None
+            and aggregate["upload_speed"] is not None
+        )
+        aggregate["status"] = "ok" if ok else "failed"
+        return aggregate
+
+    def write_to_csv(self, download_speed, upload_speed, timestamp=None):
+        """
+        Writes the link's speeds to the speed results file, and the results
+        of every server of the last measurement to the servers file.
+        Args:
+            download_speed (float): The download speed in bits per second.
+            upload_speed (float): The upload speed in bits per second.
+            timestamp (datetime): Time of the measurement, defaults to now.
+        """
+        timestamp = timestamp or datetime.now()
+        super().write_to_csv(download_speed, upload_speed, timestamp)
+        if self.last_measurement:
+            self.write_servers_to_csv(self.last_measurement, timestamp)
+
+    @instrumentation.timed("speed_servers_write_to_csv")
+    def write_servers_to_csv(self, results, timestamp=None):
+        """
+        Writes per-server and aggregate results to the servers CSV file.
+        Args:
+            results (list of dict): Rows with the FIELDNAMES columns but the
+                timestamp; missing ones are left empty.
+            timestamp (datetime): Time of the measurement, defaults to now.
+        """
+        try:
+            timestamp = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+            with open(self.servers_filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                writer = csv.DictWriter(
+                    csvfile, fieldnames=FIELDNAMES, extrasaction="ignore"
+                )
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                writer.writerows(
+                    dict(result, timestamp=timestamp) for result in results
+                )
+                instrumentation.add_bytes_written(
+                    "speed_servers_csv", csvfile.tell() - start
+                )
+            if self.catalog is not None:
+                self.catalog.update(self.servers_filename)
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
+            return
+        self.logger.info(
+            f"Data written to {self.servers_filename}: "
+            + ", ".join(
+                f"{result['server']} {mbps(result.get('download_speed'))}"
+                f"/{mbps(result.get('upload_speed'))} Mbps"
+                for result in results
+                if result["status"] == "ok" and result["server"] != AGGREGATE
+            )
+        )
+
+    def close(self):
+        """
+        Close the pooled sessions and worker threads.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
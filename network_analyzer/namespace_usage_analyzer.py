@@ -0,0 +1,232 @@
+import csv
+import os
+import re
+import time
+from datetime import datetime
+import logging
+from util.instrumentation import instrumentation
+
+NAMESPACE_USAGE_ANALYZER = "NAMESPACE USAGE ANALYZER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+CONTAINER_ID = re.compile(r"([0-9a-f]{64})")
+CGROUP_RUNTIMES = (
+    ("docker", "docker"),
+    ("containerd", "containerd"),
+    ("cri-containerd", "containerd"),
+    ("crio", "crio"),
+    ("libpod", "podman"),
+    ("kubepods", "k8s"),
+    ("lxc", "lxc"),
+)
+
+
+def read_net_dev(path, skip_loopback=True):
+    """
+    Sum the byte counters of a /proc/<pid>/net/dev file.
+
+    Args:
+        path (str): Path to the net/dev file.
+        skip_loopback (bool): Whether to leave out the lo interface.
+
+    Returns:
+        tuple: Bytes sent and bytes received.
+    """
+    with open(path, "rb") as file:
+        lines = file.read().splitlines()[2:]
+    sent_bytes = 0
+    recv_bytes = 0
+    for line in lines:
+        interface, _, counters = line.partition(b":")
+        if skip_loopback and interface.strip() == b"lo":
+            continue
+        fields = counters.split()
+        recv_bytes += int(fields[0])
+        sent_bytes += int(fields[8])
+    return sent_bytes, recv_bytes
+
+
+def cgroup_name(pid, proc="/proc"):
+    """
+    Derive a container or cgroup name for a process.
+
+    Args:
+        pid (int): Process ID.
+        proc (str): Mount point of procfs.
+
+    Returns:
+        str: "<runtime>:<short id>" for containers, the cgroup path otherwise,
+        or the process name if the cgroup can't be read.
+    """
+    try:
+        with open(f"{proc}/{pid}/cgroup", "r") as file:
+            paths = [line.rstrip("\n").split(":", 2)[2] for line in file]
+    except (OSError, IndexError):
+        paths = []
+    for path in paths:
+        match = CONTAINER_ID.search(path)
+        if match:
+            runtime = next(
+                (name for marker, name in CGROUP_RUNTIMES if marker in path),
+                "container",
+            )
+            return f"{runtime}:{match.group(1)[:12]}"
+    for path in paths:
+        if path not in ("", "/"):
+            return path
+    try:
+        with open(f"{proc}/{pid}/comm", "r") as file:
+            return file.read().strip()
+    except OSError:
+        return str(pid)
+
+
+class NamespaceUsageAnalyzer:
+    """
+    Per-network-namespace traffic accounting, e.g. per container.
+
+    Namespaces are discovered from /proc/<pid>/ns/net and de-duplicated by
+    inode. Discovery is cached: a refresh lists /proc and only inspects PIDs
+    it has not seen before, and runs at most every `discovery_interval`
+    seconds or when a namespace's process exits. Each sample then reads one
+    /proc/<pid>/net/dev file per namespace.
+    """
+
+    def __init__(
+        self,
+        filename,
+        logger=None,
+        discovery_interval=30,
+        skip_loopback=True,
+        proc="/proc",
+    ):
+        results_dir = "results"
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        self.filename = filename
+        self.logger = logger if logger is not None else default_logger
+        self.discovery_interval = discovery_interval
+        self.skip_loopback = skip_loopback
+        self.proc = proc
+        self.host_namespace = self.namespace_of("self")
+        # pid -> namespace inode, for every PID seen so far
+        self.pid_namespaces = {}
+        # namespace inode -> {"pids": set, "name": str}
+        self.namespaces = {}
+        self.last_discovery = None
+
+    def namespace_of(self, pid):
+        try:
+            return os.stat(f"{self.proc}/{pid}/ns/net").st_ino
+        except OSError:
+            return None
+
+    @instrumentation.timed("discover_namespaces")
+    def discover(self):
+        """
+        Refresh the namespace cache incrementally.
+        """
+        pids = {int(entry) for entry in os.listdir(self.proc) if entry.isdigit()}
+        known = self.pid_namespaces.keys()
+
+        for pid in known - pids:
+            inode = self.pid_namespaces.pop(pid)
+            namespace = self.namespaces.get(inode)
+            if namespace is not None:
+                namespace["pids"].discard(pid)
+                if not namespace["pids"]:
+                    del self.namespaces[inode]
+
+        for pid in pids - known:
+            inode = self.namespace_of(pid)
+            # Kernel threads and processes we may not inspect are remembered
+            # too, so they are not stat'ed again on every refresh
+            self.pid_namespaces[pid] = inode
+            if inode is None:
+                continue
+            namespace = self.namespaces.get(inode)
+            if namespace is None:
+                name = "host" if inode == self.host_namespace else cgroup_name(pid, self.proc)
+                namespace = self.namespaces[inode] = {"pids": set(), "name": name}
+            namespace["pids"].add(pid)
+
+        self.last_discovery = time.monotonic()
+
+    @instrumentation.timed("get_network_usage_per_namespace")
+    def get_network_usage(self):
+        """
+        Gets the network usage statistics of every namespace.
+        Returns:
+            dict: Namespace inode to a tuple of name, bytes sent and bytes
+            received, or None on error.
+        """
+        try:
+            if (
+                self.last_discovery is None
+                or time.monotonic() - self.last_discovery >= self.discovery_interval
+            ):
+                self.discover()
+
+            usage = {}
+            stale = False
+            for inode, namespace in self.namespaces.items():
+                for pid in sorted(namespace["pids"]):
+                    try:
+                        sent_bytes, recv_bytes = read_net_dev(
+                            f"{self.proc}/{pid}/net/dev", self.skip_loopback
+                        )
+                        usage[inode] = (namespace["name"], sent_bytes, recv_bytes)
+                        break
+                    except OSError:
+                        # The process exited, try another one in the namespace
+                        stale = True
+            if stale:
+                self.last_discovery = None
+            return usage
+        except Exception as e:
+            self.logger.error(f"Error getting per-namespace network usage: {e}")
+            return None
+
+    @instrumentation.timed("namespace_write_to_csv")
+    def write_to_csv(self, usage, timestamp=None):
+        """
+        Writes the per-namespace usage statistics to a CSV file, one row per namespace.
+        Args:
+            usage (dict): Namespace inode to a tuple of name, bytes sent and bytes received.
+            timestamp (datetime): Time of the sample, defaults to now.
+        """
+        try:
+            with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                fieldnames = ["timestamp", "namespace", "name", "sent_bytes", "recv_bytes"]
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                now = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+                for inode, (name, sent_bytes, recv_bytes) in usage.items():
+                    writer.writerow(
+                        {
+                            "timestamp": now,
+                            "namespace": inode,
+                            "name": name,
+                            "sent_bytes": sent_bytes,
+                            "recv_bytes": recv_bytes,
+                        }
+                    )
+                instrumentation.add_bytes_written(
+                    "namespace_csv", csvfile.tell() - start
+                )
+            self.logger.info(
+                f"Data written to {self.filename}: {len(usage)} network namespaces"
+            )
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
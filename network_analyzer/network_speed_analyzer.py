@@ -1,54 +1,86 @@
-import speedtest
 import csv
 from datetime import datetime
 import logging
 import os
+from util.instrumentation import instrumentation
 
 NETWORK_SPEED_ANALYZER = "SPEED ANALYZER"
 
 # Setup a default logging configuration
 default_logger = logging.getLogger("default_logger")
 default_logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
-default_logger.addHandler(handler)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
 
 
 class NetworkSpeedAnalyzer:
-    def __init__(self, filename, logger=None):
+    def __init__(
+        self, filename, logger=None, backend=None, history=None, catalog=None
+    ):
         results_dir = "results"
         if not os.path.exists(results_dir):
             os.makedirs(results_dir)
         self.filename = filename
         self.logger = logger if logger is not None else default_logger
+        # Anything with speedtest's Speedtest class, e.g. a replay mock.
+        # speedtest itself is imported on the first measurement.
+        self.backend = backend
+        # Optional SeriesStore keeping the measurements compressed in memory
+        self.history = history
+        # Optional ResultsCatalog told about every row appended
+        self.catalog = catalog
+        # Bytes sent and received by the last test, if the backend reports them
+        self.last_test_bytes = (0, 0)
 
+    @instrumentation.timed("measure_speed")
     def measure_speed(self):
         """
         Measures the download and upload speed using the speedtest library.
         Returns:
             tuple: download speed and upload speed in bits per second.
         """
+        # A failed test must not report the bytes of the previous one
+        self.last_test_bytes = (0, 0)
         try:
-            st = speedtest.Speedtest()
+            if self.backend is None:
+                import speedtest
+
+                self.backend = speedtest
+            st = self.backend.Speedtest()
             st.download()
             st.upload()
             st.results.share()
 
             results_dict = st.results.dict()
+            self.last_test_bytes = (
+                results_dict.get("bytes_sent") or 0,
+                results_dict.get("bytes_received") or 0,
+            )
             return results_dict["download"], results_dict["upload"]
         except Exception as e:
             self.logger.error(f"Error measuring speed: {e}")
             return None, None
 
-    def write_to_csv(self, download_speed, upload_speed):
+    @instrumentation.timed("speed_write_to_csv")
+    def write_to_csv(self, download_speed, upload_speed, timestamp=None):
         """
         Writes the measured download and upload speeds to a CSV file.
         Args:
             download_speed (float): The download speed in bits per second.
             upload_speed (float): The upload speed in bits per second.
+            timestamp (datetime): Time of the measurement, defaults to now.
         """
         try:
+            timestamp = timestamp or datetime.now()
+            if self.history is not None:
+                self.history.append(
+                    "download_speed", timestamp.timestamp(), download_speed
+                )
+                self.history.append("upload_speed", timestamp.timestamp(), upload_speed)
             with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
                 fieldnames = ["timestamp", "download_speed", "upload_speed"]
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
@@ -57,11 +89,14 @@ class NetworkSpeedAnalyzer:
 
                 writer.writerow(
                     {
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
                         "download_speed": download_speed,
                         "upload_speed": upload_speed,
                     }
                 )
+                instrumentation.add_bytes_written("speed_csv", csvfile.tell() - start)
+            if self.catalog is not None:
+                self.catalog.update(self.filename)
             self.logger.info(
                 f"Data written to {self.filename}: Download {download_speed / 1_000_000:.2f} Mbps, Upload {upload_speed / 1_000_000:.2f} Mbps"
             )
@@ -1,27 +1,149 @@
 import psutil
 import csv
+from collections import deque
 from datetime import datetime
 import logging
 import os
+import time
+from util.instrumentation import instrumentation
 
 NETWORK_USAGE_ANALYZER = "DATA USAGE ANALYZER"
 
 # Setup a default logging configuration
 default_logger = logging.getLogger("default_logger")
 default_logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
-default_logger.addHandler(handler)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+
+class AdaptiveInterval:
+    """
+    Sampling interval that follows the traffic.
+
+    Each sample's upload and download rates are compared with their moving
+    averages: a change of more than `threshold` of the average (or of
+    `noise_floor` bytes/s on an idle link) drops the interval to
+    `min_interval` to catch the burst, while flat traffic doubles it on
+    every sample up to `max_interval`. An idle or steady link is then
+    sampled rarely, and a burst at full resolution from its second sample.
+    """
+
+    def __init__(
+        self,
+        min_interval=1,
+        max_interval=60,
+        threshold=0.25,
+        noise_floor=1024,
+        smoothing=0.3,
+        window=600,
+    ):
+        """
+        Args:
+            min_interval (float): Shortest interval in seconds.
+            max_interval (float): Longest interval in seconds.
+            threshold (float): Relative rate change counted as a burst.
+            noise_floor (float): Rate changes below this many bytes/s are flat.
+            smoothing (float): Weight of the newest rate in the moving average.
+            window (float): Seconds over which the effective rate is reported.
+        """
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(
+                f"Invalid adaptive interval range: {min_interval}-{max_interval}"
+            )
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.noise_floor = noise_floor
+        self.smoothing = smoothing
+        self.window = window
+        self.interval = min_interval
+        self.last = None
+        self.averages = None
+        self.samples = 0
+        self.times = deque()
+
+    def observe(self, timestamp, sent_bytes, recv_bytes):
+        """
+        Take a sample of the cumulative counters into account.
+
+        Args:
+            timestamp (float): Sample time in seconds, e.g. time.monotonic().
+            sent_bytes (int): Total bytes sent.
+            recv_bytes (int): Total bytes received.
+
+        Returns:
+            float: Seconds until the next sample.
+        """
+        self.samples += 1
+        self.times.append(timestamp)
+        while self.times[0] < timestamp - self.window:
+            self.times.popleft()
+
+        last, self.last = self.last, (timestamp, sent_bytes, recv_bytes)
+        if last is None or timestamp <= last[0]:
+            return self.interval
+        if sent_bytes < last[1] or recv_bytes < last[2]:
+            # Counters reset, e.g. an interface went down: start over
+            self.averages = None
+            self.interval = self.min_interval
+            return self.interval
+
+        elapsed = timestamp - last[0]
+        rates = ((sent_bytes - last[1]) / elapsed, (recv_bytes - last[2]) / elapsed)
+        if self.averages is None:
+            self.averages = rates
+            return self.interval
+
+        burst = any(
+            abs(rate - average) > max(self.threshold * average, self.noise_floor)
+            for rate, average in zip(rates, self.averages)
+        )
+        self.averages = tuple(
+            average + self.smoothing * (rate - average)
+            for rate, average in zip(rates, self.averages)
+        )
+        if burst:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        return self.interval
+
+    def effective_rate(self):
+        """
+        Get the samples per minute taken over the last `window` seconds.
+        """
+        if len(self.times) < 2 or self.times[-1] <= self.times[0]:
+            return 0.0
+        return (len(self.times) - 1) * 60 / (self.times[-1] - self.times[0])
 
 
 class NetworkUsageAnalyzer:
-    def __init__(self, filename, logger=None):
+    def __init__(
+        self,
+        filename,
+        logger=None,
+        backend=None,
+        history=None,
+        catalog=None,
+        adaptive=None,
+    ):
         results_dir = "results"
         if not os.path.exists(results_dir):
             os.makedirs(results_dir)
         self.filename = filename
         self.logger = logger if logger is not None else default_logger
+        # Anything with psutil's net_io_counters(), e.g. a replay mock
+        self.backend = backend if backend is not None else psutil
+        # Optional SeriesStore keeping the samples compressed in memory
+        self.history = history
+        # Optional ResultsCatalog told about every row appended
+        self.catalog = catalog
+        # Optional AdaptiveInterval choosing when to sample next
+        self.adaptive = adaptive
 
+    @instrumentation.timed("get_network_usage")
     def get_network_usage(self):
         """
         Gets the network usage statistics.
@@ -29,21 +151,48 @@ class NetworkUsageAnalyzer:
             tuple: Bytes sent and bytes received.
         """
         try:
-            net_io = psutil.net_io_counters()
+            net_io = self.backend.net_io_counters()
             return net_io.bytes_sent, net_io.bytes_recv
         except Exception as e:
             self.logger.error(f"Error getting network usage: {e}")
             return None, None
 
-    def write_to_csv(self, sent_bytes, recv_bytes):
+    def next_interval(self, sent_bytes, recv_bytes, timestamp=None):
+        """
+        Gets the seconds until the next sample in adaptive mode.
+        Args:
+            sent_bytes (int): The number of bytes sent.
+            recv_bytes (int): The number of bytes received.
+            timestamp (float): Monotonic time of the sample, defaults to now.
+        Returns:
+            float: The interval, or None when sampling at a fixed rate.
+        """
+        if self.adaptive is None:
+            return None
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        interval = self.adaptive.observe(timestamp, sent_bytes, recv_bytes)
+        self.logger.debug(
+            f"Next usage sample in {interval:g} s, "
+            f"{self.adaptive.effective_rate():.1f} samples/min"
+        )
+        return interval
+
+    @instrumentation.timed("usage_write_to_csv")
+    def write_to_csv(self, sent_bytes, recv_bytes, timestamp=None):
         """
         Writes the network usage statistics to a CSV file.
         Args:
             sent_bytes (int): The number of bytes sent.
             recv_bytes (int): The number of bytes received.
+            timestamp (datetime): Time of the sample, defaults to now.
         """
         try:
+            timestamp = timestamp or datetime.now()
+            if self.history is not None:
+                self.history.append("sent_bytes", timestamp.timestamp(), sent_bytes)
+                self.history.append("recv_bytes", timestamp.timestamp(), recv_bytes)
             with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
                 fieldnames = ["timestamp", "sent_bytes", "recv_bytes"]
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
@@ -52,11 +201,14 @@ class NetworkUsageAnalyzer:
 
                 writer.writerow(
                     {
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
                         "sent_bytes": sent_bytes,
                         "recv_bytes": recv_bytes,
                     }
                 )
+                instrumentation.add_bytes_written("usage_csv", csvfile.tell() - start)
+            if self.catalog is not None:
+                self.catalog.update(self.filename)
             self.logger.info(
                 f"Data written to {self.filename}: Sent {sent_bytes / (1024 * 1024):.2f} MB, Received {recv_bytes / (1024 * 1024):.2f} MB"
             )
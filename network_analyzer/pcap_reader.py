@@ -0,0 +1,239 @@
+import struct
+from array import array
+from collections import namedtuple
+
+PCAP_READER = "PCAP READER"
+
+# Link-layer header types, see https://www.tcpdump.org/linktypes.html
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+# Bytes read from the file at a time; batches hold the packets of one chunk
+CHUNK_SIZE = 4 * 1024 * 1024
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+PCAPNG_LITTLE_ENDIAN = b"\x4d\x3c\x2b\x1a"
+
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_INTERFACE = 1
+PCAPNG_SIMPLE_PACKET = 3
+PCAPNG_ENHANCED_PACKET = 6
+PCAPNG_OPTION_TSRESOL = 9
+
+PacketBatch = namedtuple(
+    "PacketBatch",
+    ["buffer", "timestamps", "linktypes", "offsets", "lengths", "wire_lengths"],
+)
+PacketBatch.__doc__ = """
+Packets of one chunk of a capture, stored column-wise.
+
+`buffer` is reused for the next chunk, so a batch is only valid until the
+reader yields the next one. Packet i is
+buffer[offsets[i]:offsets[i] + lengths[i]], captured at timestamps[i] with
+link type linktypes[i]; wire_lengths[i] is its length on the wire.
+"""
+
+
+def new_batch(buffer):
+    return PacketBatch(
+        buffer, array("d"), array("H"), array("L"), array("L"), array("L")
+    )
+
+
+class PcapReader:
+    """
+    Reader for pcap and pcapng capture files.
+
+    The file is read in CHUNK_SIZE pieces into one reusable buffer and the
+    record headers are decoded in place with struct, so no bytes object is
+    created per packet. Each chunk comes out as a PacketBatch. Packet blocks
+    that can't be read, e.g. of an interface that wasn't described, are
+    counted in `malformed` and left out.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.malformed = 0
+
+    def __iter__(self):
+        with open(self.path, "rb") as file:
+            magic = file.read(4)
+            file.seek(0)
+            if magic == PCAPNG_MAGIC:
+                yield from self.read_pcapng(file)
+            elif magic in PCAP_MAGIC:
+                yield from self.read_pcap(file, *PCAP_MAGIC[magic])
+            else:
+                raise ValueError(f"{self.path} is not a pcap or pcapng file")
+
+    def chunks(self, file):
+        """
+        Yield (buffer, filled) with unconsumed bytes carried over between chunks.
+
+        The consumer sends back how many bytes of the buffer it used.
+        """
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        filled = 0
+        while True:
+            read = file.readinto(view[filled:])
+            filled += read
+            if not filled:
+                return
+            used = yield buffer, filled
+            if read == 0 and used == 0:
+                return
+            # Carry the partial record at the end over to the next chunk
+            buffer[: filled - used] = buffer[used:filled]
+            filled -= used
+            if filled == len(buffer):
+                # A single record larger than the buffer
+                view.release()
+                buffer.extend(bytes(len(buffer)))
+                view = memoryview(buffer)
+
+    def read_pcap(self, file, endian, resolution):
+        linktype = struct.unpack(endian + "4sHHiIII", file.read(24))[-1]
+        record = struct.Struct(endian + "IIII")
+        record_size = record.size
+        unpack_from = record.unpack_from
+        chunks = self.chunks(file)
+        used = None
+        while True:
+            try:
+                buffer, filled = chunks.send(used)
+            except StopIteration:
+                return
+            batch = new_batch(buffer)
+            timestamps, offsets, lengths, wire_lengths = (
+                batch.timestamps,
+                batch.offsets,
+                batch.lengths,
+                batch.wire_lengths,
+            )
+            position = 0
+            while position + record_size <= filled:
+                seconds, fraction, length, wire_length = unpack_from(buffer, position)
+                end = position + record_size + length
+                if end > filled:
+                    break
+                timestamps.append(seconds + fraction * resolution)
+                offsets.append(position + record_size)
+                lengths.append(length)
+                wire_lengths.append(wire_length)
+                position = end
+            batch.linktypes.extend(array("H", [linktype]) * len(offsets))
+            used = position
+            if offsets:
+                yield batch
+
+    def read_pcapng(self, file):
+        chunks = self.chunks(file)
+        endian = "<"
+        block = struct.Struct("<II")
+        enhanced = struct.Struct("<IIIII")
+        # Per interface of the current section: (link type, seconds per tick)
+        interfaces = []
+        last_timestamp = 0.0
+        used = None
+        while True:
+            try:
+                buffer, filled = chunks.send(used)
+            except StopIteration:
+                return
+            batch = new_batch(buffer)
+            timestamps, linktypes, offsets, lengths, wire_lengths = batch[1:]
+            position = 0
+            while position + 12 <= filled:
+                block_type, block_length = block.unpack_from(buffer, position)
+                if block_type == PCAPNG_SECTION_HEADER:
+                    # The byte order magic follows the block length
+                    byte_order = buffer[position + 8 : position + 12]
+                    endian = "<" if byte_order == PCAPNG_LITTLE_ENDIAN else ">"
+                    block = struct.Struct(endian + "II")
+                    enhanced = struct.Struct(endian + "IIIII")
+                    block_type, block_length = block.unpack_from(buffer, position)
+                if block_length < 12:
+                    raise ValueError(
+                        f"Corrupt pcapng block at {position} in {self.path}"
+                    )
+                if position + block_length > filled:
+                    break
+                body = position + 8
+                if block_type == PCAPNG_SECTION_HEADER:
+                    interfaces = []
+                elif block_type == PCAPNG_INTERFACE:
+                    interfaces.append(
+                        self.parse_interface(
+                            buffer, body, position + block_length - 4, endian
+                        )
+                    )
+                elif block_type == PCAPNG_ENHANCED_PACKET:
+                    if block_length < 32:
+                        self.malformed += 1
+                        position += block_length
+                        continue
+                    interface, high, low, length, wire_length = enhanced.unpack_from(
+                        buffer, body
+                    )
+                    if interface >= len(interfaces):
+                        self.malformed += 1
+                        position += block_length
+                        continue
+                    linktype, resolution = interfaces[interface]
+                    last_timestamp = ((high << 32) | low) * resolution
+                    timestamps.append(last_timestamp)
+                    linktypes.append(linktype)
+                    offsets.append(body + 20)
+                    lengths.append(min(length, block_length - 32))
+                    wire_lengths.append(wire_length)
+                elif block_type == PCAPNG_SIMPLE_PACKET:
+                    if block_length < 16 or not interfaces:
+                        self.malformed += 1
+                        position += block_length
+                        continue
+                    (wire_length,) = struct.unpack_from(endian + "I", buffer, body)
+                    # Simple packets carry no timestamp
+                    timestamps.append(last_timestamp)
+                    linktypes.append(interfaces[0][0])
+                    offsets.append(body + 4)
+                    lengths.append(min(wire_length, block_length - 16))
+                    wire_lengths.append(wire_length)
+                position += block_length
+            used = position
+            if offsets:
+                yield batch
+
+    @staticmethod
+    def parse_interface(buffer, body, end, endian):
+        """
+        Parse an interface description block body.
+
+        Returns:
+            tuple: Link type and seconds per timestamp tick.
+        """
+        (linktype,) = struct.unpack_from(endian + "H", buffer, body)
+        resolution = 1e-6
+        option = body + 8
+        while option + 4 <= end:
+            code, length = struct.unpack_from(endian + "HH", buffer, option)
+            if code == 0:
+                break
+            if code == PCAPNG_OPTION_TSRESOL and length >= 1:
+                value = buffer[option + 4]
+                resolution = 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0**-value
+            option += 4 + (length + 3) // 4 * 4
+        return linktype, resolution
@@ -0,0 +1,104 @@
+import psutil
+import csv
+from datetime import datetime
+import logging
+import os
+from util.instrumentation import instrumentation
+
+PER_NIC_USAGE_ANALYZER = "PER-NIC USAGE ANALYZER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+
+class PerNicUsageAnalyzer:
+    def __init__(
+        self,
+        filename,
+        logger=None,
+        backend=None,
+        interfaces=None,
+        history=None,
+        catalog=None,
+    ):
+        results_dir = "results"
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        self.filename = filename
+        self.logger = logger if logger is not None else default_logger
+        # Anything with psutil's net_io_counters(pernic=True), e.g. a replay mock
+        self.backend = backend if backend is not None else psutil
+        self.interfaces = set(interfaces) if interfaces else None
+        # Optional SeriesStore keeping "<nic>/sent_bytes" and
+        # "<nic>/recv_bytes" compressed in memory
+        self.history = history
+        # Optional ResultsCatalog told about every row appended
+        self.catalog = catalog
+
+    @instrumentation.timed("get_network_usage_per_nic")
+    def get_network_usage(self):
+        """
+        Gets the network usage statistics of every interface.
+        Returns:
+            dict: Interface name to a tuple of bytes sent and bytes received,
+            or None on error.
+        """
+        try:
+            counters = self.backend.net_io_counters(pernic=True)
+            return {
+                nic: (net_io.bytes_sent, net_io.bytes_recv)
+                for nic, net_io in counters.items()
+                if self.interfaces is None or nic in self.interfaces
+            }
+        except Exception as e:
+            self.logger.error(f"Error getting per-interface network usage: {e}")
+            return None
+
+    @instrumentation.timed("per_nic_write_to_csv")
+    def write_to_csv(self, usage, timestamp=None):
+        """
+        Writes the per-interface usage statistics to a CSV file, one row per interface.
+        Args:
+            usage (dict): Interface name to a tuple of bytes sent and bytes received.
+            timestamp (datetime): Time of the sample, defaults to now.
+        """
+        try:
+            timestamp = timestamp or datetime.now()
+            if self.history is not None:
+                epoch = timestamp.timestamp()
+                for nic, (sent_bytes, recv_bytes) in usage.items():
+                    self.history.append(f"{nic}/sent_bytes", epoch, sent_bytes)
+                    self.history.append(f"{nic}/recv_bytes", epoch, recv_bytes)
+            with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                fieldnames = ["timestamp", "interface", "sent_bytes", "recv_bytes"]
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                now = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+                for nic, (sent_bytes, recv_bytes) in sorted(usage.items()):
+                    writer.writerow(
+                        {
+                            "timestamp": now,
+                            "interface": nic,
+                            "sent_bytes": sent_bytes,
+                            "recv_bytes": recv_bytes,
+                        }
+                    )
+                instrumentation.add_bytes_written(
+                    "per_nic_csv", csvfile.tell() - start
+                )
+            if self.catalog is not None:
+                self.catalog.update(self.filename)
+            self.logger.info(
+                f"Data written to {self.filename}: {len(usage)} interfaces"
+            )
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
@@ -0,0 +1,330 @@
+import csv
+import os
+import re
+import subprocess
+import time
+from datetime import datetime
+import logging
+from util.instrumentation import instrumentation
+
+PROCESS_USAGE_ANALYZER = "PROCESS USAGE ANALYZER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+SOCKET_TABLES = ("tcp", "tcp6", "udp", "udp6")
+
+# Traffic of sockets whose owner is unknown (exited, or not readable without root)
+UNATTRIBUTED_PID = 0
+
+SS_COMMAND = ("ss", "-tinHe")
+SS_INODE = re.compile(rb"\bino:(\d+)")
+SS_BYTES_SENT = re.compile(rb"\bbytes_acked:(\d+)")
+SS_BYTES_RECEIVED = re.compile(rb"\bbytes_received:(\d+)")
+
+
+def read_socket_inodes(proc="/proc"):
+    """
+    Collect the inodes of the sockets in /proc/net/{tcp,tcp6,udp,udp6}.
+
+    Args:
+        proc (str): Mount point of procfs.
+
+    Returns:
+        dict: Socket inode to the name of the table it was found in.
+    """
+    sockets = {}
+    for table in SOCKET_TABLES:
+        try:
+            with open(f"{proc}/net/{table}", "rb") as file:
+                lines = file.read().splitlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            inode = int(line.split(None, 10)[9])
+            # TIME_WAIT sockets no longer belong to anyone
+            if inode:
+                sockets[inode] = table
+    return sockets
+
+
+def read_tcp_counters():
+    """
+    Read the byte counters of every TCP connection from the kernel's tcp_info via ss.
+
+    Returns:
+        dict: Socket inode to a tuple of bytes sent (acknowledged) and bytes received.
+    """
+    output = subprocess.run(
+        SS_COMMAND, capture_output=True, check=True, timeout=10
+    ).stdout
+    counters = {}
+    inode = None
+    # ss prints each socket on one line and its tcp_info on the next, indented one
+    for line in output.splitlines():
+        if not line[:1].isspace():
+            match = SS_INODE.search(line)
+            inode = int(match.group(1)) if match else None
+            continue
+        if not inode:
+            continue
+        sent = SS_BYTES_SENT.search(line)
+        received = SS_BYTES_RECEIVED.search(line)
+        counters[inode] = (
+            int(sent.group(1)) if sent else 0,
+            int(received.group(1)) if received else 0,
+        )
+    return counters
+
+
+def top_processes(usage, count=10):
+    """
+    Pick the processes with the most traffic.
+
+    Args:
+        usage (dict): PID to a tuple of name, bytes sent, bytes received and connections.
+        count (int): Number of processes to keep.
+
+    Returns:
+        dict: The `count` busiest processes, busiest first.
+    """
+    ranked = sorted(
+        usage.items(),
+        key=lambda item: (item[1][1] + item[1][2], item[1][3]),
+        reverse=True,
+    )
+    return dict(ranked[:count])
+
+
+class ProcessUsageAnalyzer:
+    """
+    Per-process traffic attribution.
+
+    Byte counters come per TCP connection from the kernel's tcp_info (read
+    with one `ss` call per sample) and are attributed to the process owning
+    the socket. Socket ownership is the expensive part, since it means
+    reading every /proc/<pid>/fd link, so it is cached as socket inode -> PID
+    and refreshed incrementally: new PIDs are scanned right away, processes
+    already owning sockets are rescanned when unknown sockets appear, and a
+    full scan runs at most every `full_scan_interval` seconds. Sockets still
+    unresolved after a full scan are remembered as unattributed and don't
+    trigger further scans.
+
+    UDP sockets have no byte counters, they are only counted as connections.
+    """
+
+    def __init__(self, filename, logger=None, full_scan_interval=300, proc="/proc"):
+        results_dir = "results"
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        self.filename = filename
+        self.logger = logger if logger is not None else default_logger
+        self.full_scan_interval = full_scan_interval
+        self.proc = proc
+        # socket inode -> owning PID, or None if no readable process owns it
+        self.inode_pids = {}
+        # PID -> socket inodes found by the last scan of its fd directory
+        self.pid_inodes = {}
+        self.names = {}
+        # socket inode -> (bytes sent, bytes received) at the previous sample
+        self.last_counters = None
+        self.last_full_scan = None
+        self.counters_available = True
+
+    def scan_pid(self, pid):
+        """
+        Find the sockets a process holds open.
+
+        Returns:
+            set: Socket inodes, or None if the process exited or can't be inspected.
+        """
+        fd_dir = f"{self.proc}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            return None
+        inodes = set()
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                inodes.add(int(target[8:-1]))
+        return inodes
+
+    def update_pid(self, pid, inodes):
+        for inode in self.pid_inodes.get(pid, set()) - inodes:
+            if self.inode_pids.get(inode) == pid:
+                del self.inode_pids[inode]
+        for inode in inodes:
+            self.inode_pids[inode] = pid
+        self.pid_inodes[pid] = inodes
+
+    def forget_pid(self, pid):
+        self.update_pid(pid, set())
+        del self.pid_inodes[pid]
+        self.names.pop(pid, None)
+
+    def process_name(self, pid):
+        name = self.names.get(pid)
+        if name is None:
+            try:
+                with open(f"{self.proc}/{pid}/comm", "r") as file:
+                    name = file.read().strip()
+            except OSError:
+                name = str(pid)
+            self.names[pid] = name
+        return name
+
+    @instrumentation.timed("refresh_socket_owners")
+    def refresh(self, sockets):
+        """
+        Update the socket owner cache for the sockets currently open.
+
+        Args:
+            sockets (dict): Socket inodes from read_socket_inodes.
+        """
+        for inode in self.inode_pids.keys() - sockets.keys():
+            del self.inode_pids[inode]
+
+        pids = {int(entry) for entry in os.listdir(self.proc) if entry.isdigit()}
+        for pid in self.pid_inodes.keys() - pids:
+            self.forget_pid(pid)
+
+        # Processes that own sockets are the likeliest owners of new ones
+        tiers = [
+            pids - self.pid_inodes.keys(),
+            {pid for pid, inodes in self.pid_inodes.items() if inodes},
+        ]
+        if (
+            self.last_full_scan is None
+            or time.monotonic() - self.last_full_scan >= self.full_scan_interval
+        ):
+            tiers.append(pids)
+
+        scanned = set()
+        for tier, pids_to_scan in enumerate(tiers):
+            if tier and not sockets.keys() - self.inode_pids.keys():
+                break
+            for pid in pids_to_scan - scanned:
+                inodes = self.scan_pid(pid)
+                if inodes is None:
+                    # Remembered with no sockets so it isn't rescanned as new
+                    inodes = set()
+                self.update_pid(pid, inodes)
+            scanned |= pids_to_scan
+            if tier == 2:
+                self.last_full_scan = time.monotonic()
+                for inode in sockets.keys() - self.inode_pids.keys():
+                    self.inode_pids[inode] = None
+
+    @instrumentation.timed("get_network_usage_per_process")
+    def get_network_usage(self):
+        """
+        Gets the traffic of every process with open sockets since the previous call.
+        Returns:
+            dict: PID to a tuple of process name, bytes sent, bytes received
+            and number of open sockets, or None on error. Traffic of sockets
+            without a known owner is reported under PID 0. The first call
+            only takes a baseline, so every process has zero traffic.
+        """
+        try:
+            sockets = read_socket_inodes(self.proc)
+            counters = {}
+            if self.counters_available:
+                try:
+                    counters = read_tcp_counters()
+                except (OSError, subprocess.SubprocessError) as e:
+                    self.counters_available = False
+                    self.logger.warning(
+                        f"Per-connection byte counters unavailable ({e}), "
+                        "counting connections only"
+                    )
+            self.refresh(sockets)
+
+            usage = {}
+            for inode in sockets:
+                pid = self.inode_pids.get(inode) or UNATTRIBUTED_PID
+                name, sent_bytes, recv_bytes, connections = usage.get(
+                    pid, (None, 0, 0, 0)
+                )
+                usage[pid] = (name, sent_bytes, recv_bytes, connections + 1)
+
+            if self.last_counters is not None:
+                for inode, (sent, received) in counters.items():
+                    # A connection opened since the previous sample counts from zero
+                    last_sent, last_received = self.last_counters.get(inode, (0, 0))
+                    if sent == last_sent and received == last_received:
+                        continue
+                    pid = self.inode_pids.get(inode) or UNATTRIBUTED_PID
+                    name, sent_bytes, recv_bytes, connections = usage.get(
+                        pid, (None, 0, 0, 0)
+                    )
+                    usage[pid] = (
+                        name,
+                        sent_bytes + max(sent - last_sent, 0),
+                        recv_bytes + max(received - last_received, 0),
+                        connections,
+                    )
+            self.last_counters = counters
+
+            return {
+                pid: (
+                    "unattributed" if pid == UNATTRIBUTED_PID else self.process_name(pid),
+                    sent_bytes,
+                    recv_bytes,
+                    connections,
+                )
+                for pid, (_, sent_bytes, recv_bytes, connections) in usage.items()
+            }
+        except Exception as e:
+            self.logger.error(f"Error getting per-process network usage: {e}")
+            return None
+
+    @instrumentation.timed("process_write_to_csv")
+    def write_to_csv(self, usage, timestamp=None):
+        """
+        Writes the per-process traffic to a CSV file, one row per process.
+        Args:
+            usage (dict): PID to a tuple of process name, bytes sent, bytes
+            received and open sockets, e.g. the result of top_processes.
+            timestamp (datetime): Time of the sample, defaults to now.
+        """
+        try:
+            with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                fieldnames = [
+                    "timestamp",
+                    "pid",
+                    "process",
+                    "sent_bytes",
+                    "recv_bytes",
+                    "connections",
+                ]
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                now = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+                for pid, (name, sent_bytes, recv_bytes, connections) in usage.items():
+                    writer.writerow(
+                        {
+                            "timestamp": now,
+                            "pid": pid,
+                            "process": name,
+                            "sent_bytes": sent_bytes,
+                            "recv_bytes": recv_bytes,
+                            "connections": connections,
+                        }
+                    )
+                instrumentation.add_bytes_written("process_csv", csvfile.tell() - start)
+            self.logger.info(f"Data written to {self.filename}: {len(usage)} processes")
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
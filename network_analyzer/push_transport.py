@@ -0,0 +1,451 @@
+import asyncio
+import collections
+import logging
+import os
+import re
+import socket
+import struct
+import threading
+import time
+
+from util.instrumentation import instrumentation
+from .shared_feed import KINDS, RECORD, SPEED, USAGE
+
+PUSH_TRANSPORT = "PUSH TRANSPORT"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+BATCH_MAGIC = b"NAP1"
+BATCH_VERSION = 1
+
+# magic, version, host name length, record count; followed by the host name
+# and the records, in the shared feed's record layout
+BATCH_HEADER = struct.Struct("<4sHHI")
+# Stream transports prefix every batch with its length
+FRAME_LENGTH = struct.Struct("<I")
+MAX_FRAME = 16 * 1024 * 1024
+# Largest batch that still fits in one UDP datagram with a long host name
+MAX_DATAGRAM_RECORDS = (65_507 - BATCH_HEADER.size - 255) // RECORD.size
+
+OUTPUT_FILES = {USAGE: "network_usage", SPEED: "speed_measurement"}
+OUTPUT_HEADERS = {
+    USAGE: "timestamp,sent_bytes,recv_bytes\n",
+    SPEED: "timestamp,download_speed,upload_speed\n",
+}
+
+
+def parse_address(address):
+    """
+    Parse a push address: "unix:/path/to.sock", "tcp://host:port" or
+    "udp://host:port".
+
+    Returns:
+        tuple: Scheme and the socket address, a path or (host, port).
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:") :]
+    scheme, separator, target = address.partition("://")
+    if not separator or scheme not in ("tcp", "udp"):
+        raise ValueError(f"Unsupported push address: {address}")
+    host, _, port = target.rpartition(":")
+    return scheme, (host.strip("[]") or "0.0.0.0", int(port))
+
+
+def encode_batch(host, records):
+    """
+    Encode a batch of packed records sent by one host.
+
+    Args:
+        host (bytes): Host name.
+        records (list of bytes): Records packed with RECORD.
+
+    Returns:
+        bytes: The batch.
+    """
+    return (
+        BATCH_HEADER.pack(BATCH_MAGIC, BATCH_VERSION, len(host), len(records))
+        + host
+        + b"".join(records)
+    )
+
+
+def decode_batch(data):
+    """
+    Returns:
+        tuple: Host name and the list of (timestamp, kind, first, second) records.
+    """
+    magic, version, host_length, count = BATCH_HEADER.unpack_from(data)
+    if magic != BATCH_MAGIC or version != BATCH_VERSION:
+        raise ValueError("Not a network analyzer batch")
+    offset = BATCH_HEADER.size + host_length
+    if len(data) != offset + count * RECORD.size:
+        raise ValueError(f"Truncated batch of {count} records")
+    host = bytes(data[BATCH_HEADER.size : offset]).decode("utf-8", "replace")
+    return host, list(RECORD.iter_unpack(memoryview(data)[offset:]))
+
+
+class PushAgent:
+    """
+    Pushes the samples of a headless collector to a PushAggregator.
+
+    Samples are packed into fixed 32-byte records as they are published and
+    sent in batches from a background thread, once `batch_size` records are
+    waiting or every `flush_interval` seconds. If the aggregator is away or
+    slow, records wait in a buffer of `buffer_size` and the oldest are
+    dropped when it's full, so the collector itself never blocks.
+    """
+
+    def __init__(
+        self,
+        address,
+        host=None,
+        logger=None,
+        batch_size=256,
+        flush_interval=1.0,
+        buffer_size=100_000,
+    ):
+        self.address = address
+        self.scheme, self.target = parse_address(address)
+        self.host = (host or socket.gethostname()).encode("utf-8")[:255]
+        self.logger = logger if logger is not None else default_logger
+        self.batch_size = batch_size
+        if self.scheme == "udp":
+            self.batch_size = min(batch_size, MAX_DATAGRAM_RECORDS)
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.records = collections.deque()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.sock = None
+        self.thread = None
+        self.sent = 0
+        self.dropped = 0
+        self.connected = False
+
+    def start(self):
+        """
+        Start sending in the background.
+        """
+        self.thread = threading.Thread(target=self.run, name="push-agent", daemon=True)
+        self.thread.start()
+        self.logger.info(f"Pushing samples to {self.address}")
+
+    def publish(self, kind, first, second, timestamp=None):
+        """
+        Queue a record.
+
+        Args:
+            kind (int): USAGE or SPEED.
+            first (float): Bytes sent or download speed.
+            second (float): Bytes received or upload speed.
+            timestamp (float): Sample time, defaults to now.
+        """
+        record = RECORD.pack(
+            time.time() if timestamp is None else timestamp, kind, first, second
+        )
+        with self.lock:
+            if len(self.records) >= self.buffer_size:
+                self.records.popleft()
+                self.dropped += 1
+            self.records.append(record)
+            if len(self.records) >= self.batch_size:
+                self.wake.set()
+
+    def publish_usage(self, sent_bytes, recv_bytes, timestamp=None):
+        self.publish(USAGE, sent_bytes, recv_bytes, timestamp)
+
+    def publish_speed(self, download_speed, upload_speed, timestamp=None):
+        self.publish(SPEED, download_speed, upload_speed, timestamp)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+        self.flush()
+
+    def connect(self):
+        if self.scheme == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(5)
+            self.sock.connect(self.target)
+        elif self.scheme == "tcp":
+            self.sock = socket.create_connection(self.target, timeout=5)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            family, kind, proto, _, target = socket.getaddrinfo(
+                *self.target, type=socket.SOCK_DGRAM
+            )[0]
+            self.sock = socket.socket(family, kind, proto)
+            self.sock.connect(target)
+        if not self.connected:
+            self.logger.info(f"Connected to aggregator at {self.address}")
+            self.connected = True
+
+    def disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def flush(self):
+        """
+        Send the waiting records, a batch at a time.
+
+        Returns:
+            bool: False if the aggregator couldn't be reached; the records
+            are kept for the next attempt.
+        """
+        while True:
+            with self.lock:
+                if not self.records:
+                    return True
+                batch = [
+                    self.records.popleft()
+                    for _ in range(min(self.batch_size, len(self.records)))
+                ]
+            data = encode_batch(self.host, batch)
+            try:
+                if self.sock is None:
+                    self.connect()
+                if self.scheme == "udp":
+                    self.sock.send(data)
+                else:
+                    self.sock.sendall(FRAME_LENGTH.pack(len(data)) + data)
+            except OSError as e:
+                if self.connected:
+                    self.logger.warning(f"Lost aggregator at {self.address}: {e}")
+                    self.connected = False
+                self.disconnect()
+                with self.lock:
+                    # Back to the front, unless newer records filled the buffer
+                    room = self.buffer_size - len(self.records)
+                    self.dropped += max(len(batch) - room, 0)
+                    self.records.extendleft(reversed(batch[len(batch) - room :]))
+                return False
+            self.sent += len(batch)
+
+    def close(self):
+        """
+        Send what's left and disconnect.
+        """
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+        else:
+            self.flush()
+        self.disconnect()
+        if self.dropped:
+            self.logger.warning(f"Dropped {self.dropped} samples the aggregator missed")
+
+
+class DatagramIngest(asyncio.DatagramProtocol):
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+
+    def datagram_received(self, data, addr):
+        aggregator = self.aggregator
+        try:
+            batch = decode_batch(data)
+        except Exception as e:
+            aggregator.errors += 1
+            aggregator.logger.error(f"Bad batch from {addr}: {e}")
+            return
+        try:
+            aggregator.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            # UDP has no way to slow the sender down
+            aggregator.dropped += len(batch[1])
+
+
+class PushAggregator:
+    """
+    Receives sample batches from many PushAgents and stores them as the
+    usage and speed CSVs of each host, <results_dir>/<host>/results/, in the
+    format of the analyzers, ready for FleetAggregator.
+
+    Connections are served concurrently by one asyncio loop; decoded
+    batches go through a bounded queue to a single writer. The writer takes
+    everything queued at once and writes it with one write per file, in a
+    worker thread, so the more samples arrive while a write is running, the
+    larger the next one. When the queue is full, stream connections stop
+    being read and the agents' sends block on the full socket buffers;
+    datagrams arriving then are counted as dropped.
+    """
+
+    def __init__(self, address, results_dir="fleet", logger=None, queue_size=1024):
+        self.address = address
+        self.results_dir = results_dir
+        self.logger = logger if logger is not None else default_logger
+        self.queue_size = queue_size
+        self.bound_address = None
+        self.ready = threading.Event()
+        self.loop = None
+        self.stopping = None
+        self.queue = None
+        # (host, kind) -> open CSV file
+        self.files = {}
+        # Formatted timestamps of recent seconds
+        self.timestamps = {}
+        self.start_time = time.strftime("%Y-%m-%d_%H-%M-%S")
+        self.samples = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def run(self, duration=None):
+        """
+        Serve until stop() is called or for `duration` seconds.
+        """
+        asyncio.run(self.serve(duration))
+
+    def stop(self):
+        """
+        Stop serving; safe to call from another thread or a signal handler.
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+
+    async def serve(self, duration=None):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        self.queue = asyncio.Queue(self.queue_size)
+        scheme, target = parse_address(self.address)
+        if scheme == "udp":
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: DatagramIngest(self), local_addr=target
+            )
+            server = None
+            self.bound_address = transport.get_extra_info("sockname")
+        else:
+            if scheme == "unix":
+                if os.path.exists(target):
+                    os.remove(target)
+                server = await asyncio.start_unix_server(self.handle_stream, target)
+            else:
+                server = await asyncio.start_server(self.handle_stream, *target)
+            self.bound_address = server.sockets[0].getsockname()
+        self.logger.info(f"Aggregator listening on {self.address}")
+        self.ready.set()
+
+        writer = asyncio.create_task(self.write_loop())
+        try:
+            await asyncio.wait_for(self.stopping.wait(), duration)
+        except asyncio.TimeoutError:
+            pass
+        if server is not None:
+            server.close()
+        else:
+            transport.close()
+        await self.queue.put(None)
+        await writer
+        for file in self.files.values():
+            file.close()
+        if scheme == "unix" and os.path.exists(target):
+            os.remove(target)
+        self.logger.info(
+            f"Aggregator stopped: {self.samples} samples in {self.batches} batches, "
+            f"{self.dropped} dropped, {self.errors} bad batches"
+        )
+
+    async def handle_stream(self, reader, writer):
+        peer = writer.get_extra_info("peername") or "unix socket"
+        try:
+            while True:
+                (length,) = FRAME_LENGTH.unpack(await reader.readexactly(4))
+                if length > MAX_FRAME:
+                    raise ValueError(f"Batch of {length} bytes is too large")
+                batch = decode_batch(await reader.readexactly(length))
+                # Waits while the queue is full, which stops reading the socket
+                await self.queue.put(batch)
+        except asyncio.IncompleteReadError:
+            pass
+        except Exception as e:
+            self.errors += 1
+            self.logger.error(f"Dropping connection from {peer}: {e}")
+        finally:
+            writer.close()
+
+    async def write_loop(self):
+        while True:
+            batch = await self.queue.get()
+            batches = [batch]
+            while batch is not None and not self.queue.empty():
+                batch = self.queue.get_nowait()
+                batches.append(batch)
+            if batch is None:
+                batches.pop()
+            if batches:
+                await self.loop.run_in_executor(None, self.write_batches, batches)
+            if batch is None:
+                return
+
+    def format_time(self, timestamp):
+        second = int(timestamp)
+        text = self.timestamps.get(second)
+        if text is None:
+            if len(self.timestamps) > 4096:
+                self.timestamps.clear()
+            text = self.timestamps[second] = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(second)
+            )
+        return text
+
+    def open_file(self, host, kind):
+        # Host names come from the network, keep them to one safe path component
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", host).lstrip(".") or "unknown"
+        directory = os.path.join(self.results_dir, name, "results")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.start_time}_{OUTPUT_FILES[kind]}.csv")
+        file = open(path, "a", newline="")
+        if file.tell() == 0:
+            file.write(OUTPUT_HEADERS[kind])
+        return file
+
+    @instrumentation.timed("push_write")
+    def write_batches(self, batches):
+        """
+        Append batches of records to their hosts' CSV files, one write per file.
+        """
+        lines = {}
+        count = 0
+        for host, records in batches:
+            for timestamp, kind, first, second in records:
+                if kind not in OUTPUT_FILES:
+                    continue
+                if kind == USAGE:
+                    line = f"{self.format_time(timestamp)},{int(first)},{int(second)}\n"
+                else:
+                    line = f"{self.format_time(timestamp)},{first!r},{second!r}\n"
+                lines.setdefault((host, kind), []).append(line)
+            count += len(records)
+        try:
+            for key, host_lines in lines.items():
+                file = self.files.get(key)
+                if file is None:
+                    file = self.files[key] = self.open_file(*key)
+                data = "".join(host_lines)
+                file.write(data)
+                file.flush()
+                instrumentation.add_bytes_written("push_csv", len(data))
+        except Exception as e:
+            self.logger.error(f"Error writing pushed samples: {e}")
+        self.samples += count
+        self.batches += len(batches)
+
+    def stats(self):
+        return {
+            "samples": self.samples,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "hosts": len({host for host, _ in self.files}),
+            "kinds": sorted({KINDS[kind] for _, kind in self.files}),
+        }
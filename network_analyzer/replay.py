@@ -0,0 +1,298 @@
+import csv
+import heapq
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from util.synthetic_data import generate_speed_rows, generate_usage_rows
+from .network_usage_analyzer import NetworkUsageAnalyzer
+from .network_speed_analyzer import NetworkSpeedAnalyzer
+
+REPLAY = "REPLAY"
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+NetIOCounters = namedtuple("NetIOCounters", ["bytes_sent", "bytes_recv"])
+
+
+class MockPsutil:
+    """
+    Stand-in for the psutil module that returns the counters set by the replayer.
+    """
+
+    def __init__(self):
+        self.counters = NetIOCounters(0, 0)
+
+    def set_counters(self, sent_bytes, recv_bytes):
+        self.counters = NetIOCounters(sent_bytes, recv_bytes)
+
+    def net_io_counters(self, pernic=False):
+        if pernic:
+            return {"replay0": self.counters}
+        return self.counters
+
+
+class MockSpeedtestResults:
+    def __init__(self, download_speed, upload_speed):
+        self.download = download_speed
+        self.upload = upload_speed
+
+    def share(self):
+        return None
+
+    def dict(self):
+        return {"download": self.download, "upload": self.upload}
+
+
+class MockSpeedtestClient:
+    def __init__(self, download_speed, upload_speed):
+        self.results = MockSpeedtestResults(download_speed, upload_speed)
+
+    def get_best_server(self):
+        return {}
+
+    def download(self):
+        return self.results.download
+
+    def upload(self):
+        return self.results.upload
+
+
+class MockSpeedtest:
+    """
+    Stand-in for the speedtest module whose Speedtest() instantly reports the
+    speeds set by the replayer.
+    """
+
+    def __init__(self):
+        self.download_speed = 0.0
+        self.upload_speed = 0.0
+
+    def set_speeds(self, download_speed, upload_speed):
+        self.download_speed = download_speed
+        self.upload_speed = upload_speed
+
+    def Speedtest(self, *args, **kwargs):
+        return MockSpeedtestClient(self.download_speed, self.upload_speed)
+
+
+def load_usage_samples(filename):
+    """
+    Stream samples from a results/*_network_usage.csv file.
+
+    Args:
+        filename (str): Path to the CSV file.
+
+    Yields:
+        tuple: (timestamp, sent_bytes, recv_bytes).
+    """
+    with open(filename, "r", newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield (
+                datetime.strptime(row["timestamp"], TIMESTAMP_FORMAT),
+                int(float(row["sent_bytes"])),
+                int(float(row["recv_bytes"])),
+            )
+
+
+def load_speed_samples(filename):
+    """
+    Stream samples from a results/*_speed_measurement.csv file.
+
+    Args:
+        filename (str): Path to the CSV file.
+
+    Yields:
+        tuple: (timestamp, download_speed, upload_speed).
+    """
+    with open(filename, "r", newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield (
+                datetime.strptime(row["timestamp"], TIMESTAMP_FORMAT),
+                float(row["download_speed"]),
+                float(row["upload_speed"]),
+            )
+
+
+def merge_samples(streams):
+    """
+    Merge sample streams, e.g. one per file, into one in timestamp order.
+
+    Args:
+        streams (iterable): Iterables of (timestamp, ...) tuples, each in
+            timestamp order.
+
+    Returns:
+        iterator: The samples of all streams in timestamp order.
+    """
+    return heapq.merge(*streams, key=lambda sample: sample[0])
+
+
+def synthetic_usage_samples(count, interval=60, seed=0):
+    for row in generate_usage_rows(count, interval=interval, seed=seed):
+        yield (
+            datetime.strptime(row["timestamp"], TIMESTAMP_FORMAT),
+            row["sent_bytes"],
+            row["recv_bytes"],
+        )
+
+
+def synthetic_speed_samples(count, interval=60, seed=0):
+    for row in generate_speed_rows(count, interval=interval, seed=seed):
+        yield (
+            datetime.strptime(row["timestamp"], TIMESTAMP_FORMAT),
+            row["download_speed"],
+            row["upload_speed"],
+        )
+
+
+class Replayer:
+    """
+    Pushes recorded or synthetic samples through the collection pipeline.
+
+    Each sample is loaded into a mock psutil/speedtest backend and then goes
+    through the same calls as a live tick: the analyzer reads it, writes it
+    to CSV with its original timestamp and hands it to the alert engine and
+    the metrics registry.
+
+    Attributes:
+        speed (float): Replay speed relative to the recording, e.g. 1 or 100;
+            0 replays as fast as possible.
+    """
+
+    def __init__(
+        self,
+        usage_file=None,
+        speed_file=None,
+        logger=None,
+        alert_engine=None,
+        metrics=None,
+        speed=0,
+    ):
+        self.logger = logger if logger is not None else default_logger
+        self.psutil_backend = MockPsutil()
+        self.speedtest_backend = MockSpeedtest()
+        self.usage_analyzer = (
+            NetworkUsageAnalyzer(usage_file, self.logger, self.psutil_backend)
+            if usage_file
+            else None
+        )
+        self.speed_analyzer = (
+            NetworkSpeedAnalyzer(speed_file, self.logger, self.speedtest_backend)
+            if speed_file
+            else None
+        )
+        self.alert_engine = alert_engine
+        self.metrics = metrics
+        self.speed = speed
+
+    def usage_job(self, timestamp, sent_bytes, recv_bytes):
+        self.psutil_backend.set_counters(sent_bytes, recv_bytes)
+        sent_bytes, recv_bytes = self.usage_analyzer.get_network_usage()
+        if sent_bytes is None or recv_bytes is None:
+            return
+        self.usage_analyzer.write_to_csv(sent_bytes, recv_bytes, timestamp)
+        if self.alert_engine:
+            self.alert_engine.observe_usage(
+                sent_bytes, recv_bytes, timestamp.timestamp()
+            )
+        if self.metrics:
+            self.metrics.observe_usage(sent_bytes, recv_bytes, timestamp.timestamp())
+
+    def speed_job(self, timestamp, download_speed, upload_speed):
+        self.speedtest_backend.set_speeds(download_speed, upload_speed)
+        download_speed, upload_speed = self.speed_analyzer.measure_speed()
+        if download_speed is None or upload_speed is None:
+            return
+        self.speed_analyzer.write_to_csv(download_speed, upload_speed, timestamp)
+        if self.alert_engine:
+            self.alert_engine.observe_speed(
+                download_speed, upload_speed, timestamp.timestamp()
+            )
+        if self.metrics:
+            self.metrics.observe_speed(
+                download_speed, upload_speed, timestamp.timestamp()
+            )
+
+    def run(self, usage_samples=(), speed_samples=()):
+        """
+        Replay the samples in timestamp order.
+
+        Args:
+            usage_samples (iterable): (timestamp, sent_bytes, recv_bytes) tuples.
+            speed_samples (iterable): (timestamp, download_speed, upload_speed) tuples.
+
+        Returns:
+            dict: Number of samples, wall time, recorded time span and throughput.
+        """
+        events = heapq.merge(
+            ((sample, "usage") for sample in usage_samples),
+            ((sample, "speed") for sample in speed_samples),
+            key=lambda event: event[0][0],
+        )
+
+        count = 0
+        first_timestamp = None
+        last_timestamp = None
+        started = time.perf_counter()
+        for (timestamp, first, second), kind in events:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            last_timestamp = timestamp
+
+            if self.speed:
+                due = (timestamp - first_timestamp).total_seconds() / self.speed
+                delay = due - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+            if kind == "usage" and self.usage_analyzer:
+                self.usage_job(timestamp, first, second)
+            elif kind == "speed" and self.speed_analyzer:
+                self.speed_job(timestamp, first, second)
+            else:
+                continue
+            count += 1
+
+        elapsed = time.perf_counter() - started
+        span = (
+            (last_timestamp - first_timestamp).total_seconds()
+            if first_timestamp is not None
+            else 0
+        )
+        stats = {
+            "samples": count,
+            "elapsed_seconds": elapsed,
+            "recorded_seconds": span,
+            "samples_per_second": count / elapsed if elapsed > 0 else 0,
+            "speedup": span / elapsed if elapsed > 0 else 0,
+        }
+        self.logger.info(
+            f"Replayed {count} samples covering {span:.0f} s in {elapsed:.2f} s "
+            f"({stats['samples_per_second']:.0f} samples/s, {stats['speedup']:.0f}x)"
+        )
+        return stats
+
+
+def replay_output_files(now=None):
+    """
+    Build result file names for a replay run.
+
+    Returns:
+        tuple: Usage and speed CSV paths under results/.
+    """
+    now = now or datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    return (
+        os.path.join("results", f"{now}_replay_network_usage.csv"),
+        os.path.join("results", f"{now}_replay_speed_measurement.csv"),
+    )
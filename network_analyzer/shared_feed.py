@@ -0,0 +1,185 @@
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+SHARED_FEED = "SHARED FEED"
+
+DEFAULT_FEED_NAME = "network_analyzer_feed"
+
+# One day of 1 Hz samples
+DEFAULT_CAPACITY = 86_400
+
+FEED_MAGIC = b"NAF1"
+FEED_VERSION = 1
+
+# magic, version, capacity, record size, sequence, records written
+HEADER = struct.Struct("<4sIIIQQ")
+HEADER_SIZE = 64
+SEQUENCE_OFFSET = 16
+SEQUENCE = struct.Struct("<QQ")
+
+# timestamp, kind, first value, second value
+RECORD = struct.Struct("<dI4xdd")
+
+USAGE = 1
+SPEED = 2
+KINDS = {USAGE: "usage", SPEED: "speed"}
+
+
+class SharedSampleFeed:
+    """
+    Ring buffer of samples in shared memory, written by one collector process
+    and read by any number of viewer processes.
+
+    The header holds a seqlock: the writer makes the sequence odd, writes a
+    record, bumps the record count and makes the sequence even again. A
+    reader copies what it needs and retries if the sequence was odd or
+    changed meanwhile, so readers never take a lock and can never stall or
+    corrupt the writer.
+
+    Usage records hold cumulative bytes sent and received, speed records hold
+    download and upload speed in bits per second, as produced by
+    NetworkUsageAnalyzer and NetworkSpeedAnalyzer.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.buffer = shm.buf
+        magic, version, capacity, record_size, _, _ = HEADER.unpack_from(self.buffer, 0)
+        if magic != FEED_MAGIC or version != FEED_VERSION:
+            raise ValueError(f"{shm.name} is not a network analyzer feed")
+        if record_size != RECORD.size:
+            raise ValueError(f"Unsupported record size {record_size} in {shm.name}")
+        self.capacity = capacity
+        self.write_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name=DEFAULT_FEED_NAME, capacity=DEFAULT_CAPACITY):
+        """
+        Create a feed to publish samples into.
+
+        An existing feed with the same name (left over from a crashed
+        collector) is replaced.
+
+        Args:
+            name (str): Shared memory name.
+            capacity (int): Number of records kept.
+
+        Returns:
+            SharedSampleFeed: The writer side of the feed.
+        """
+        size = HEADER_SIZE + capacity * RECORD.size
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        HEADER.pack_into(
+            shm.buf, 0, FEED_MAGIC, FEED_VERSION, capacity, RECORD.size, 0, 0
+        )
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_FEED_NAME):
+        """
+        Attach to a feed created by a collector.
+
+        Args:
+            name (str): Shared memory name.
+
+        Returns:
+            SharedSampleFeed: The reader side of the feed.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 every attached process registers the segment
+            # with its resource tracker, which unlinks it when the viewer exits
+            from multiprocessing import resource_tracker
+
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    def publish(self, kind, first, second, timestamp=None):
+        """
+        Append a record.
+
+        Args:
+            kind (int): USAGE or SPEED.
+            first (float): Bytes sent or download speed.
+            second (float): Bytes received or upload speed.
+            timestamp (float): Sample time, defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.write_lock:
+            sequence, count = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)
+            SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, sequence + 1, count)
+            RECORD.pack_into(
+                self.buffer,
+                HEADER_SIZE + (count % self.capacity) * RECORD.size,
+                timestamp,
+                kind,
+                first,
+                second,
+            )
+            SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, sequence + 2, count + 1)
+
+    def publish_usage(self, sent_bytes, recv_bytes, timestamp=None):
+        self.publish(USAGE, sent_bytes, recv_bytes, timestamp)
+
+    def publish_speed(self, download_speed, upload_speed, timestamp=None):
+        self.publish(SPEED, download_speed, upload_speed, timestamp)
+
+    def read_since(self, cursor=0, limit=None):
+        """
+        Read the records written since `cursor`.
+
+        If the reader fell behind by more than the capacity, the overwritten
+        records are skipped and reading resumes at the oldest one available.
+
+        Args:
+            cursor (int): Number of records already consumed, 0 for all.
+            limit (int): Maximum number of records to return.
+
+        Returns:
+            tuple: (list of (timestamp, kind name, first, second), new cursor).
+        """
+        while True:
+            sequence, count = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            start = max(cursor, count - self.capacity)
+            stop = count if limit is None else min(count, start + limit)
+            records = [
+                RECORD.unpack_from(
+                    self.buffer, HEADER_SIZE + (index % self.capacity) * RECORD.size
+                )
+                for index in range(start, stop)
+            ]
+            if SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)[0] == sequence:
+                break
+        return [
+            (timestamp, KINDS.get(kind, str(kind)), first, second)
+            for timestamp, kind, first, second in records
+        ], stop
+
+    def count(self):
+        """
+        Get the number of records written since the feed was created.
+        """
+        return SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)[1]
+
+    def close(self):
+        """
+        Detach from the feed; the collector also removes it.
+        """
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
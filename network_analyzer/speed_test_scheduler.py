@@ -0,0 +1,357 @@
+import csv
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from util.instrumentation import instrumentation
+
+SPEED_TEST_SCHEDULER = "SPEED TEST SCHEDULER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+FIELDNAMES = [
+    "timestamp",
+    "end",
+    "status",
+    "download_speed",
+    "upload_speed",
+    "bytes_sent",
+    "bytes_received",
+]
+
+# Link rate, in bits per second, counted as busy before the first test
+# measured the link's capacity
+DEFAULT_BUSY_RATE = 1_000_000
+
+
+class SpeedTestScheduler:
+    """
+    Decides when NetworkSpeedAnalyzer may run a test.
+
+    A test saturates the link for tens of seconds, so it is deferred while
+    the usage samples show real traffic: over `busy_fraction` of the
+    capacity the last test measured, in either direction. Once a test is
+    `max_deferral` seconds late it is skipped for that slot. Tests stop for
+    the day once their traffic would exceed `daily_budget` bytes, and each
+    is due `interval` plus a random `jitter` seconds after the previous
+    one, so a fleet started together doesn't test all at once.
+
+    Every test, skipped ones included, is logged to `filename` with its
+    start, end and bytes, which subtract_test_traffic() takes out of the
+    usage series.
+    """
+
+    def __init__(
+        self,
+        filename,
+        interval=3600,
+        logger=None,
+        jitter=300,
+        busy_fraction=0.1,
+        daily_budget=0,
+        retry_interval=60,
+        max_deferral=None,
+        seed=None,
+    ):
+        """
+        Args:
+            filename (str): CSV the tests are logged to.
+            interval (float): Seconds between tests.
+            jitter (float): Most seconds a test is randomly delayed by.
+            busy_fraction (float): Share of the capacity counted as busy.
+            daily_budget (int): Bytes tests may use per day, 0 for no limit.
+            retry_interval (float): Seconds between checks while deferred.
+            max_deferral (float): Seconds a test may be deferred by before
+                it is skipped, half the interval by default.
+            seed (int): Seed of the jitter, for reproducible schedules.
+        """
+        self.filename = filename
+        self.interval = interval
+        self.logger = logger if logger is not None else default_logger
+        self.jitter = jitter
+        self.busy_fraction = busy_fraction
+        self.daily_budget = daily_budget
+        self.retry_interval = retry_interval
+        self.max_deferral = interval / 2 if max_deferral is None else max_deferral
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        # (timestamp, sent_bytes, recv_bytes) of the last usage sample
+        self.last_usage = None
+        # Smoothed upload and download rates in bits per second
+        self.rates = None
+        # Upload and download capacity measured by the last test
+        self.capacity = None
+        self.test_start = None
+        self.test_bytes = 0
+        self.budget_day = None
+        self.budget_used = 0
+        self.next_due = None
+        self.deferred_since = None
+
+    def observe_usage(self, timestamp, sent_bytes, recv_bytes):
+        """
+        Update the link rates with a usage sample.
+
+        Args:
+            timestamp (float): Sample time in seconds since the epoch.
+            sent_bytes (int): Total bytes sent.
+            recv_bytes (int): Total bytes received.
+        """
+        with self.lock:
+            last, self.last_usage = self.last_usage, (timestamp, sent_bytes, recv_bytes)
+            if self.test_start is not None:
+                # The test's own traffic isn't real traffic
+                self.last_usage = None
+                return
+            if last is None or timestamp <= last[0]:
+                return
+            if sent_bytes < last[1] or recv_bytes < last[2]:
+                return
+            elapsed = timestamp - last[0]
+            rates = (
+                (sent_bytes - last[1]) * 8 / elapsed,
+                (recv_bytes - last[2]) * 8 / elapsed,
+            )
+            if self.rates is None:
+                self.rates = rates
+            else:
+                self.rates = tuple(
+                    (rate + previous) / 2 for rate, previous in zip(rates, self.rates)
+                )
+
+    def busy(self):
+        """
+        Check whether the link carries real traffic right now.
+        """
+        with self.lock:
+            if self.rates is None:
+                return False
+            if self.capacity is None:
+                return max(self.rates) > DEFAULT_BUSY_RATE
+            return any(
+                rate > self.busy_fraction * capacity
+                for rate, capacity in zip(self.rates, self.capacity)
+            )
+
+    def budget_left(self, now=None):
+        """
+        Get the bytes tests may still use today, None without a budget.
+        """
+        if not self.daily_budget:
+            return None
+        day = datetime.fromtimestamp(time.time() if now is None else now).date()
+        if day != self.budget_day:
+            self.budget_day = day
+            self.budget_used = 0
+        return self.daily_budget - self.budget_used
+
+    def schedule(self, start):
+        self.next_due = start + self.interval + self.random.uniform(0, self.jitter)
+        self.deferred_since = None
+
+    def delay(self, now=None):
+        """
+        Get how long to wait before the next test.
+
+        Args:
+            now (float): Current time in seconds since the epoch.
+
+        Returns:
+            float: Seconds to wait, 0 to run the test now.
+        """
+        now = time.time() if now is None else now
+        if self.next_due is None:
+            self.next_due = now + self.random.uniform(0, self.jitter)
+        if now < self.next_due:
+            return self.next_due - now
+
+        left = self.budget_left(now)
+        if left is not None and left < max(self.test_bytes, 1):
+            self.log_test(now, now, "skipped_budget")
+            self.logger.info(
+                f"Speed test skipped: {self.budget_used / 1_000_000:.1f} MB of the "
+                f"{self.daily_budget / 1_000_000:.1f} MB daily budget used"
+            )
+            tomorrow = datetime.fromtimestamp(now).date() + timedelta(days=1)
+            midnight = datetime.combine(tomorrow, datetime.min.time()).timestamp()
+            self.next_due = midnight + self.random.uniform(0, self.jitter)
+            self.deferred_since = None
+            return self.next_due - now
+
+        if self.busy():
+            if self.deferred_since is None:
+                self.deferred_since = now
+                self.logger.info("Speed test deferred: the link is busy")
+            if now - self.next_due < self.max_deferral:
+                return self.retry_interval
+            self.log_test(now, now, "skipped_busy")
+            self.logger.info(
+                f"Speed test skipped: the link stayed busy for "
+                f"{now - self.deferred_since:.0f} s"
+            )
+            self.schedule(self.next_due)
+            return max(self.next_due - now, self.retry_interval)
+        return 0
+
+    def begin_test(self, now=None):
+        with self.lock:
+            self.test_start = time.time() if now is None else now
+
+    def end_test(
+        self, download_speed, upload_speed, bytes_sent=0, bytes_received=0, now=None
+    ):
+        """
+        Record a finished test and schedule the next one.
+
+        Args:
+            download_speed (float): Measured download speed in bits per
+                second, None if the test failed.
+            upload_speed (float): Measured upload speed, None if it failed.
+            bytes_sent (int): Bytes the test uploaded.
+            bytes_received (int): Bytes the test downloaded.
+            now (float): End time in seconds since the epoch.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            start, self.test_start = self.test_start or now, None
+            # A usage sample from before the test would count its traffic
+            self.last_usage = None
+            if download_speed is not None and upload_speed is not None:
+                self.capacity = (upload_speed, download_speed)
+        if bytes_sent or bytes_received:
+            self.test_bytes = bytes_sent + bytes_received
+            self.budget_left(start)
+            self.budget_used += self.test_bytes
+        failed = download_speed is None or upload_speed is None
+        self.log_test(
+            start,
+            now,
+            "failed" if failed else "ok",
+            download_speed,
+            upload_speed,
+            bytes_sent,
+            bytes_received,
+        )
+        self.schedule(start)
+
+    @instrumentation.timed("speed_tests_write_to_csv")
+    def log_test(
+        self,
+        start,
+        end,
+        status,
+        download_speed=None,
+        upload_speed=None,
+        bytes_sent=0,
+        bytes_received=0,
+    ):
+        """
+        Log a test, or a skipped one, to the tests CSV.
+        """
+        try:
+            with open(self.filename, "a", newline="") as csvfile:
+                position = csvfile.tell()
+                writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                writer.writerow(
+                    {
+                        "timestamp": datetime.fromtimestamp(start).strftime(
+                            "%Y-%m-%d %H:%M:%S"
+                        ),
+                        "end": datetime.fromtimestamp(end).strftime(
+                            "%Y-%m-%d %H:%M:%S"
+                        ),
+                        "status": status,
+                        "download_speed": download_speed,
+                        "upload_speed": upload_speed,
+                        "bytes_sent": bytes_sent,
+                        "bytes_received": bytes_received,
+                    }
+                )
+                instrumentation.add_bytes_written(
+                    "speed_tests_csv", csvfile.tell() - position
+                )
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
+
+
+def load_tests(filename):
+    """
+    Load the tests that ran from a tests CSV written by SpeedTestScheduler.
+
+    Returns:
+        numpy.ndarray: (n, 4) array of start and end times in seconds since
+        the epoch, bytes sent and bytes received, in time order.
+    """
+    import numpy as np
+
+    tests = []
+    with open(filename, "r", newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            if row["status"] not in ("ok", "failed"):
+                continue
+            tests.append(
+                (
+                    datetime.strptime(
+                        row["timestamp"], "%Y-%m-%d %H:%M:%S"
+                    ).timestamp(),
+                    datetime.strptime(row["end"], "%Y-%m-%d %H:%M:%S").timestamp(),
+                    float(row["bytes_sent"] or 0),
+                    float(row["bytes_received"] or 0),
+                )
+            )
+    tests = np.array(tests, dtype=np.float64).reshape(-1, 4)
+    return tests[np.argsort(tests[:, 0], kind="stable")]
+
+
+def subtract_test_traffic(timestamps, sent_bytes, recv_bytes, tests):
+    """
+    Take the speed tests' traffic out of cumulative usage counters.
+
+    The bytes of a test are spread evenly over its run, so a sample taken
+    during a test loses the part sent so far and every later sample loses
+    all of it.
+
+    Args:
+        timestamps (array): Usage sample times in seconds since the epoch.
+        sent_bytes (array): Total bytes sent at each sample.
+        recv_bytes (array): Total bytes received at each sample.
+        tests (numpy.ndarray): Tests as load_tests() returns them.
+
+    Returns:
+        tuple: The sent and received counters without the tests' traffic.
+    """
+    import numpy as np
+
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    sent_bytes = np.asarray(sent_bytes, dtype=np.float64)
+    recv_bytes = np.asarray(recv_bytes, dtype=np.float64)
+    if not len(tests):
+        return sent_bytes, recv_bytes
+    starts, ends = tests[:, 0], tests[:, 1]
+    sizes = tests[:, 2:]
+
+    # Tests over by each sample count in full
+    done = np.searchsorted(ends, timestamps, side="right")
+    totals = np.vstack((np.zeros(2), np.cumsum(sizes, axis=0)))[done]
+
+    # A test still running at a sample counts in part; they never overlap
+    current = np.searchsorted(starts, timestamps, side="right") - 1
+    running = (current >= done) & (current >= 0)
+    current = np.where(running, current, 0)
+    duration = np.maximum(ends[current] - starts[current], 1)
+    fraction = np.where(running, (timestamps - starts[current]) / duration, 0)
+    totals += sizes[current] * np.clip(fraction, 0, 1)[:, None]
+    return sent_bytes - totals[:, 0], recv_bytes - totals[:, 1]
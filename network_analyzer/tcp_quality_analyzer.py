@@ -0,0 +1,193 @@
+import csv
+import os
+import time
+from datetime import datetime
+import logging
+from util.instrumentation import instrumentation
+
+TCP_QUALITY_ANALYZER = "TCP QUALITY ANALYZER"
+
+# Setup a default logging configuration
+default_logger = logging.getLogger("default_logger")
+default_logger.setLevel(logging.INFO)
+if not default_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(message)s"))
+    default_logger.addHandler(handler)
+
+SNMP_FILES = ("net/snmp", "net/netstat")
+
+# Column name, section and counter in /proc/net/snmp or /proc/net/netstat,
+# and its description. These are reported as rates per second.
+TCP_QUALITY_COUNTERS = (
+    ("in_segs", "Tcp", "InSegs", "TCP segments received"),
+    ("out_segs", "Tcp", "OutSegs", "TCP segments sent"),
+    ("retrans_segs", "Tcp", "RetransSegs", "TCP segments retransmitted"),
+    ("syn_retrans", "TcpExt", "TCPSynRetrans", "SYN and SYN-ACK retransmits"),
+    ("timeouts", "TcpExt", "TCPTimeouts", "TCP retransmission timeouts"),
+    ("out_rsts", "Tcp", "OutRsts", "TCP resets sent"),
+    ("estab_resets", "Tcp", "EstabResets", "Established TCP connections reset"),
+    ("attempt_fails", "Tcp", "AttemptFails", "Failed TCP connection attempts"),
+    ("in_errs", "Tcp", "InErrs", "TCP segments received with errors"),
+    ("listen_overflows", "TcpExt", "ListenOverflows", "Accept queue overflows"),
+    ("listen_drops", "TcpExt", "ListenDrops", "SYNs dropped by listening sockets"),
+    ("udp_in_errors", "Udp", "InErrors", "UDP datagrams received with errors"),
+    ("udp_rcvbuf_errors", "Udp", "RcvbufErrors", "UDP receive buffer overflows"),
+)
+
+# Reported as read rather than as a rate
+TCP_QUALITY_GAUGES = (
+    ("curr_estab", "Tcp", "CurrEstab", "Established TCP connections"),
+)
+
+
+class TcpQualityAnalyzer:
+    """
+    TCP health counters (retransmits, resets, listen queue overflows) from
+    /proc/net/snmp and /proc/net/netstat, as rates over each interval.
+
+    Both files are kept open and re-read from offset 0 with a single
+    pread each. They hold pairs of lines, a header naming the counters of
+    a section and a line with their values; the headers are parsed once
+    into the line and field of every wanted counter, so a sample only
+    splits the value lines it needs.
+    """
+
+    def __init__(self, filename, logger=None, proc="/proc"):
+        results_dir = "results"
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+        self.filename = filename
+        self.logger = logger if logger is not None else default_logger
+        self.proc = proc
+        # path -> file descriptor, opened on the first sample
+        self.fds = {}
+        self.read_sizes = {}
+        # path -> [(column, line index, field index)]
+        self.layouts = {}
+        self.last_counters = None
+        self.last_time = None
+
+    def read_file(self, path):
+        fd = self.fds.get(path)
+        if fd is None:
+            fd = self.fds[path] = os.open(f"{self.proc}/{path}", os.O_RDONLY)
+            self.read_sizes[path] = 16_384
+        while True:
+            data = os.pread(fd, self.read_sizes[path], 0)
+            if len(data) < self.read_sizes[path]:
+                return data.split(b"\n")
+            self.read_sizes[path] *= 2
+
+    @staticmethod
+    def parse_layout(lines):
+        """
+        Locate the wanted counters in the lines of a snmp-style file.
+
+        Returns:
+            list: (column, line index, field index) of each counter found.
+        """
+        positions = {}
+        for index in range(0, len(lines) - 1, 2):
+            header = lines[index].split()
+            if not header:
+                continue
+            section = header[0].rstrip(b":").decode()
+            for field, name in enumerate(header[1:], 1):
+                positions[(section, name.decode())] = (index + 1, field)
+        return [
+            (column, *positions[(section, name)])
+            for column, section, name, _ in TCP_QUALITY_COUNTERS + TCP_QUALITY_GAUGES
+            if (section, name) in positions
+        ]
+
+    def read_counters(self):
+        """
+        Returns:
+            dict: Column name to the current value of its counter.
+        """
+        counters = {}
+        for path in SNMP_FILES:
+            lines = self.read_file(path)
+            layout = self.layouts.get(path)
+            if layout is None:
+                layout = self.layouts[path] = self.parse_layout(lines)
+            fields = {}
+            for column, line, field in layout:
+                values = fields.get(line)
+                if values is None:
+                    values = fields[line] = lines[line].split()
+                counters[column] = int(values[field])
+        return counters
+
+    @instrumentation.timed("get_tcp_quality")
+    def get_tcp_quality(self):
+        """
+        Gets the TCP quality rates since the previous call.
+        Returns:
+            dict: "interval" in seconds, "curr_estab", every counter of
+            TCP_QUALITY_COUNTERS found as "<column>_per_sec" and
+            "retrans_ratio", the share of sent segments that were
+            retransmissions. Empty on the first call, which only takes a
+            baseline, and None on error.
+        """
+        try:
+            now = time.monotonic()
+            counters = self.read_counters()
+            last_counters, last_time = self.last_counters, self.last_time
+            self.last_counters, self.last_time = counters, now
+            if last_counters is None or now <= last_time:
+                return {}
+
+            interval = now - last_time
+            quality = {"interval": round(interval, 3)}
+            if "curr_estab" in counters:
+                quality["curr_estab"] = counters["curr_estab"]
+            deltas = {}
+            for column, _, _, _ in TCP_QUALITY_COUNTERS:
+                if column in counters:
+                    # Counters restart from zero if the kernel's wrap around
+                    deltas[column] = max(counters[column] - last_counters[column], 0)
+                    quality[f"{column}_per_sec"] = round(deltas[column] / interval, 3)
+            out_segs = deltas.get("out_segs", 0)
+            quality["retrans_ratio"] = (
+                round(deltas.get("retrans_segs", 0) / out_segs, 6) if out_segs else 0.0
+            )
+            return quality
+        except Exception as e:
+            self.logger.error(f"Error getting TCP quality counters: {e}")
+            return None
+
+    @instrumentation.timed("tcp_quality_write_to_csv")
+    def write_to_csv(self, quality, timestamp=None):
+        """
+        Writes the TCP quality rates to a CSV file, one row per sample.
+        Args:
+            quality (dict): The result of get_tcp_quality.
+            timestamp (datetime): Time of the sample, defaults to now.
+        """
+        try:
+            with open(self.filename, "a", newline="") as csvfile:
+                start = csvfile.tell()
+                fieldnames = ["timestamp"] + list(quality)
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                if csvfile.tell() == 0:
+                    writer.writeheader()
+
+                now = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+                writer.writerow({"timestamp": now, **quality})
+                instrumentation.add_bytes_written(
+                    "tcp_quality_csv", csvfile.tell() - start
+                )
+            self.logger.info(
+                f"Data written to {self.filename}: "
+                f"{quality.get('retrans_segs_per_sec', 0)} retransmits/s"
+            )
+        except Exception as e:
+            self.logger.error(f"Error writing to CSV: {e}")
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
@@ -0,0 +1,375 @@
+import csv
+import heapq
+import json
+from datetime import datetime
+
+from .flow_analyzer import PROTOCOL_NAMES, decode_flow_key
+
+TOP_TALKERS = "TOP TALKERS"
+
+DIMENSIONS = ("src_ip", "dst_ip", "port", "hostname")
+DIMENSION_TITLES = {
+    "src_ip": "Source IPs",
+    "dst_ip": "Destination IPs",
+    "port": "Ports",
+    "hostname": "Hostnames",
+}
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of the heaviest keys of a weighted stream.
+
+    At most `capacity` keys are tracked. A new key takes over the slot of
+    the lightest one and inherits its count as an upper bound on its own
+    overcount (`error`), so any key heavier than total / capacity is
+    guaranteed to be tracked. The lightest key is found through a min-heap
+    whose entries are refreshed lazily, as counts only ever grow.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        # key -> [count, error]
+        self.counts = {}
+        # (count, key), one entry per tracked key, possibly with an old count
+        self.heap = []
+
+    def update(self, key, weight=1):
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = [weight, 0]
+            heapq.heappush(self.heap, (weight, key))
+            return
+        while True:
+            count, victim = self.heap[0]
+            current = self.counts[victim][0]
+            if current == count:
+                break
+            heapq.heapreplace(self.heap, (current, victim))
+        del self.counts[victim]
+        self.counts[key] = [count + weight, count]
+        heapq.heapreplace(self.heap, (count + weight, key))
+
+    def minimum(self):
+        """
+        Get the count a key must exceed to be guaranteed a slot, 0 while not full.
+        """
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counts.values())
+
+    def merge(self, other):
+        """
+        Merge two summaries into a new one.
+
+        A key missing from a full summary may have been evicted from it, so it
+        is counted there with that summary's minimum, which keeps the merged
+        counts upper bounds and the error bounds valid.
+
+        Returns:
+            SpaceSaving: The merged summary with the larger capacity.
+        """
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        floor, other_floor = self.minimum(), other.minimum()
+        combined = []
+        for key in self.counts.keys() | other.counts.keys():
+            count, error = self.counts.get(key, (floor, floor))
+            other_count, other_error = other.counts.get(key, (other_floor, other_floor))
+            combined.append((count + other_count, error + other_error, key))
+        for count, error, key in heapq.nlargest(
+            merged.capacity, combined, key=lambda item: item[0]
+        ):
+            merged.counts[key] = [count, error]
+            merged.heap.append((count, key))
+        heapq.heapify(merged.heap)
+        return merged
+
+    def top(self, count=10):
+        """
+        Returns:
+            list: (key, count, error) of the `count` heaviest keys, heaviest first.
+        """
+        return [
+            (key, total, error)
+            for key, (total, error) in heapq.nlargest(
+                count, self.counts.items(), key=lambda item: item[1][0]
+            )
+        ]
+
+    def to_list(self):
+        return [[key, count, error] for key, (count, error) in self.counts.items()]
+
+    @classmethod
+    def from_list(cls, items, capacity):
+        summary = cls(capacity)
+        for key, count, error in items:
+            summary.counts[key] = [count, error]
+            summary.heap.append((count, key))
+        heapq.heapify(summary.heap)
+        return summary
+
+
+class SlidingTopK:
+    """
+    Heaviest keys over a sliding time window.
+
+    The window is split into `panes` fixed panes aligned to the epoch, each
+    with its own SpaceSaving summary; old panes are dropped as time advances
+    and a query merges the live ones. Memory is bounded by panes x capacity
+    and, since panes line up across hosts, summaries from several hosts can
+    be merged pane by pane. A window of 0 keeps a single all-time pane.
+    """
+
+    def __init__(self, capacity=100, window=300, panes=10):
+        self.capacity = capacity
+        self.window = window
+        self.pane_count = panes if window else 1
+        self.pane_seconds = window / panes if window else 0
+        self.panes = {}
+        # pane -> total weight, including keys the summary doesn't track
+        self.totals = {}
+        self.latest = None
+
+    def pane_of(self, timestamp):
+        return int(timestamp // self.pane_seconds) if self.pane_seconds else 0
+
+    def update(self, key, weight, timestamp):
+        pane = self.pane_of(timestamp)
+        if self.latest is None or pane > self.latest:
+            self.latest = pane
+            self.drop_old_panes()
+        elif pane <= self.latest - self.pane_count:
+            # Older than the window, e.g. a flow exported long after it ended
+            return
+        summary = self.panes.get(pane)
+        if summary is None:
+            summary = self.panes[pane] = SpaceSaving(self.capacity)
+            self.totals[pane] = 0
+        summary.update(key, weight)
+        self.totals[pane] += weight
+
+    def drop_old_panes(self):
+        for old in [
+            index for index in self.panes if index <= self.latest - self.pane_count
+        ]:
+            del self.panes[old]
+            del self.totals[old]
+
+    def total(self):
+        return sum(self.totals.values())
+
+    def merged(self):
+        summary = SpaceSaving(self.capacity)
+        for pane in self.panes.values():
+            summary = summary.merge(pane)
+        return summary
+
+    def top(self, count=10):
+        return self.merged().top(count)
+
+    def merge(self, other):
+        """
+        Merge another window's panes into this one.
+        """
+        for pane, summary in other.panes.items():
+            mine = self.panes.get(pane)
+            self.panes[pane] = summary if mine is None else mine.merge(summary)
+            self.totals[pane] = self.totals.get(pane, 0) + other.totals[pane]
+        if other.latest is not None and (
+            self.latest is None or other.latest > self.latest
+        ):
+            self.latest = other.latest
+        if self.latest is not None:
+            self.drop_old_panes()
+
+
+class TopTalkers:
+    """
+    Top talkers by bytes over a sliding window, per source IP, destination
+    IP, service port and hostname, in fixed memory.
+
+    Fed with the flows exported by FlowAnalyzer (or read back from its CSV
+    files), weighted by their bytes. Flows count at the time of their last
+    packet, so long-lived flows show up when they are exported. The state
+    can be saved to JSON and merged with that of other intervals or hosts.
+    """
+
+    def __init__(self, capacity=100, window=300, panes=10):
+        self.capacity = capacity
+        self.window = window
+        self.panes = panes
+        self.windows = {
+            dimension: SlidingTopK(capacity, window, panes) for dimension in DIMENSIONS
+        }
+
+    def observe(self, timestamp, byte_count, src_ip, dst_ip, port, hostname=None):
+        """
+        Count the bytes of one flow.
+
+        Args:
+            timestamp (float): Time of the flow's last packet.
+            byte_count (int): Bytes of the flow.
+            src_ip (str): Source address.
+            dst_ip (str): Destination address.
+            port (str): Service, e.g. "tcp/443".
+            hostname (str): Hostname of the remote end, if known.
+        """
+        windows = self.windows
+        windows["src_ip"].update(src_ip, byte_count, timestamp)
+        windows["dst_ip"].update(dst_ip, byte_count, timestamp)
+        windows["port"].update(port, byte_count, timestamp)
+        if hostname:
+            windows["hostname"].update(hostname, byte_count, timestamp)
+
+    def observe_flows(self, flows, hostnames=None):
+        """
+        Count flow records as exported by FlowTable.
+
+        Args:
+            flows (list): Flow records.
+            hostnames (HostnameCache): Names for the flows' addresses, if any.
+        """
+        for key, _, last, _, byte_count, _ in flows:
+            proto, src_ip, src_port, dst_ip, dst_port = decode_flow_key(key)
+            self.observe(
+                last,
+                byte_count,
+                src_ip,
+                dst_ip,
+                service_port(proto, src_port, dst_port),
+                (
+                    hostnames.lookup(src_ip, dst_ip, last)
+                    if hostnames is not None
+                    else None
+                ),
+            )
+
+    def observe_flow_file(self, path):
+        """
+        Count the flows of a *_flows.csv file written by FlowAnalyzer.
+        """
+        with open(path, "r", newline="") as csvfile:
+            for row in csv.DictReader(csvfile):
+                self.observe(
+                    datetime.strptime(row["end"], "%Y-%m-%d %H:%M:%S").timestamp(),
+                    int(row["bytes"]),
+                    row["src_ip"],
+                    row["dst_ip"],
+                    service_port(
+                        row["protocol"], int(row["src_port"]), int(row["dst_port"])
+                    ),
+                    row.get("hostname"),
+                )
+
+    def top(self, dimension, count=10):
+        """
+        Returns:
+            list: (value, bytes, error) of the `count` heaviest values of
+            `dimension`, heaviest first. `error` bounds how much `bytes` may
+            be overcounted.
+        """
+        return self.windows[dimension].top(count)
+
+    def table(self, count=10):
+        """
+        Returns:
+            dict: Dimension to its top list, for the dimensions with data.
+        """
+        tables = {}
+        for dimension in DIMENSIONS:
+            rows = self.top(dimension, count)
+            if rows:
+                tables[dimension] = rows
+        return tables
+
+    def format_table(self, count=10):
+        """
+        Render the top lists as plain text for the CLI.
+        """
+        scope = f"last {self.window} s" if self.window else "all time"
+        lines = []
+        for dimension, rows in self.table(count).items():
+            total = self.windows[dimension].total() or 1
+            lines.append(f"{DIMENSION_TITLES[dimension]} ({scope})")
+            lines.append(
+                f"{'#':>3}  {'value':<40} {'bytes':>15} {'share':>7} {'±':>12}"
+            )
+            for rank, (value, byte_count, error) in enumerate(rows, 1):
+                lines.append(
+                    f"{rank:>3}  {str(value):<40} {byte_count:>15,} "
+                    f"{byte_count / total:>7.1%} {error:>12,}"
+                )
+            lines.append("")
+        return "\n".join(lines)
+
+    def merge(self, other):
+        """
+        Add the counts of another TopTalkers with the same window, e.g. of another host.
+        """
+        if (other.window, other.panes) != (self.window, self.panes):
+            raise ValueError(
+                f"Cannot merge a {other.window} s window into a {self.window} s window"
+            )
+        for dimension in DIMENSIONS:
+            self.windows[dimension].merge(other.windows[dimension])
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "window": self.window,
+            "panes": self.panes,
+            "dimensions": {
+                dimension: {
+                    str(pane): {
+                        "total": window.totals[pane],
+                        "items": summary.to_list(),
+                    }
+                    for pane, summary in window.panes.items()
+                }
+                for dimension, window in self.windows.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        talkers = cls(data["capacity"], data["window"], data["panes"])
+        for dimension, panes in data["dimensions"].items():
+            window = talkers.windows[dimension]
+            for pane, summary in panes.items():
+                window.panes[int(pane)] = SpaceSaving.from_list(
+                    summary["items"], talkers.capacity
+                )
+                window.totals[int(pane)] = summary["total"]
+            if window.panes:
+                window.latest = max(window.panes)
+        return talkers
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load top talkers saved with save(), or build them from a *_flows.csv file.
+        """
+        if path.endswith(".csv"):
+            talkers = cls(window=0)
+            talkers.observe_flow_file(path)
+            return talkers
+        with open(path, "r", encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+
+def service_port(proto, src_port, dst_port):
+    """
+    Name the service of a flow by its lower port, e.g. "tcp/443", so both
+    directions of a connection count toward the same service.
+    """
+    name = PROTOCOL_NAMES.get(proto, proto) if isinstance(proto, int) else proto
+    if not src_port and not dst_port:
+        return str(name)
+    return f"{name}/{min(src_port or dst_port, dst_port or src_port)}"
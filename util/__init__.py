@@ -1,2 +1,39 @@
-from .graph_plotter import GraphPlotter
+import importlib
+
 from .i18n import I18N
+from .instrumentation import Instrumentation, instrumentation
+from .logger import setup_logger, shutdown_loggers
+
+# GraphPlotter pulls in pandas, matplotlib and numpy, so it is only imported
+# when something actually plots. The Parquet export needs the optional pyarrow.
+_LAZY_ATTRIBUTES = {
+    "GraphPlotter": ".graph_plotter",
+    "ParquetExporter": ".parquet_export",
+    "read_results": ".parquet_export",
+    "detect_gaps": ".regularize",
+    "regularize_frame": ".regularize",
+    "ResultsCatalog": ".results_catalog",
+    "summarize": ".results_loader",
+    "rollup": ".results_loader",
+    "downsample": ".results_loader",
+}
+
+__all__ = [
+    "I18N",
+    "Instrumentation",
+    "instrumentation",
+    "setup_logger",
+    "shutdown_loggers",
+] + list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
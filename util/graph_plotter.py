@@ -3,13 +3,95 @@ import matplotlib.pyplot as plt
 import numpy as np
 import logging
 import os
+from .instrumentation import instrumentation
+from .regularize import regularize_frame
+from .results_loader import DEFAULT_POINTS, downsample, read_header
+
+
+def read_results_file(file, metric, columns, max_points=None):
+    """
+    Read a results CSV, or the `metric` results of a Parquet file or dataset
+    directory written by ParquetExporter, e.g. "network_usage".
+
+    With `max_points` a CSV is read block by block and downsampled to about
+    that many rows, so a file of any size plots in bounded memory.
+    """
+    if file.endswith(".parquet") or os.path.isdir(file):
+        # pyarrow is optional and only needed for Parquet
+        from .parquet_export import read_results, TIMESTAMP_FORMAT
+
+        data = read_results(file, metric=metric, columns=columns)
+        # Plotted like the CSV timestamps, so both sources look the same
+        data["timestamp"] = data["timestamp"].dt.strftime(TIMESTAMP_FORMAT)
+        return data
+    if max_points:
+        return downsample(file, columns[1:], max_points)
+    return pd.read_csv(file, usecols=columns)
+
+
+# Plotted TCP quality columns and their labels. Counters the kernel lacks,
+# e.g. ListenOverflows, aren't written and aren't plotted.
+TCP_QUALITY_LINES = {
+    "retrans_segs_per_sec": "Retransmitted Segments (/s)",
+    "out_rsts_per_sec": "Resets Sent (/s)",
+    "listen_overflows_per_sec": "Listen Queue Overflows (/s)",
+}
+
+
+def shade_outages(ax, data, labels, outages):
+    """
+    Shade the outages of a regularized series on a plot of it against `labels`.
+    """
+    # Positions of the labels on a categorical axis, in order of appearance
+    positions = pd.factorize(labels)[0]
+    for index, (start, end) in enumerate(outages):
+        first = positions[data["timestamp"].searchsorted(start)]
+        last = positions[data["timestamp"].searchsorted(end)]
+        ax.axvspan(first, last, color="grey", alpha=0.2)
+        # The axis isn't to scale, so a long outage may only be a few points wide
+        ax.axvline(
+            (first + last) / 2,
+            color="grey",
+            linestyle="--",
+            label="No data" if index == 0 else None,
+        )
 
 
 class GraphPlotter:
-    def __init__(self, network_usage_file, network_speed_file):
+    def __init__(
+        self,
+        network_usage_file,
+        network_speed_file,
+        tcp_quality_file=None,
+        fill="interpolate",
+        max_points=DEFAULT_POINTS,
+    ):
+        """
+        Args:
+            fill (str): How missed samples are filled in: "nan", "hold" or
+                "interpolate"; None plots the samples as they are. Outages
+                are never filled, and are shaded.
+            max_points (int): Points a results CSV is downsampled to, by
+                averaging, before plotting; None plots every sample.
+        """
         self.network_usage_file = network_usage_file
         self.network_speed_file = network_speed_file
+        self.tcp_quality_file = tcp_quality_file
+        self.fill = fill
+        self.max_points = max_points
+
+    def regularize(self, data, columns):
+        """
+        Put the samples on a fixed grid, so gaps show as breaks rather than lines.
+
+        Returns:
+            tuple: The data and its outages.
+        """
+        if self.fill is None or len(data) < 2:
+            return data, []
+        return regularize_frame(data, columns, fill=self.fill)
 
+    @instrumentation.timed("plot_speed_graph")
     def plot_speed_graph(self, file, ax, xticks):
         """
         Plot speed graph from the given file.
@@ -19,7 +101,15 @@ class GraphPlotter:
             ax (matplotlib.axes.Axes): The axes to plot the graph on.
             xticks (int): Interval for X-ticks in graphs.
         """
-        data = pd.read_csv(file)
+        data, outages = self.regularize(
+            read_results_file(
+                file,
+                "speed_measurement",
+                ["timestamp", "download_speed", "upload_speed"],
+                self.max_points,
+            ),
+            ["download_speed", "upload_speed"],
+        )
         ax.plot(
             data["timestamp"],
             data["download_speed"] / 1_000_000,
@@ -33,11 +123,13 @@ class GraphPlotter:
         ax.set_xlabel("Time (HH:MM)")
         ax.set_ylabel("Speed (Mbps)")
         ax.set_title("Network Speed Over Time")
+        shade_outages(ax, data, data["timestamp"], outages)
         ax.legend()
         ax.grid(True)
         ax.set_xticks(ax.get_xticks()[::xticks])
         plt.xticks(rotation=45)
 
+    @instrumentation.timed("plot_usage_graph")
     def plot_usage_graph(self, file, ax, xticks):
         """
         Plot usage graph from the given file.
@@ -47,7 +139,15 @@ class GraphPlotter:
             ax (matplotlib.axes.Axes): The axes to plot the graph on.
             xticks (int): Interval for X-ticks in graphs.
         """
-        data = pd.read_csv(file)
+        data, outages = self.regularize(
+            read_results_file(
+                file,
+                "network_usage",
+                ["timestamp", "sent_bytes", "recv_bytes"],
+                self.max_points,
+            ),
+            ["sent_bytes", "recv_bytes"],
+        )
         ax.plot(
             data["timestamp"],
             data["sent_bytes"] / (1024 * 1024),
@@ -61,11 +161,49 @@ class GraphPlotter:
         ax.set_xlabel("Time (HH:MM)")
         ax.set_ylabel("Data (MB)")
         ax.set_title("Network Data Usage Over Time")
+        shade_outages(ax, data, data["timestamp"], outages)
+        ax.legend()
+        ax.grid(True)
+        ax.set_xticks(ax.get_xticks()[::xticks])
+        plt.xticks(rotation=45)
+
+    @instrumentation.timed("plot_tcp_quality_graph")
+    def plot_tcp_quality_graph(self, file, ax, xticks):
+        """
+        Plot TCP retransmits and resets from the given file.
+
+        Args:
+            file (str): The file path to plot data from.
+            ax (matplotlib.axes.Axes): The axes to plot the graph on.
+            xticks (int): Interval for X-ticks in graphs.
+        """
+        if file.endswith(".parquet") or os.path.isdir(file):
+            data = read_results_file(file, "tcp_quality", None)
+            columns = [
+                column
+                for column in TCP_QUALITY_LINES
+                if column in data and data[column].notna().any()
+            ]
+            data = data[["timestamp"] + columns]
+        else:
+            header = read_header(file)
+            columns = [column for column in TCP_QUALITY_LINES if column in header]
+            data = read_results_file(
+                file, "tcp_quality", ["timestamp"] + columns, self.max_points
+            )
+        data, outages = self.regularize(data, columns)
+        for column in columns:
+            ax.plot(data["timestamp"], data[column], label=TCP_QUALITY_LINES[column])
+        ax.set_xlabel("Time (HH:MM)")
+        ax.set_ylabel("Events per second")
+        ax.set_title("TCP Quality Over Time")
+        shade_outages(ax, data, data["timestamp"], outages)
         ax.legend()
         ax.grid(True)
         ax.set_xticks(ax.get_xticks()[::xticks])
         plt.xticks(rotation=45)
 
+    @instrumentation.timed("plot_graphs")
     def plot_graphs(self, xticks: int, save_path: str = "network_graphs.png"):
         """
         Plots the network usage and speed graphs from the given CSV files and saves them as a PNG file.
@@ -82,9 +220,34 @@ class GraphPlotter:
                 logging.error("One or both CSV files do not exist.")
                 return
 
-            # Load data from CSV files
-            df_usage = pd.read_csv(self.network_usage_file)
-            df_speed = pd.read_csv(self.network_speed_file)
+            # Load data from CSV files or Parquet datasets
+            df_usage = read_results_file(
+                self.network_usage_file,
+                "network_usage",
+                ["timestamp", "sent_bytes", "recv_bytes"],
+                self.max_points,
+            )
+            df_speed = read_results_file(
+                self.network_speed_file,
+                "speed_measurement",
+                ["timestamp", "download_speed", "upload_speed"],
+                self.max_points,
+            )
+
+            # Averages of the measurements only, before any gaps are filled;
+            # those of all of them if the file was downsampled
+            speed_means = df_speed.attrs.get("means") or df_speed.mean(
+                numeric_only=True
+            )
+            avg_download_speed = speed_means["download_speed"] / 1_000_000
+            avg_upload_speed = speed_means["upload_speed"] / 1_000_000
+
+            df_usage, usage_outages = self.regularize(
+                df_usage, ["sent_bytes", "recv_bytes"]
+            )
+            df_speed, speed_outages = self.regularize(
+                df_speed, ["download_speed", "upload_speed"]
+            )
 
             # Convert timestamp to HH:MM format
             df_usage["time"] = pd.to_datetime(df_usage["timestamp"]).dt.strftime(
@@ -102,14 +265,28 @@ class GraphPlotter:
             df_speed["download_Mbps"] = df_speed["download_speed"] / 1_000_000
             df_speed["upload_Mbps"] = df_speed["upload_speed"] / 1_000_000
 
-            # Calculate average speeds
-            avg_download_speed = df_speed["download_Mbps"].mean()
-            avg_upload_speed = df_speed["upload_Mbps"].mean()
+            # TCP quality goes below the speed plot, on the same time axis
+            # as usage, so throughput drops line up with retransmit spikes
+            df_tcp = None
+            if self.tcp_quality_file and os.path.exists(self.tcp_quality_file):
+                df_tcp, tcp_outages = self.regularize(
+                    read_results_file(
+                        self.tcp_quality_file,
+                        "tcp_quality",
+                        ["timestamp", "retrans_segs_per_sec", "out_rsts_per_sec"],
+                        self.max_points,
+                    ),
+                    ["retrans_segs_per_sec", "out_rsts_per_sec"],
+                )
+                df_tcp["time"] = pd.to_datetime(df_tcp["timestamp"]).dt.strftime(
+                    "%H:%M"
+                )
+            rows = 2 if df_tcp is None else 3
 
-            plt.figure(figsize=(14, 7))
+            plt.figure(figsize=(14, 7 if rows == 2 else 10))
 
             # Data usage plot
-            plt.subplot(2, 1, 1)
+            plt.subplot(rows, 1, 1)
             plt.plot(
                 df_usage["time"], df_usage["sent_MB"], "r-", label="Sent Data (MB)"
             )
@@ -119,12 +296,13 @@ class GraphPlotter:
             plt.xlabel("Time (HH:MM)")
             plt.ylabel("Data (MB)")
             plt.title("Data Usage Over Time")
+            shade_outages(plt.gca(), df_usage, df_usage["time"], usage_outages)
             plt.xticks(np.arange(0, len(df_usage["time"]), step=xticks), rotation=45)
             plt.legend()
             plt.grid(True)
 
             # Speed plot
-            plt.subplot(2, 1, 2)
+            plt.subplot(rows, 1, 2)
             plt.plot(
                 df_speed["time"],
                 df_speed["download_Mbps"],
@@ -140,10 +318,35 @@ class GraphPlotter:
             plt.xlabel("Time (HH:MM)")
             plt.ylabel("Speed (Mbps)")
             plt.title("Speed Over Time")
+            shade_outages(plt.gca(), df_speed, df_speed["time"], speed_outages)
             plt.xticks(np.arange(0, len(df_speed["time"]), step=xticks), rotation=45)
             plt.legend()
             plt.grid(True)
 
+            # TCP quality plot
+            if df_tcp is not None:
+                plt.subplot(rows, 1, 3)
+                plt.plot(
+                    df_tcp["time"],
+                    df_tcp["retrans_segs_per_sec"],
+                    "r-",
+                    label="Retransmitted Segments (/s), "
+                    f"Max: {df_tcp['retrans_segs_per_sec'].max():.2f}",
+                )
+                plt.plot(
+                    df_tcp["time"],
+                    df_tcp["out_rsts_per_sec"],
+                    "b-",
+                    label="Resets Sent (/s)",
+                )
+                plt.xlabel("Time (HH:MM)")
+                plt.ylabel("Events per second")
+                plt.title("TCP Quality Over Time")
+                shade_outages(plt.gca(), df_tcp, df_tcp["time"], tcp_outages)
+                plt.xticks(np.arange(0, len(df_tcp["time"]), step=xticks), rotation=45)
+                plt.legend()
+                plt.grid(True)
+
             plt.tight_layout()
             plt.savefig(save_path)
             logging.info(f"Plots saved to the file: {save_path}")
@@ -0,0 +1,375 @@
+import contextlib
+import functools
+import json
+import logging
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    float("inf"),
+)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram with count, sum, min and max.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q):
+        """
+        Estimate a percentile from the buckets.
+
+        Args:
+            q (float): Percentile in the range 0-100.
+
+        Returns:
+            float: Upper bound of the bucket holding the percentile, capped
+            at the largest observed value.
+        """
+        if not self.count:
+            return None
+        rank = self.count * q / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "avg": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {
+                str(bound): count for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+
+def get_rss_bytes():
+    """
+    Get the resident set size of the current process.
+
+    Returns:
+        int: RSS in bytes, or None if it cannot be determined.
+    """
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+class Instrumentation:
+    """
+    Self-instrumentation of the analyzer: per-stage latency histograms,
+    tick jitter, bytes written and RSS.
+
+    Disabled by default. While disabled, `timed` wrappers only check the
+    `enabled` flag before calling through, so the overhead is one attribute
+    read per call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stats_file = None
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.ticks = {}
+        self.bytes_written = {}
+        self.started_at = None
+        self.profiler = None
+        # Profiles of the jobs run in a per-thread window, see `profiled`
+        self.thread_profiles = None
+        self.profile_deadline = None
+        self.profile_dir = "logs"
+
+    def enable(self, stats_file=None):
+        """
+        Start collecting statistics.
+
+        Args:
+            stats_file (str): Path of the JSON file written by `write_stats`.
+        """
+        self.enabled = True
+        self.stats_file = stats_file
+        self.started_at = time.time()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.ticks = {}
+            self.bytes_written = {}
+
+    def timed(self, stage):
+        """
+        Decorator recording the latency of every call under `stage`.
+
+        Args:
+            stage (str): Stage name, e.g. "get_network_usage".
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, stage, seconds):
+        """
+        Record one latency observation.
+
+        Args:
+            stage (str): Stage name.
+            seconds (float): Duration of the call.
+        """
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def record_tick(self, collector, interval):
+        """
+        Record a scheduler tick and the drift from the expected interval.
+
+        Args:
+            collector (str): Collector name, e.g. "usage".
+            interval (float): Expected seconds between ticks.
+        """
+        now = time.monotonic()
+        # cProfile can only be disabled from the thread it profiles, so the
+        # profiling window is closed here rather than from a timer thread
+        if self.profile_deadline is not None and now >= self.profile_deadline:
+            self.stop_profiling()
+        if not self.enabled:
+            return
+        with self.lock:
+            tick = self.ticks.setdefault(
+                collector, {"last": None, "jitter": LatencyHistogram()}
+            )
+            if tick["last"] is not None:
+                tick["jitter"].observe(abs(now - tick["last"] - interval))
+            tick["last"] = now
+
+    def add_bytes_written(self, target, count):
+        """
+        Account bytes written to a results file.
+
+        Args:
+            target (str): Name of the output, e.g. "usage_csv".
+            count (int): Number of bytes written.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.bytes_written[target] = self.bytes_written.get(target, 0) + count
+
+    def snapshot(self):
+        """
+        Get the current statistics.
+
+        Returns:
+            dict: Stage histograms, tick jitter, bytes written and RSS.
+        """
+        with self.lock:
+            return {
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "uptime_seconds": (
+                    time.time() - self.started_at if self.started_at else 0
+                ),
+                "rss_bytes": get_rss_bytes(),
+                "stages": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.stages.items()
+                },
+                "tick_jitter": {
+                    name: tick["jitter"].to_dict() for name, tick in self.ticks.items()
+                },
+                "bytes_written": dict(self.bytes_written),
+            }
+
+    def write_stats(self, path=None):
+        """
+        Write the current statistics to a JSON file.
+
+        Args:
+            path (str): Output path, defaults to the file given to `enable`.
+        """
+        path = path or self.stats_file
+        if not self.enabled or not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(self.snapshot(), file, indent=4)
+        except Exception as e:
+            logging.error(f"Error writing instrumentation stats: {e}")
+
+    def start_profiling(self, seconds=60, output_dir=None, threads=False):
+        """
+        Run cProfile and tracemalloc for a time window.
+
+        cProfile only sees the thread that enables it. By default that is
+        the calling thread, and the window is closed by the first
+        `record_tick` after it expires, or by `stop_profiling`, from that
+        thread. With `threads`, e.g. when the work runs in collector threads
+        and the signal lands on the idle main thread, only the jobs run
+        under `profiled` are profiled, each on its own thread, and the
+        window may be closed from any thread. When the window closes, the
+        profile is saved as
+        `<output_dir>/<timestamp>_profile.prof` and the top allocations as
+        `<output_dir>/<timestamp>_tracemalloc.txt`.
+
+        Args:
+            seconds (float): Length of the profiling window.
+            output_dir (str): Directory for the output files, defaults to logs/.
+            threads (bool): Profile the jobs run under `profiled` only.
+        """
+        if self.profile_deadline is not None:
+            return
+        import cProfile
+
+        self.profile_dir = output_dir or self.profile_dir
+        tracemalloc.start()
+        if threads:
+            self.thread_profiles = []
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.profile_deadline = time.monotonic() + seconds
+        logging.info(f"Profiling started for {seconds} seconds")
+
+    @contextlib.contextmanager
+    def profiled(self):
+        """
+        Profile the enclosed code, on the current thread, if a per-thread
+        profiling window is open.
+        """
+        profiles = self.thread_profiles
+        if profiles is None:
+            yield
+            return
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self.lock:
+                profiles.append(profiler)
+
+    def stop_profiling(self):
+        """
+        Close the profiling window and write its results.
+        """
+        if self.profile_deadline is None:
+            return
+        profiler, self.profiler = self.profiler, None
+        with self.lock:
+            profiles, self.thread_profiles = self.thread_profiles, None
+        self.profile_deadline = None
+        if profiler is not None:
+            profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        profile_file = os.path.join(self.profile_dir, f"{now}_profile.prof")
+        tracemalloc_file = os.path.join(self.profile_dir, f"{now}_tracemalloc.txt")
+        try:
+            if profiler is not None:
+                profiler.dump_stats(profile_file)
+            elif profiles:
+                import pstats
+
+                pstats.Stats(*profiles).dump_stats(profile_file)
+            else:
+                logging.info("No profiled jobs ran in the profiling window")
+            with open(tracemalloc_file, "w", encoding="utf-8") as file:
+                for stat in snapshot.statistics("lineno")[:50]:
+                    file.write(f"{stat}\n")
+            logging.info(f"Profiling results saved to {profile_file}")
+        except Exception as e:
+            logging.error(f"Error writing profiling results: {e}")
+
+    def install_signal_handler(self, seconds=60, threads=False):
+        """
+        Start a profiling window whenever the process receives SIGUSR1.
+
+        Args:
+            seconds (float): Length of each profiling window.
+            threads (bool): Profile the jobs run under `profiled`, see
+                `start_profiling`.
+        """
+        if not hasattr(signal, "SIGUSR1"):
+            return
+        signal.signal(
+            signal.SIGUSR1,
+            lambda signum, frame: self.start_profiling(seconds, threads=threads),
+        )
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,98 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+
+LOG_FORMAT = "%(asctime)s:%(levelname)s:%(message)s"
+
+# Rotate log files at 10 MB and keep 5 old files per log
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+_listeners = {}
+_lock = threading.Lock()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats every record in the calling thread so it
+    can be pickled; the queue here never leaves the process, so the record
+    is passed through as-is and the sampling thread only pays for the
+    enqueue.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logger(name, log_file, level=logging.INFO, console=True, formatter=None):
+    """
+    Setup a logger that writes to a rotating file and optionally the console.
+
+    Records go through a queue to a background QueueListener, so formatting
+    and file I/O never run on the caller's thread. Calling this again for the
+    same logger replaces its previous handlers instead of adding more, so
+    restarting an analysis doesn't duplicate log lines.
+
+    Args:
+        name (str): The name of the logger.
+        log_file (str): The file where logs will be saved.
+        level (int): Logging level.
+        console (bool): Whether to also log to stderr.
+        formatter (logging.Formatter): Formatter for both outputs.
+
+    Returns:
+        Logger: The configured logger.
+    """
+    formatter = formatter or logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(formatter)
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    with _lock:
+        previous = _listeners.pop(name, None)
+        if previous is not None:
+            previous_handler, previous_listener = previous
+            logger.removeHandler(previous_handler)
+            previous_listener.stop()
+            for handler in previous_listener.handlers:
+                handler.close()
+        logger.addHandler(queue_handler)
+        listener.start()
+        _listeners[name] = (queue_handler, listener)
+
+    return logger
+
+
+def shutdown_loggers():
+    """
+    Flush and stop every listener started by setup_logger.
+    """
+    with _lock:
+        for name, (queue_handler, listener) in _listeners.items():
+            logging.getLogger(name).removeHandler(queue_handler)
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        _listeners.clear()
+
+
+atexit.register(shutdown_loggers)
@@ -0,0 +1,262 @@
+import glob
+import json
+import logging
+import operator
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .results_catalog import metric_of
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+MANIFEST_FILE = "_manifest.json"
+
+# Columns whose type can't be left to inference, e.g. because a file with
+# only whole numbers would make a float column an integer one
+COLUMN_TYPES = {
+    "timestamp": pa.timestamp("s"),
+    "start": pa.timestamp("s"),
+    "end": pa.timestamp("s"),
+    "sent_bytes": pa.int64(),
+    "recv_bytes": pa.int64(),
+    "download_speed": pa.float64(),
+    "upload_speed": pa.float64(),
+    "latency_ms": pa.float64(),
+    "interval": pa.float64(),
+    "pid": pa.int64(),
+    "connections": pa.int64(),
+    "namespace": pa.int64(),
+    "src_port": pa.int64(),
+    "dst_port": pa.int64(),
+    "packets": pa.int64(),
+    "bytes": pa.int64(),
+    "tcp_flags": pa.int64(),
+    "interface": pa.string(),
+    "process": pa.string(),
+    "name": pa.string(),
+    "target": pa.string(),
+    "protocol": pa.string(),
+    "src_ip": pa.string(),
+    "dst_ip": pa.string(),
+    "hostname": pa.string(),
+}
+FLOAT_SUFFIXES = ("_per_sec", "_ratio")
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("host", pa.string()), ("metric", pa.string()), ("day", pa.string())]),
+    flavor="hive",
+)
+
+
+def time_column_of(names):
+    """
+    Get the column rows are timed by: "timestamp", or "start" for flows.
+    """
+    return "timestamp" if "timestamp" in names else "start"
+
+
+def convert_file(path, output_dir, host):
+    """
+    Convert one results CSV into Parquet files, one per day it covers.
+
+    Runs in a worker process, so it only takes and returns plain values.
+
+    Args:
+        path (str): The CSV file.
+        output_dir (str): Root of the partitioned dataset.
+        host (str): Host the results were collected on.
+
+    Returns:
+        list: Paths of the Parquet files written.
+    """
+    with open(path, "r", newline="") as csvfile:
+        names = csvfile.readline().strip().split(",")
+    column_types = {
+        name: COLUMN_TYPES.get(name, pa.float64())
+        for name in names
+        if name in COLUMN_TYPES or name.endswith(FLOAT_SUFFIXES)
+    }
+    table = pacsv.read_csv(
+        path,
+        convert_options=pacsv.ConvertOptions(
+            column_types=column_types, timestamp_parsers=[TIMESTAMP_FORMAT]
+        ),
+    )
+    if not table.num_rows:
+        return []
+
+    time_column = time_column_of(names)
+    table = table.sort_by(time_column)
+    days = pc.strftime(table[time_column], format="%Y-%m-%d")
+    metric = metric_of(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    outputs = []
+    for day in pc.unique(days).to_pylist():
+        directory = os.path.join(
+            output_dir, f"host={host}", f"metric={metric}", f"day={day}"
+        )
+        os.makedirs(directory, exist_ok=True)
+        # Named after the source, so converting a file again replaces its output
+        output = os.path.join(directory, f"{stem}.parquet")
+        pq.write_table(table.filter(pc.equal(days, day)), output, compression="zstd")
+        outputs.append(output)
+    return outputs
+
+
+class ParquetExporter:
+    """
+    Converts the results CSVs into a Parquet dataset partitioned as
+    host=<host>/metric=<metric>/day=<YYYY-MM-DD>, with timestamps stored as
+    int64 Parquet timestamps and counters as int64 rather than text.
+
+    Files are converted in parallel in a process pool. A manifest in the
+    dataset root records the size and modification time of every converted
+    CSV, so running the export again only converts new or grown files.
+    """
+
+    def __init__(self, output_dir, logger=None, host=None, jobs=None):
+        self.output_dir = output_dir
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.host = host or socket.gethostname()
+        self.jobs = jobs
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def save_manifest(self, manifest):
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def export(self, files, force=False):
+        """
+        Convert results CSVs that changed since the last export.
+
+        Args:
+            files (list of str): CSV files, e.g. every results/*.csv.
+            force (bool): Convert every file even if it didn't change.
+
+        Returns:
+            tuple: Number of files converted, skipped and failed.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        pending = {}
+        for path in files:
+            stat = os.stat(path)
+            key = os.path.abspath(path)
+            state = [stat.st_size, stat.st_mtime_ns]
+            entry = manifest.get(key)
+            if force or entry is None or entry["state"] != state:
+                pending[path] = (key, state)
+
+        converted = failed = 0
+        with ProcessPoolExecutor(self.jobs) as executor:
+            futures = {
+                executor.submit(convert_file, path, self.output_dir, self.host): path
+                for path in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                key, state = pending[path]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    self.logger.error(f"Error converting {path}: {e}")
+                    failed += 1
+                    continue
+                manifest[key] = {"state": state, "outputs": outputs}
+                converted += 1
+        self.save_manifest(manifest)
+        self.logger.info(
+            f"Exported {converted} files to {self.output_dir}, "
+            f"{len(files) - len(pending)} unchanged, {failed} failed"
+        )
+        return converted, len(files) - len(pending), failed
+
+
+def read_results(dataset, metric=None, host=None, columns=None, start=None, end=None):
+    """
+    Read results from a Parquet dataset written by ParquetExporter.
+
+    Only the requested columns are read, and the time range is pushed down
+    to the scan: whole days outside it are skipped by their partition and
+    row groups by their statistics.
+
+    Args:
+        dataset (str): Dataset root, a partition directory or a .parquet file.
+        metric (str): Metric to read, e.g. "network_usage". Required when
+            `dataset` holds several metrics, whose columns differ.
+        host (str): Only read the results of this host.
+        columns (list of str): Columns to read, all if None.
+        start (datetime): Earliest time to read, inclusive.
+        end (datetime): Latest time to read, inclusive.
+
+    Returns:
+        pandas.DataFrame: The matching rows in time order.
+    """
+    if os.path.isfile(dataset):
+        paths = [dataset]
+    else:
+        paths = sorted(
+            path
+            for path in glob.glob(
+                os.path.join(dataset, "**", "*.parquet"), recursive=True
+            )
+            if (not host or f"host={host}" in path.split(os.sep))
+            and (not metric or f"metric={metric}" in path.split(os.sep))
+        )
+    if not paths:
+        raise FileNotFoundError(f"No results for {metric or 'any metric'} in {dataset}")
+
+    # Files of one metric may still differ, e.g. by counters a kernel lacks
+    schema = pa.unify_schemas([pq.read_schema(path) for path in paths])
+    time_column = time_column_of(schema.names)
+    base_dir = dataset if os.path.isdir(dataset) else os.path.dirname(dataset)
+    data = ds.dataset(
+        paths,
+        schema=pa.unify_schemas([schema, PARTITIONING.schema]),
+        format="parquet",
+        partitioning=PARTITIONING,
+        partition_base_dir=base_dir,
+    )
+
+    expression = None
+    for bound, compare in ((start, operator.ge), (end, operator.le)):
+        if bound is None:
+            continue
+        condition = compare(ds.field(time_column), pa.scalar(bound, pa.timestamp("s")))
+        # Checking the day partition too skips whole directories without
+        # opening their files; files without a day key are kept
+        day = ds.field("day")
+        condition &= day.is_null() | compare(day, bound.strftime("%Y-%m-%d"))
+        expression = condition if expression is None else expression & condition
+
+    table = data.to_table(columns=columns, filter=expression)
+    frame = table.to_pandas()
+    if time_column in frame.columns:
+        frame = frame.sort_values(time_column, kind="stable", ignore_index=True)
+    return frame
+
+
+def parse_time(value):
+    """
+    Parse a time range bound given as "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS".
+    """
+    if value is None:
+        return None
+    if len(value) == 10:
+        return datetime.strptime(value, "%Y-%m-%d")
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
@@ -0,0 +1,191 @@
+import numpy as np
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+FILL_POLICIES = ("nan", "hold", "interpolate")
+
+# Samples further apart than this many intervals are an outage
+DEFAULT_GAP_FACTOR = 3.0
+
+# Share of steps under half the interval that makes a series variable-rate
+VARIABLE_RATE_SHARE = 0.05
+
+
+def infer_interval(timestamps):
+    """
+    Get the sampling interval of a series: its most common step.
+
+    Steps are rounded to whole seconds, the resolution of the results files,
+    or to milliseconds for faster series. The median alone would be pulled
+    up by the missed ticks and make the grid drift off the samples.
+
+    Returns:
+        float: Interval in seconds, 0 with fewer than two distinct timestamps.
+    """
+    steps = np.diff(timestamps)
+    steps = steps[steps > 0]
+    if not len(steps):
+        return 0.0
+    median = float(np.median(steps))
+    resolution = 1.0 if median >= 1 else 0.001
+    units = np.rint(steps / resolution).astype(np.int64)
+    units = units[(units > 0) & (units <= 2 * max(round(median / resolution), 1))]
+    if not len(units):
+        return median
+    return float(np.bincount(units).argmax() * resolution)
+
+
+def is_variable_rate(timestamps, interval=None, share=VARIABLE_RATE_SHARE):
+    """
+    Check whether a series was sampled at a varying rate, e.g. adaptively:
+    more than `share` of its steps are under half its interval. Its
+    interval is then the rate of the quiet stretches, and the faster
+    samples of the bursts have no room on a grid that coarse.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if interval is None:
+        interval = infer_interval(timestamps)
+    steps = np.diff(timestamps)
+    steps = steps[steps > 0]
+    if not len(steps) or interval <= 0:
+        return False
+    return np.count_nonzero(steps < interval / 2) > share * len(steps)
+
+
+def detect_gaps(timestamps, interval=None, gap_factor=DEFAULT_GAP_FACTOR):
+    """
+    Find the outages of a series in time order.
+
+    Args:
+        timestamps (array): Sample times in seconds, sorted.
+        interval (float): Expected interval, inferred if None.
+        gap_factor (float): Steps longer than this many intervals are outages.
+
+    Returns:
+        numpy.ndarray: (n, 2) array of the last sample time before each
+        outage and the first one after it.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if interval is None:
+        interval = infer_interval(timestamps)
+    if len(timestamps) < 2 or interval <= 0:
+        return np.empty((0, 2))
+    at = np.flatnonzero(np.diff(timestamps) > gap_factor * interval)
+    return np.column_stack((timestamps[at], timestamps[at + 1]))
+
+
+def regularize(
+    timestamps, values, interval=None, fill="nan", gap_factor=DEFAULT_GAP_FACTOR
+):
+    """
+    Resample a series onto a fixed grid of `interval` seconds.
+
+    Every sample goes to its nearest grid point, the later one winning when
+    two share a point; missed ticks become empty points filled as `fill`
+    says: left NaN, holding the previous value or interpolated linearly.
+    NaN values, e.g. of a failed speed test, count as missed too.
+
+    Outages (steps over `gap_factor` intervals, e.g. while the laptop slept)
+    are not filled whatever the policy. The grid isn't laid across them
+    either: a single NaN point one interval after the last sample marks
+    each, so a plot breaks its line there and a week of downtime costs one
+    row instead of a week of them.
+
+    Args:
+        timestamps (array): Sample times in seconds.
+        values (array): Values, one row per sample and optionally several columns.
+        interval (float): Grid step in seconds, the median step if None.
+        fill (str): "nan", "hold" or "interpolate".
+        gap_factor (float): Steps longer than this many intervals are outages.
+
+    Returns:
+        tuple: Grid times, float64 values on the grid with the shape of
+        `values` but for the row count, and the outages as detect_gaps
+        returns them.
+    """
+    if fill not in FILL_POLICIES:
+        raise ValueError(f"Unknown fill policy: {fill}")
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    if len(timestamps) and np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, values = timestamps[order], values[order]
+    if interval is None:
+        interval = infer_interval(timestamps)
+    if not len(timestamps) or interval <= 0:
+        return timestamps, values[:, 0] if squeeze else values, np.empty((0, 2))
+
+    start = np.rint(timestamps[0] / interval) * interval
+    slots = np.rint((timestamps - start) / interval).astype(np.int64)
+
+    # Skip the slots inside outages but one, which stays empty as a marker
+    outage_at = np.flatnonzero(np.diff(timestamps) > gap_factor * interval)
+    skipped = np.maximum(slots[outage_at + 1] - slots[outage_at] - 2, 0)
+    shift = np.zeros(len(slots), dtype=np.int64)
+    shift[outage_at + 1] = skipped
+    slots -= np.cumsum(shift)
+    size = int(slots[-1]) + 1
+    steps = np.zeros(size, dtype=np.int64)
+    steps[slots[outage_at + 1]] = skipped
+    grid = start + (np.arange(size) + np.cumsum(steps)) * interval
+
+    last = np.ones(len(slots), dtype=bool)
+    last[:-1] = slots[1:] != slots[:-1]
+    result = np.full((size, values.shape[1]), np.nan)
+    result[slots[last]] = values[last]
+
+    if fill != "nan":
+        markers = slots[outage_at] + 1
+        for column in range(result.shape[1]):
+            series = result[:, column]
+            valid = ~np.isnan(series)
+            if not valid.any():
+                continue
+            if fill == "hold":
+                source = np.where(valid, np.arange(size), 0)
+                np.maximum.accumulate(source, out=source)
+                series[:] = series[source]
+            else:
+                series[:] = np.interp(grid, grid[valid], series[valid])
+        result[markers] = np.nan
+
+    outages = np.column_stack((timestamps[outage_at], timestamps[outage_at + 1]))
+    return grid, result[:, 0] if squeeze else result, outages
+
+
+def regularize_frame(
+    data, columns, interval=None, fill="nan", gap_factor=DEFAULT_GAP_FACTOR
+):
+    """
+    Regularize the `columns` of a results DataFrame with a "timestamp" column.
+
+    A variable-rate series (see is_variable_rate) is left as it is when no
+    `interval` is given, so its bursts keep every sample; only its outages
+    are detected.
+
+    Returns:
+        tuple: A DataFrame of the grid, with "timestamp" formatted as in the
+        results files, and the outages as (start, end) timestamp strings.
+    """
+    import pandas as pd
+
+    times = pd.to_datetime(data["timestamp"], format=TIMESTAMP_FORMAT)
+    seconds = ((times - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).to_numpy()
+
+    def to_text(epochs):
+        return pd.to_datetime(epochs, unit="s").strftime(TIMESTAMP_FORMAT)
+
+    if interval is None and is_variable_rate(seconds):
+        outages = detect_gaps(np.sort(seconds), gap_factor=gap_factor)
+        return data, list(zip(to_text(outages[:, 0]), to_text(outages[:, 1])))
+
+    grid, values, outages = regularize(
+        seconds, data[columns].to_numpy(dtype=np.float64), interval, fill, gap_factor
+    )
+
+    frame = pd.DataFrame(values, columns=columns)
+    frame.insert(0, "timestamp", to_text(grid))
+    return frame, list(zip(to_text(outages[:, 0]), to_text(outages[:, 1])))
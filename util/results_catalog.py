@@ -0,0 +1,397 @@
+import csv
+import glob
+import io
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+DEFAULT_CATALOG = os.path.join("results", "catalog.sqlite")
+
+# <date>_<time>_<metric>.csv, as named by the analyzers, .parquet once
+# exported, or .json for saved summaries such as top talkers
+RESULTS_FILE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_(.+)\.(?:csv|parquet|json)$"
+)
+
+# Text columns whose distinct values are listed, e.g. the interfaces of a
+# per-NIC file or the targets of a latency file
+LABEL_COLUMNS = ("interface", "name", "target", "process", "server")
+MAX_LABELS = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    host TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    rows INTEGER NOT NULL,
+    labels TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_time ON files (kind, start_time, end_time);
+"""
+
+FIELDS = (
+    "path",
+    "kind",
+    "host",
+    "start_time",
+    "end_time",
+    "rows",
+    "labels",
+    "stats",
+    "columns",
+    "size",
+    "mtime_ns",
+    "offset",
+)
+
+
+def metric_of(path):
+    """
+    Get the metric of a results file from its name, e.g. "network_usage".
+    """
+    name = os.path.basename(path)
+    match = RESULTS_FILE.match(name)
+    return match.group(1) if match else os.path.splitext(name)[0]
+
+
+def time_bound(value, end=False):
+    """
+    Normalize a time range bound given as "YYYY-MM-DD" or
+    "YYYY-MM-DD HH:MM:SS"; a bare end date covers that whole day.
+    """
+    if value is None or not isinstance(value, str):
+        return value.strftime(TIMESTAMP_FORMAT) if value is not None else None
+    if len(value) == 10:
+        return value + (" 23:59:59" if end else " 00:00:00")
+    return value
+
+
+def scan_file(path, entry=None):
+    """
+    Summarize the rows of a results CSV appended since it was last scanned.
+
+    Runs in a worker process during a rebuild, so it only takes and returns
+    plain values. Only whole lines are read; a row still being written is
+    left for the next scan.
+
+    Args:
+        path (str): The CSV file.
+        entry (dict): The file's previous entry to continue from, or None.
+
+    Returns:
+        dict: The updated entry, without path, kind and host.
+    """
+    if entry is None:
+        entry = {
+            "start_time": None,
+            "end_time": None,
+            "rows": 0,
+            "labels": {},
+            "stats": {},
+            "columns": [],
+            "offset": 0,
+        }
+    else:
+        entry = dict(entry, labels=dict(entry["labels"]), stats=dict(entry["stats"]))
+    stat = os.stat(path)
+    with open(path, "rb") as file:
+        header = file.readline()
+        if not header.endswith(b"\n"):
+            return dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        columns = header.decode("utf-8", "replace").rstrip("\r\n").split(",")
+        file.seek(max(entry["offset"], len(header)))
+        data = file.read()
+    complete = data.rfind(b"\n") + 1
+    entry["offset"] = max(entry["offset"], len(header)) + complete
+    entry["size"] = stat.st_size
+    entry["mtime_ns"] = stat.st_mtime_ns
+    entry["columns"] = columns
+
+    time_column = "timestamp" if "timestamp" in columns else "start"
+    time_index = columns.index(time_column) if time_column in columns else None
+    label_columns = [
+        (index, name) for index, name in enumerate(columns) if name in LABEL_COLUMNS
+    ]
+    numeric = [
+        index
+        for index, name in enumerate(columns)
+        if index != time_index
+        and name not in LABEL_COLUMNS
+        and name not in ("end", "status", "src_ip", "dst_ip", "protocol", "hostname")
+    ]
+    stats = {
+        columns[index]: entry["stats"].get(
+            columns[index], [0, 0.0, float("inf"), float("-inf")]
+        )
+        for index in numeric
+    }
+    labels = {name: set(entry["labels"].get(name, ())) for _, name in label_columns}
+    first = last = None
+    rows = 0
+    for row in csv.reader(io.StringIO(data[:complete].decode("utf-8", "replace"))):
+        if len(row) != len(columns):
+            continue
+        rows += 1
+        if time_index is not None:
+            timestamp = row[time_index]
+            if first is None or timestamp < first:
+                first = timestamp
+            if last is None or timestamp > last:
+                last = timestamp
+        for index in numeric:
+            try:
+                value = float(row[index])
+            except ValueError:
+                continue
+            summary = stats[columns[index]]
+            summary[0] += 1
+            summary[1] += value
+            if value < summary[2]:
+                summary[2] = value
+            if value > summary[3]:
+                summary[3] = value
+        for index, name in label_columns:
+            if len(labels[name]) < MAX_LABELS:
+                labels[name].add(row[index])
+
+    entry["rows"] += rows
+    if first is not None:
+        if entry["start_time"] is None or first < entry["start_time"]:
+            entry["start_time"] = first
+        if entry["end_time"] is None or last > entry["end_time"]:
+            entry["end_time"] = last
+    entry["stats"] = {name: summary for name, summary in stats.items() if summary[0]}
+    entry["labels"] = {name: sorted(values) for name, values in labels.items()}
+    return entry
+
+
+class ResultsCatalog:
+    """
+    SQLite index of the results files: kind, host, time range, row count,
+    distinct interfaces (or targets, namespaces...) and per-column count,
+    sum, min and max.
+
+    Every entry remembers how far its file was read, so a file that grew
+    is only read from there on: writers passed a catalog call update()
+    after each append, which reads just the new row. refresh() brings the
+    whole results directory up to date, scanning changed files in parallel
+    in a process pool, and find() then selects files by kind, host and
+    time range without opening any of them.
+    """
+
+    def __init__(
+        self, path=DEFAULT_CATALOG, results_dir="results", logger=None, host=None
+    ):
+        self.path = path
+        self.results_dir = results_dir
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.host = host or socket.gethostname()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # Shared by the collector threads, which take the lock
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def host_of(self, path):
+        """
+        Get the host of a results file: this host for the local results
+        directory, <host> for <output>/<host>/results/ as written by
+        PushAggregator.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory == os.path.abspath(self.results_dir):
+            return self.host
+        if os.path.basename(directory) == "results":
+            directory = os.path.dirname(directory)
+        return os.path.basename(directory)
+
+    def load_entry(self, path):
+        row = self.connection.execute(
+            f"SELECT {', '.join(FIELDS)} FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(FIELDS, row))
+        for field in ("labels", "stats", "columns"):
+            entry[field] = json.loads(entry[field])
+        return entry
+
+    def save_entry(self, path, entry):
+        entry = dict(entry, path=path, kind=metric_of(path), host=self.host_of(path))
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO files ({', '.join(FIELDS)}) "
+            f"VALUES ({', '.join('?' * len(FIELDS))})",
+            [
+                (
+                    json.dumps(entry[field])
+                    if field in ("labels", "stats", "columns")
+                    else entry[field]
+                )
+                for field in FIELDS
+            ],
+        )
+
+    def pending_entry(self, path, force=False):
+        """
+        Get what a file needs: None if its entry is current, else the entry
+        to continue scanning from, or {} to scan it from the start.
+        """
+        stat = os.stat(path)
+        entry = None if force else self.load_entry(path)
+        if entry is None or stat.st_size < entry["offset"]:
+            # New, or rewritten since it was scanned
+            return {}
+        if stat.st_size == entry["offset"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return None
+        return entry
+
+    def update(self, path):
+        """
+        Catch the entry of one file up with the rows appended to it.
+        """
+        key = os.path.abspath(path)
+        try:
+            with self.lock:
+                entry = self.pending_entry(key)
+                if entry is None:
+                    return
+                self.save_entry(key, scan_file(key, entry or None))
+                self.connection.commit()
+        except Exception as e:
+            self.logger.error(f"Error updating the results catalog for {path}: {e}")
+
+    def refresh(self, paths=None, jobs=None, force=False):
+        """
+        Bring the catalog up to date with a set of results files.
+
+        Args:
+            paths (list of str): Files to index, every CSV of the results
+                directory by default. Entries of deleted files are dropped.
+            jobs (int): Worker processes, one per CPU by default.
+            force (bool): Scan every file from the start.
+
+        Returns:
+            tuple: Number of files scanned, unchanged and removed.
+        """
+        if paths is None:
+            paths = glob.glob(os.path.join(self.results_dir, "*.csv"))
+        keys = sorted({os.path.abspath(path) for path in paths})
+        with self.lock:
+            pending = {}
+            for key in keys:
+                entry = self.pending_entry(key, force)
+                if entry is not None:
+                    pending[key] = entry or None
+
+            removed = [
+                path
+                for (path,) in self.connection.execute("SELECT path FROM files")
+                if not os.path.exists(path)
+            ]
+            self.connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in removed]
+            )
+
+            if len(pending) > 1 and jobs != 1:
+                with ProcessPoolExecutor(jobs) as executor:
+                    entries = executor.map(
+                        scan_file, list(pending), list(pending.values())
+                    )
+                    scanned = dict(zip(pending, entries))
+            else:
+                scanned = {key: scan_file(key, entry) for key, entry in pending.items()}
+            for key, entry in scanned.items():
+                self.save_entry(key, entry)
+            self.connection.commit()
+        return len(pending), len(keys) - len(pending), len(removed)
+
+    def rebuild(self, paths=None, jobs=None):
+        """
+        Index the files again from scratch.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM files")
+        return self.refresh(paths, jobs, force=True)
+
+    def find(self, kind=None, host=None, start=None, end=None):
+        """
+        Select files by kind, host and the time range they overlap.
+
+        Args:
+            kind (str): Metric, e.g. "network_usage".
+            host (str): Host the results were collected on.
+            start (str or datetime): Earliest time, "YYYY-MM-DD[ HH:MM:SS]".
+            end (str or datetime): Latest time; a bare date covers the whole day.
+
+        Returns:
+            list of dict: Matching entries in order of their start time.
+        """
+        conditions = []
+        arguments = []
+        for clause, value in (
+            ("kind = ?", kind),
+            ("host = ?", host),
+            ("end_time >= ?", time_bound(start)),
+            ("start_time <= ?", time_bound(end, end=True)),
+        ):
+            if value is not None:
+                conditions.append(clause)
+                arguments.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            paths = [
+                path
+                for (path,) in self.connection.execute(
+                    f"SELECT path FROM files {where} ORDER BY start_time, path",
+                    arguments,
+                )
+            ]
+            return [self.load_entry(path) for path in paths]
+
+    def kinds(self):
+        with self.lock:
+            return [
+                kind
+                for (kind,) in self.connection.execute(
+                    "SELECT DISTINCT kind FROM files ORDER BY kind"
+                )
+            ]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def format_entries(entries):
+    """
+    Render catalog entries as plain text for the CLI.
+    """
+    lines = [f"{'start':<19}  {'end':<19}  {'kind':<18} {'host':<16} {'rows':>9}  file"]
+    for entry in entries:
+        labels = ", ".join(
+            f"{name}: {' '.join(values)}" for name, values in entry["labels"].items()
+        )
+        lines.append(
+            f"{entry['start_time'] or '-':<19}  {entry['end_time'] or '-':<19}  "
+            f"{entry['kind']:<18} {entry['host']:<16} {entry['rows']:>9,}  "
+            f"{os.path.relpath(entry['path'])}" + (f"  ({labels})" if labels else "")
+        )
+    return "\n".join(lines)
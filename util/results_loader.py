@@ -0,0 +1,424 @@
+import io
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIMESTAMP_WIDTH = 19
+
+# Bytes read per block; a block's rows are parsed in one go
+BLOCK_SIZE = 32 * 1024 * 1024
+
+# Points a plot is downsampled to
+DEFAULT_POINTS = 5000
+
+# Text columns of the results files, e.g. of the per-NIC or latency ones
+TEXT_COLUMNS = (
+    "interface",
+    "namespace",
+    "name",
+    "target",
+    "process",
+    "server",
+    "status",
+)
+
+# Offsets of the digits and separators in "YYYY-MM-DD HH:MM:SS"
+DIGIT_OFFSETS = np.array([0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18])
+SEPARATORS = {4: b"-", 7: b"-", 10: b" ", 13: b":", 16: b":"}
+
+
+def parse_timestamps(data, starts):
+    """
+    Parse the "%Y-%m-%d %H:%M:%S" timestamps at the given offsets of a buffer.
+
+    The format is fixed, so the digits are picked out by position and the
+    date converted with integer arithmetic on whole arrays, instead of
+    building a string object per row and matching it against the format.
+
+    Args:
+        data (numpy.ndarray): uint8 buffer, with at least TIMESTAMP_WIDTH
+            bytes after the last offset.
+        starts (numpy.ndarray): Offsets of the timestamps.
+
+    Returns:
+        tuple: int64 epoch seconds, naive times read as UTC, and a mask of
+        the offsets that do hold a timestamp.
+    """
+    valid = np.ones(len(starts), dtype=bool)
+    for offset, separator in SEPARATORS.items():
+        valid &= data[starts + offset] == ord(separator)
+    # A digit per row, so each is contiguous; anything but a digit wraps past 9
+    digits = data[DIGIT_OFFSETS[:, None] + starts] - np.uint8(ord("0"))
+    valid &= (digits <= 9).all(axis=0)
+    # Century, year, month, day, hours, minutes, seconds
+    pairs = digits[0::2].astype(np.int32) * 10 + digits[1::2]
+    year = pairs[0] * 100 + pairs[1]
+    month = pairs[2]
+    day = pairs[3]
+    seconds = pairs[4] * 3600 + pairs[5] * 60 + pairs[6]
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+
+    # Days since the epoch of a proleptic Gregorian date, with the year
+    # starting in March so the leap day comes last
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = (era * 146097 + day_of_era - 719468).astype(np.int64)
+    return days * 86400 + seconds, valid
+
+
+def read_header(file):
+    with open(file, "rb") as stream:
+        return stream.readline().decode("utf-8").rstrip("\r\n").split(",")
+
+
+def value_columns(file):
+    """
+    Get the numeric columns of a results CSV: all but the timestamp and the
+    text ones.
+    """
+    return [column for column in read_header(file)[1:] if column not in TEXT_COLUMNS]
+
+
+def iter_blocks(file, columns, block_size=BLOCK_SIZE):
+    """
+    Read a results CSV block by block, so memory is bounded by the block size
+    and not the file size.
+
+    Values are read as float64, which holds the byte counters exactly up to
+    8 PB, without inferring types, and a half-written last row reads as NaN
+    rather than failing the block.
+
+    Args:
+        file (str): Results CSV with the timestamp in the first column.
+        columns (list of str): Numeric columns to read.
+        block_size (int): Bytes read at a time.
+
+    Yields:
+        tuple: int64 epoch seconds and a float64 array with a column per
+        entry of `columns`, of the rows of a block.
+    """
+    header = read_header(file)
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"{file} has no column {', '.join(missing)}")
+    dtype = {column: np.float64 for column in columns}
+    with open(file, "rb") as stream:
+        stream.readline()
+        rest = b""
+        while True:
+            block = stream.read(block_size)
+            if block:
+                end = block.rfind(b"\n") + 1
+                if not end:
+                    rest += block
+                    continue
+                block, rest = rest + block[:end], block[end:]
+            else:
+                block, rest = rest, b""
+                if not block.strip():
+                    return
+
+            data = np.frombuffer(block + bytes(TIMESTAMP_WIDTH), dtype=np.uint8)
+            starts = np.flatnonzero(data[: len(block)] == ord("\n")) + 1
+            starts = np.concatenate(([0], starts[starts < len(block)]))
+            epochs, valid = parse_timestamps(data, starts)
+            values = pd.read_csv(
+                io.BytesIO(block),
+                header=None,
+                names=header,
+                usecols=columns,
+                dtype=dtype,
+                skip_blank_lines=False,
+            )[columns].to_numpy()
+            if not valid.all():
+                epochs, values = epochs[valid], values[valid]
+            yield epochs, values
+
+
+def to_text(epochs):
+    return pd.to_datetime(epochs, unit="s").strftime(TIMESTAMP_FORMAT)
+
+
+def time_span(file):
+    """
+    Get the first and last timestamps of a results CSV without reading it
+    whole: from its first data row and its last complete row.
+
+    Returns:
+        tuple: Epoch seconds, or None for a file without rows.
+    """
+    with open(file, "rb") as stream:
+        stream.readline()
+        first = stream.readline()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(max(size - 4096, 0))
+        last = stream.read().rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+    lines = [line for line in (first, last) if len(line) >= TIMESTAMP_WIDTH]
+    if len(lines) < 2:
+        return None
+    data = np.frombuffer(b"".join(line[:TIMESTAMP_WIDTH] for line in lines), np.uint8)
+    epochs, valid = parse_timestamps(data, np.array([0, TIMESTAMP_WIDTH]))
+    if not valid.all():
+        return None
+    return int(epochs[0]), int(epochs[1])
+
+
+class QuantileSketch:
+    """
+    Quantiles of a stream in bounded memory.
+
+    Values are counted in logarithmic buckets, each `accuracy` wide relative
+    to its values, so a quantile is off by at most that fraction whatever
+    the number of values, and bytes to petabytes take a few thousand buckets.
+    """
+
+    def __init__(self, accuracy=0.005):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, values):
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.zeros += int(np.count_nonzero(values == 0))
+        for buckets, part in (
+            (self.positive, values[values > 0]),
+            (self.negative, -values[values < 0]),
+        ):
+            if not len(part):
+                continue
+            indexes = np.ceil(np.log(part) / self.log_gamma).astype(np.int64)
+            for index, count in zip(*np.unique(indexes, return_counts=True)):
+                buckets[int(index)] = buckets.get(int(index), 0) + int(count)
+
+    def value(self, index):
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def quantile(self, percentile):
+        """
+        Get a percentile (0-100) of the values added, NaN if there are none.
+        """
+        if not self.count:
+            return math.nan
+        rank = percentile / 100 * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self.value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self.value(index)
+        return self.value(max(self.positive))
+
+
+def summarize(file, columns=None, percentiles=(50, 95, 99), block_size=BLOCK_SIZE):
+    """
+    Summarize the columns of a results CSV of any size in one pass.
+
+    Args:
+        file (str): Results CSV.
+        columns (list of str): Numeric columns, all of them by default.
+        percentiles (tuple): Percentiles to estimate, see QuantileSketch.
+
+    Returns:
+        dict: "rows", "start" and "end" of the file, and per column under
+        "columns" its count (of non-empty values), mean, min, max and
+        "p<percentile>" values.
+    """
+    columns = columns or value_columns(file)
+    rows = 0
+    start = end = None
+    count = np.zeros(len(columns), dtype=np.int64)
+    total = np.zeros(len(columns))
+    low = np.full(len(columns), np.inf)
+    high = np.full(len(columns), -np.inf)
+    sketches = [QuantileSketch() for _ in columns] if percentiles else []
+    for epochs, values in iter_blocks(file, columns, block_size):
+        if not len(epochs):
+            continue
+        rows += len(epochs)
+        start = epochs.min() if start is None else min(start, epochs.min())
+        end = epochs.max() if end is None else max(end, epochs.max())
+        present = ~np.isnan(values)
+        count += present.sum(axis=0)
+        total += np.where(present, values, 0).sum(axis=0)
+        low = np.fmin(low, np.nanmin(values, axis=0, initial=np.inf))
+        high = np.fmax(high, np.nanmax(values, axis=0, initial=-np.inf))
+        for column, sketch in enumerate(sketches):
+            sketch.add(values[:, column])
+
+    summary = {
+        "rows": rows,
+        "start": to_text([start])[0] if rows else None,
+        "end": to_text([end])[0] if rows else None,
+        "columns": {},
+    }
+    for column, name in enumerate(columns):
+        stats = {
+            "count": int(count[column]),
+            "mean": total[column] / count[column] if count[column] else math.nan,
+            "min": low[column] if count[column] else math.nan,
+            "max": high[column] if count[column] else math.nan,
+        }
+        for percentile in percentiles:
+            stats[f"p{percentile:g}"] = sketches[column].quantile(percentile)
+        summary["columns"][name] = stats
+    return summary
+
+
+def bucket_stats(file, columns, interval, block_size=BLOCK_SIZE):
+    """
+    Reduce a results CSV to per-bucket statistics of `interval` seconds,
+    block by block; memory grows with the number of buckets only.
+
+    Returns:
+        dict of numpy.ndarray: "bucket" indexes (epoch // interval) in order,
+        their "rows" and "epoch_sum", and per-column "count", "sum", "min"
+        and "max" arrays, one column per entry of `columns`.
+    """
+    parts = [
+        block_buckets(epochs, values, interval)
+        for epochs, values in iter_blocks(file, columns, block_size)
+        if len(epochs)
+    ]
+    return merge_buckets(parts, len(columns))
+
+
+def block_buckets(epochs, values, interval):
+    buckets = epochs // interval
+    if np.any(buckets[1:] < buckets[:-1]):
+        order = np.argsort(buckets, kind="stable")
+        epochs, values, buckets = epochs[order], values[order], buckets[order]
+    return reduce_buckets(buckets, epochs, values)
+
+
+def merge_buckets(parts, width):
+    """
+    Merge per-bucket statistics of blocks into one set of buckets in order.
+    """
+    if not parts:
+        empty = np.empty((0, width))
+        return {
+            "bucket": np.empty(0, dtype=np.int64),
+            "rows": np.empty(0, dtype=np.int64),
+            "epoch_sum": np.empty(0, dtype=np.int64),
+            "count": empty,
+            "sum": empty,
+            "min": empty,
+            "max": empty,
+        }
+    merged = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    # Buckets straddling two blocks (or out of order across blocks) are merged
+    order = np.argsort(merged["bucket"], kind="stable")
+    merged = {key: value[order] for key, value in merged.items()}
+    at = np.flatnonzero(np.diff(merged["bucket"], prepend=merged["bucket"][0] - 1))
+    return {
+        "bucket": merged["bucket"][at],
+        "rows": np.add.reduceat(merged["rows"], at),
+        "epoch_sum": np.add.reduceat(merged["epoch_sum"], at),
+        "count": np.add.reduceat(merged["count"], at),
+        "sum": np.add.reduceat(merged["sum"], at),
+        "min": np.fmin.reduceat(merged["min"], at),
+        "max": np.fmax.reduceat(merged["max"], at),
+    }
+
+
+def reduce_buckets(buckets, epochs, values):
+    at = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    present = ~np.isnan(values)
+    return {
+        "bucket": buckets[at],
+        "rows": np.diff(np.append(at, len(buckets))),
+        "epoch_sum": np.add.reduceat(epochs, at),
+        "count": np.add.reduceat(present.astype(np.int64), at),
+        "sum": np.add.reduceat(np.where(present, values, 0), at),
+        "min": np.fmin.reduceat(values, at),
+        "max": np.fmax.reduceat(values, at),
+    }
+
+
+def rollup(file, columns=None, interval=3600, block_size=BLOCK_SIZE):
+    """
+    Roll a results CSV up into `interval`-second buckets.
+
+    Returns:
+        pandas.DataFrame: A row per bucket with data: its start "timestamp",
+        "samples" and the mean, min and max of each column, e.g.
+        "sent_bytes_mean".
+    """
+    columns = columns or value_columns(file)
+    stats = bucket_stats(file, columns, interval, block_size)
+    rollups = pd.DataFrame(
+        {"timestamp": to_text(stats["bucket"] * interval), "samples": stats["rows"]}
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = stats["sum"] / stats["count"]
+    for column, name in enumerate(columns):
+        rollups[f"{name}_mean"] = means[:, column]
+        rollups[f"{name}_min"] = stats["min"][:, column]
+        rollups[f"{name}_max"] = stats["max"][:, column]
+    return rollups
+
+
+def downsample(file, columns, points=DEFAULT_POINTS, block_size=BLOCK_SIZE):
+    """
+    Load a results CSV for plotting with at most about `points` rows.
+
+    The time span is split into `points` equal buckets, of whole seconds,
+    and each is replaced by the means of its rows at their mean time. A file
+    sparser than that, or with at most `points` rows, keeps every row as it
+    is.
+
+    Returns:
+        pandas.DataFrame: "timestamp" formatted as in the results files and
+        the `columns`. The means of the columns over the whole file are in
+        its attrs["means"], since the means of the rows are now weighted.
+    """
+    span = time_span(file)
+    interval = max(math.ceil((span[1] - span[0]) / points), 1) if span else 1
+    # Few rows over a long span, e.g. bursts sampled every second by an
+    # otherwise slow collector, would be merged by buckets that wide: rows
+    # go to 1 s buckets until there are more than `points` of them, which
+    # are then merged into the wide buckets, all in one pass
+    width = 1
+    rows = 0
+    parts = []
+    for epochs, values in iter_blocks(file, columns, block_size):
+        if not len(epochs):
+            continue
+        rows += len(epochs)
+        if width < interval and rows > points:
+            width = interval
+            if parts:
+                merged = merge_buckets(parts, len(columns))
+                merged["bucket"] //= interval
+                parts = [merge_buckets([merged], len(columns))]
+        parts.append(block_buckets(epochs, values, width))
+    stats = merge_buckets(parts, len(columns))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = stats["sum"] / stats["count"]
+    epochs = np.rint(stats["epoch_sum"] / np.maximum(stats["rows"], 1))
+    data = pd.DataFrame(means, columns=columns)
+    data.insert(0, "timestamp", to_text(epochs.astype(np.int64)))
+    count = stats["count"].sum(axis=0)
+    data.attrs["means"] = {
+        name: (
+            stats["sum"][:, column].sum() / count[column] if count[column] else math.nan
+        )
+        for column, name in enumerate(columns)
+    }
+    return data
@@ -0,0 +1,158 @@
+import csv
+import random
+import struct
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def generate_usage_rows(count, start=None, interval=60, seed=0):
+    """
+    Generate rows in the format written by NetworkUsageAnalyzer.write_to_csv.
+
+    Counters grow monotonically with bursty per-interval traffic.
+
+    Args:
+        count (int): Number of rows.
+        start (datetime): Timestamp of the first row, defaults to 2024-01-01.
+        interval (int): Seconds between rows.
+        seed (int): Random seed, so every run produces the same data.
+
+    Returns:
+        list of dict: Rows with timestamp, sent_bytes and recv_bytes.
+    """
+    rng = random.Random(seed)
+    timestamp = start or datetime(2024, 1, 1)
+    step = timedelta(seconds=interval)
+    sent_bytes = rng.randint(10**8, 10**9)
+    recv_bytes = rng.randint(10**9, 10**10)
+    rows = []
+    for _ in range(count):
+        burst = 50 if rng.random() < 0.05 else 1
+        sent_bytes += int(rng.expovariate(1 / 200_000) * interval * burst)
+        recv_bytes += int(rng.expovariate(1 / 1_500_000) * interval * burst)
+        rows.append(
+            {
+                "timestamp": timestamp.strftime(TIMESTAMP_FORMAT),
+                "sent_bytes": sent_bytes,
+                "recv_bytes": recv_bytes,
+            }
+        )
+        timestamp += step
+    return rows
+
+
+def generate_speed_rows(count, start=None, interval=60, seed=0):
+    """
+    Generate rows in the format written by NetworkSpeedAnalyzer.write_to_csv.
+
+    Args:
+        count (int): Number of rows.
+        start (datetime): Timestamp of the first row, defaults to 2024-01-01.
+        interval (int): Seconds between rows.
+        seed (int): Random seed, so every run produces the same data.
+
+    Returns:
+        list of dict: Rows with timestamp, download_speed and upload_speed.
+    """
+    rng = random.Random(seed)
+    timestamp = start or datetime(2024, 1, 1)
+    step = timedelta(seconds=interval)
+    rows = []
+    for _ in range(count):
+        rows.append(
+            {
+                "timestamp": timestamp.strftime(TIMESTAMP_FORMAT),
+                "download_speed": max(rng.gauss(300_000_000, 40_000_000), 0),
+                "upload_speed": max(rng.gauss(80_000_000, 15_000_000), 0),
+            }
+        )
+        timestamp += step
+    return rows
+
+
+def write_rows(path, rows):
+    """
+    Write generated rows to a CSV file with a header.
+
+    Args:
+        path (str): Output CSV path.
+        rows (list of dict): Rows from one of the generators.
+    """
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_usage_csv(path, count, interval=60, seed=0):
+    write_rows(path, generate_usage_rows(count, interval=interval, seed=seed))
+
+
+def write_speed_csv(path, count, interval=60, seed=0):
+    write_rows(path, generate_speed_rows(count, interval=interval, seed=seed))
+
+
+def write_pcap(path, count, flows=1_000, start=None, rate=10_000, seed=0):
+    """
+    Write a pcap file of Ethernet/IPv4 TCP and UDP packets.
+
+    Packets are spread over `flows` 5-tuples with a skewed popularity, so a
+    few flows carry most of the traffic, as on a real uplink.
+
+    Args:
+        path (str): Output pcap path.
+        count (int): Number of packets.
+        flows (int): Number of distinct flows.
+        start (datetime): Time of the first packet, defaults to 2024-01-01.
+        rate (float): Packets per second.
+        seed (int): Random seed, so every run produces the same data.
+    """
+    rng = random.Random(seed)
+    timestamp = (start or datetime(2024, 1, 1)).timestamp()
+    headers = []
+    for _ in range(flows):
+        proto = 6 if rng.random() < 0.8 else 17
+        src = rng.getrandbits(32).to_bytes(4, "big")
+        dst = rng.getrandbits(32).to_bytes(4, "big")
+        ports = struct.pack(">HH", rng.randint(1024, 65535), rng.choice((53, 80, 443)))
+        headers.append((proto, src + dst, ports))
+    weights = [1 / (rank + 1) for rank in range(flows)]
+
+    with open(path, "wb") as file:
+        # Microsecond pcap, snaplen 65535, Ethernet
+        file.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for proto, addresses, ports in rng.choices(headers, weights, k=count):
+            payload = int(rng.expovariate(1 / 600)) % 1400
+            if proto == 6:
+                transport = ports + struct.pack(
+                    ">IIBBHHH", 0, 0, 0x50, 0x18, 65535, 0, 0
+                )
+            else:
+                transport = ports + struct.pack(">HH", 8 + payload, 0)
+            ip = struct.pack(
+                ">BBHHHBBH",
+                0x45,
+                0,
+                20 + len(transport) + payload,
+                0,
+                0,
+                64,
+                proto,
+                0,
+            )
+            frame = (
+                b"\x00" * 12 + b"\x08\x00" + ip + addresses + transport + bytes(payload)
+            )
+            seconds = int(timestamp)
+            file.write(
+                struct.pack(
+                    "<IIII",
+                    seconds,
+                    int((timestamp - seconds) * 1_000_000),
+                    len(frame),
+                    len(frame),
+                )
+            )
+            file.write(frame)
+            timestamp += rng.expovariate(rate)